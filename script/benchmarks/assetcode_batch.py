@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Benchmark converting and validating a large number of asset codes, one at a
+time and with the batch functions.
+
+The single code functions are compared with the ones they replaced, which are
+reproduced here: they looked up each character with ``list.index`` and
+computed the Luhn checksum digit by digit.
+"""
+
+import argparse
+import random
+import time
+
+import synthetic  # noqa: F401 (makes the tools importable)
+
+from sr.tools.inventory import assetcode, luhn
+
+
+def legacy_checksum(number, alphabet):
+    n = len(alphabet)
+    number = tuple(alphabet.index(i) for i in reversed(str(number)))
+    return (sum(number[::2]) + sum(sum(divmod(i * 2, n)) for i in number[1::2])) % n
+
+
+def legacy_is_valid(asset_code):
+    asset_code = assetcode.normalise(asset_code)
+    if set(asset_code) - assetcode.ALPHABET_SET:
+        return False
+    return legacy_checksum(asset_code, assetcode.ALPHABET) == 0
+
+
+def legacy_num_to_code(user_number, part_number):
+    alphabet = assetcode.ALPHABET
+    assetno = ''
+    for num in (user_number, part_number):
+        while True:
+            if num > 15:
+                assetno = assetno + alphabet[num % 16 + 16]
+                num = num // 16
+            else:
+                assetno = assetno + alphabet[num]
+                break
+
+    ck = legacy_checksum(assetno + alphabet[0], alphabet)
+    assetno = assetno + alphabet[-ck]
+    assert legacy_checksum(assetno, alphabet) == 0
+    return assetno
+
+
+def legacy_code_to_num(asset_code):
+    asset_code = assetcode.normalise(asset_code)
+    if not legacy_is_valid(asset_code):
+        raise ValueError(asset_code)
+
+    field = [0, 0]
+    fieldno = 0
+    i = 0
+    for c in asset_code[:-1]:
+        num = assetcode.ALPHABET.index(c)
+        if num > 15:
+            field[fieldno] = field[fieldno] + (num - 16) * (16 ** i)
+        else:
+            field[fieldno] = field[fieldno] + num * (16 ** i)
+            fieldno += 1
+            i = -1
+        i += 1
+    return (field[0], field[1])
+
+
+def timed(name, func, count):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:>20}: {elapsed:7.3f}s  {count / elapsed / 1e6:6.2f}M codes/s  "
+        f"{elapsed / count * 1e9:6.0f} ns/code",
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--codes', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--parts', type=int, default=100000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    pairs = [
+        (rng.randrange(args.users), rng.randrange(args.parts))
+        for _ in range(args.codes)
+    ]
+    digits = assetcode.ALPHABET
+
+    print(f"Encoding {args.codes} codes")
+    codes = timed(
+        'legacy',
+        lambda: [legacy_num_to_code(*pair) for pair in pairs],
+        args.codes,
+    )
+    timed('num_to_code', lambda: [assetcode.num_to_code(*pair) for pair in pairs], args.codes)
+    assert timed('encode_many', lambda: assetcode.encode_many(pairs), args.codes) == codes
+
+    print(f"Decoding {args.codes} codes")
+    timed('legacy', lambda: [legacy_code_to_num(code) for code in codes], args.codes)
+    timed('code_to_num', lambda: [assetcode.code_to_num(code) for code in codes], args.codes)
+    assert timed('decode_many', lambda: assetcode.decode_many(codes), args.codes) == pairs
+
+    print(f"Validating {args.codes} codes")
+    timed('legacy', lambda: [legacy_is_valid(code) for code in codes], args.codes)
+    timed('luhn.is_valid', lambda: [luhn.is_valid(code, digits) for code in codes], args.codes)
+    timed('is_valid', lambda: [assetcode.is_valid(code) for code in codes], args.codes)
+    timed('CODEC.is_valid_many', lambda: assetcode.CODEC.is_valid_many(codes), args.codes)
+    timed('luhn.is_valid_many', lambda: luhn.is_valid_many(codes, digits), args.codes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+"""
+Benchmark finding the history of assets in a synthetic inventory with a long
+history.
+
+Each commit after the first either modifies or moves a random asset. The
+history of a few assets is found by scanning the whole tree of every commit,
+as ``inv-history`` used to, by following them with tree diffs one at a time and
+all at once, and from the history index.
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import pygit2
+
+import synthetic
+
+
+def make_history(root, commits, seed):
+    repo = pygit2.init_repository(root)
+    signature = pygit2.Signature('Bench Mark', 'bench@example.com')
+
+    index = repo.index
+    index.add_all()
+    index.write()
+    parent = repo.create_commit(
+        'HEAD', signature, signature, 'Initial', index.write_tree(), [],
+    )
+
+    rng = random.Random(seed)
+    paths = sorted(
+        entry.path
+        for entry in index
+        if not entry.path.startswith('.meta/')
+        and not entry.path.endswith('/info')
+    )
+    directories = sorted({os.path.dirname(path) for path in paths})
+
+    for number in range(1, commits):
+        i = rng.randrange(len(paths))
+        path = paths[i]
+        entry = index[path]
+        if number % 4:
+            content = repo[entry.id].data + f'# Edit {number}\n'.encode()
+            blob = repo.create_blob(content)
+            index.add(pygit2.IndexEntry(path, blob, entry.mode))
+        else:
+            new_path = os.path.join(
+                rng.choice(directories),
+                os.path.basename(path),
+            )
+            if new_path == path or new_path in index:
+                continue
+            index.remove(path)
+            index.add(pygit2.IndexEntry(new_path, entry.id, entry.mode))
+            paths[i] = new_path
+        parent = repo.create_commit(
+            'HEAD', signature, signature, f'Change {number}',
+            index.write_tree(), [parent],
+        )
+    index.write()
+    return repo
+
+
+def scan_history(repo, code):
+    """Find an asset by looking at every entry of every commit's tree."""
+    seen = {}
+
+    def find(tree, prefix):
+        if tree.id in seen:
+            return seen[tree.id]
+        found = None
+        for entry in tree:
+            path = prefix + entry.name
+            if entry.type_str == 'tree':
+                found = find(repo[entry.id], path + '/')
+            elif code in entry.name:
+                found = (path, entry.id)
+            if found:
+                break
+        seen[tree.id] = found
+        return found
+
+    events = []
+    previous = None
+    sort_mode = pygit2.GIT_SORT_TOPOLOGICAL | pygit2.GIT_SORT_REVERSE
+    for commit in repo.walk(repo.head.target, sort_mode):
+        found = find(commit.tree, '')
+        if found != previous:
+            events.append(found)
+        previous = found
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--assets', type=int, default=5000)
+    parser.add_argument('--commits', type=int, default=5000)
+    parser.add_argument('--lookups', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        root = os.path.join(workdir, 'inventory')
+        os.environ['SR_CACHE_DIR'] = os.path.join(workdir, 'cache')
+
+        from sr.tools.inventory import assetcode, history
+
+        count = synthetic.generate(root, args.assets)
+        start = time.perf_counter()
+        repo = make_history(root, args.commits, args.seed)
+        print(
+            f"Generated {count} assets and {args.commits} commits in "
+            f"{time.perf_counter() - start:.1f}s",
+        )
+
+        rng = random.Random(args.seed)
+        codes = [
+            assetcode.num_to_code(synthetic.USER_NUMBER, rng.randrange(count))
+            for _ in range(args.lookups)
+        ]
+
+        def report(name, elapsed, events):
+            print(
+                f"{name:>12}: {elapsed:7.3f}s  "
+                f"{elapsed / len(codes) * 1000:8.1f} ms/asset  "
+                f"({events} events)",
+            )
+
+        start = time.perf_counter()
+        events = sum(len(scan_history(repo, code)) for code in codes)
+        report('tree scan', time.perf_counter() - start, events)
+
+        start = time.perf_counter()
+        events = sum(len(list(history.get_history(repo, code))) for code in codes)
+        report('tree diff', time.perf_counter() - start, events)
+
+        start = time.perf_counter()
+        events = sum(1 for _ in history.get_histories(repo, codes))
+        report('batch diff', time.perf_counter() - start, events)
+
+        index = history.HistoryIndex(repo)
+        start = time.perf_counter()
+        index.update()
+        print(f"{'index build':>12}: {time.perf_counter() - start:7.3f}s")
+
+        start = time.perf_counter()
+        index = history.HistoryIndex(repo)
+        index.update()
+        events = sum(len(index.events(code)) for code in codes)
+        report('index', time.perf_counter() - start, events)
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+Benchmark cold and warm loads of a synthetic inventory.
+
+Compares the per-asset pickle cache (``cached_yaml_load``) against the
+consolidated per-inventory cache (``YAMLCache``).
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import synthetic
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--assets', type=int, default=50000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        root = os.path.join(workdir, 'inventory')
+        cache_root = os.path.join(workdir, 'cache')
+        os.environ['SR_CACHE_DIR'] = cache_root
+
+        count = synthetic.generate(root, args.assets)
+        print(f"Generated {count} assets")
+
+        from sr.tools.inventory import inventory
+
+        def reset_cache():
+            shutil.rmtree(inventory.CACHE_DIR)
+            os.makedirs(inventory.CACHE_DIR)
+
+        def load_per_asset():
+            inventory.ItemTree(root)
+
+        def load_consolidated():
+            inventory.Inventory(root).root
+
+        for label, load in (
+            ('per-asset cache', load_per_asset),
+            ('consolidated cache', load_consolidated),
+        ):
+            reset_cache()
+            cold = timed(load)
+            warm = timed(load)
+            print(f"{label:>20}: cold {cold:7.2f}s  warm {warm:7.2f}s")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
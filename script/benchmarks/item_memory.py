@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+"""
+Measure the memory taken by a loaded synthetic inventory with ``tracemalloc``.
+
+The current representation is compared with the one it replaced, which is
+reproduced here: a ``__dict__`` for every node, a separately parsed ``info``
+for every asset with its own copies of the keys and condition, and ``parts``
+and ``types`` dicts at every level of the tree.
+"""
+
+import argparse
+import gc
+import os
+import shutil
+import tempfile
+import tracemalloc
+
+import synthetic
+
+
+class LegacyTree:
+    def __init__(self, path, parent=None):
+        from sr.tools import yamlio
+        from sr.tools.inventory.inventory import RE_PART, should_ignore
+
+        self.name = os.path.basename(path)
+        self.path = path
+        self.parent = parent
+        self.children = {}
+        for fname in sorted(os.listdir(path)):
+            if should_ignore(fname) or fname in ('README.md', 'info'):
+                continue
+            p = os.path.join(path, fname)
+            if not os.path.isdir(p):
+                child = LegacyItem(p, self, yamlio, RE_PART)
+            elif RE_PART.match(fname):
+                child = LegacyGroup(p, self)
+            else:
+                child = LegacyTree(p, self)
+            self.children[getattr(child, 'code', child.name)] = child
+
+        self.parts = {}
+        self.types = {}
+        for i in self.walk():
+            self.parts[i.code] = i
+            self.types.setdefault(i.name, []).append(i)
+
+    def walk(self):
+        for child in self.children.values():
+            if hasattr(child, 'walk'):
+                yield from child.walk()
+            if hasattr(child, 'code'):
+                yield child
+
+
+class LegacyGroup(LegacyTree):
+    def __init__(self, path, parent):
+        from sr.tools import yamlio
+        from sr.tools.inventory.inventory import RE_PART
+
+        super().__init__(path, parent)
+        m = RE_PART.match(os.path.basename(path))
+        self.name = m.group(1)
+        self.code = m.group(2)
+        self.info_path = os.path.join(path, 'info')
+        self._info = yamlio.load_file(self.info_path)
+
+
+class LegacyItem:
+    def __init__(self, path, parent, yamlio, re_part):
+        self.path = path
+        self.parent = parent
+        m = re_part.match(os.path.basename(path))
+        self.name = m.group(1)
+        self.code = m.group(2)
+        self.info_path = path
+        self._cache = None
+        self._info = yamlio.load_file(path)
+
+
+def measure(load):
+    gc.collect()
+    tracemalloc.start()
+    result = load()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--assets', type=int, default=20000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        root = os.path.join(workdir, 'inventory')
+        os.environ['SR_CACHE_DIR'] = os.path.join(workdir, 'cache')
+
+        count = synthetic.generate(root, args.assets)
+        print(f"Generated {count} assets")
+
+        from sr.tools.inventory import inventory
+
+        # Warm the cache, so that the current representation is loaded as it
+        # usually would be
+        inventory.Inventory(root).root
+
+        def load_current():
+            inv = inventory.Inventory(root)
+            inv.root.parts.values()
+            # Drop the cache's own bookkeeping, which the legacy representation
+            # doesn't have, leaving the parsed files which the tree refers to
+            inv.cache._loaded_entries = None
+            inv.cache._seen = set()
+            gc.collect()
+            return inv
+
+        for label, load in (
+            ('legacy', lambda: LegacyTree(root)),
+            ('current', load_current),
+        ):
+            result, size = measure(load)
+            print(
+                f"{label:>10}: {size / 2**20:7.1f} MiB  "
+                f"({size / count:6.0f} bytes per asset)",
+            )
+            del result
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
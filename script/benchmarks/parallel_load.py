@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+"""
+Benchmark cold loads of a synthetic inventory with different numbers of
+parsing processes.
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import synthetic
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--assets', type=int, default=50000)
+    parser.add_argument(
+        '--workers',
+        type=int,
+        nargs='+',
+        default=[1, 2, 4, 8],
+    )
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        root = os.path.join(workdir, 'inventory')
+        os.environ['SR_CACHE_DIR'] = os.path.join(workdir, 'cache')
+
+        count = synthetic.generate(root, args.assets)
+        print(f"Generated {count} assets on a machine with {os.cpu_count()} CPUs")
+
+        import yaml
+
+        from sr.tools.inventory import inventory
+
+        print(f"libyaml available: {yaml.__with_libyaml__}")
+
+        for workers in args.workers:
+            shutil.rmtree(inventory.CACHE_DIR)
+            os.makedirs(inventory.CACHE_DIR)
+
+            start = time.perf_counter()
+            inventory.Inventory(root, workers=workers).root
+            elapsed = time.perf_counter() - start
+            print(f"{workers:>3} workers: cold {elapsed:7.2f}s")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
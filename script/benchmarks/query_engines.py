@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Benchmark the list based and bitset based query engines against a synthetic
+inventory.
+
+The list based engine is quadratic in the number of matches, so keep the
+inventory modest when including it.
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import synthetic
+
+QUERIES = [
+    'not cond:working or type:motor-*',
+    'cond:broken',
+    'type:battery and labelled:true',
+    'path:area-0-1 and !cond:working',
+    'code:{code}',
+    'parent of type:battery and assy:true',
+]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--assets', type=int, default=5000)
+    parser.add_argument(
+        '--skip-list-engine',
+        action='store_true',
+        help="Only time the bitset engine, for large inventories.",
+    )
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        root = os.path.join(workdir, 'inventory')
+        os.environ['SR_CACHE_DIR'] = os.path.join(workdir, 'cache')
+
+        count = synthetic.generate(root, args.assets)
+        print(f"Generated {count} assets")
+
+        from sr.tools.inventory import inventory, query_parser
+        from sr.tools.inventory.query_table import QueryTable
+
+        inv = inventory.Inventory(root)
+        nodes = list(inv.root.parts.values())
+
+        print(f"{'query':<40} {'list':>9} {'bitset':>9} {'cached':>9}  matches")
+        code = inventory.assetcode.num_to_code(synthetic.USER_NUMBER, 1)
+        for query in QUERIES:
+            query = query.format(code=code)
+            tree = query_parser.search_tree(query)
+
+            if args.skip_list_engine:
+                list_time = float('nan')
+            else:
+                list_time, _ = timed(lambda: tree.match(nodes))
+
+            # A fresh table, so that the columns are computed
+            bits_time, bits = timed(lambda: tree.match_bits(QueryTable(nodes)))
+            # The inventory's table, whose columns persist between queries
+            inv.query(query)
+            cached_time, _ = timed(lambda: inv.query(query))
+
+            print(
+                f"{query:<40} {list_time:8.3f}s {bits_time:8.3f}s "
+                f"{cached_time:8.3f}s  {QueryTable.count(bits)}",
+            )
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
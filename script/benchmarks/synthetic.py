@@ -0,0 +1,123 @@
+"""
+Generation of synthetic inventories for benchmarking the inventory tooling.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from sr.tools.inventory import assetcode  # noqa: E402
+
+USER_NUMBER = 7
+TYPES = ('motor-board', 'power-board', 'battery', 'servo-board', 'webcam')
+CONDITIONS = ('working', 'working', 'working', 'unknown', 'broken')
+
+PART = """\
+assetcode: '{code}'
+labelled: {labelled}
+description: A {name} generated for benchmarking.
+value: {value}
+condition: {condition}
+serial: SN{number:08d}
+development: false
+notes: |
+  Some free-form notes about this {name}, long enough to be representative of
+  the asset files in the real inventory.
+"""
+
+GROUP = """\
+assetcode: '{code}'
+description: A kit generated for benchmarking.
+value: 100
+elements:
+  - motor-board
+  - power-board
+  - battery
+"""
+
+
+def _write(path, content):
+    with open(path, 'w') as file:
+        file.write(content)
+
+
+def generate(root, count, depth=2, fanout=10, group_every=20):
+    """
+    Generate an inventory containing ``count`` assets at ``root``.
+
+    Assets are spread evenly over a tree of plain directories ``depth`` levels
+    deep with ``fanout`` sub-directories at each level. Every ``group_every``
+    assets a group is created, which holds the next few assets.
+    """
+    os.makedirs(os.path.join(root, '.meta', 'parts'), exist_ok=True)
+    os.makedirs(os.path.join(root, '.meta', 'assemblies'), exist_ok=True)
+    _write(
+        os.path.join(root, '.meta', 'users'),
+        f'Bench Mark <bench@example.com>: {USER_NUMBER}\n',
+    )
+    _write(
+        os.path.join(root, '.meta', 'parts', 'default'),
+        PART.format(
+            code='[ASSET_CODE]',
+            labelled='false',
+            name='part',
+            value=0,
+            condition='unknown',
+            number=0,
+        ).replace("'[ASSET_CODE]'", '[ASSET_CODE]'),
+    )
+    _write(
+        os.path.join(root, '.meta', 'assemblies', 'default'),
+        GROUP.format(code='[ASSET_CODE]').replace("'[ASSET_CODE]'", '[ASSET_CODE]'),
+    )
+
+    leaves = ['']
+    for level in range(depth):
+        leaves = [
+            os.path.join(leaf, f'area-{level}-{i}')
+            for leaf in leaves
+            for i in range(fanout)
+        ]
+
+    per_leaf = max(1, count // len(leaves))
+    number = 0
+    for leaf in leaves:
+        directory = os.path.join(root, leaf)
+        os.makedirs(directory, exist_ok=True)
+
+        group_dir = None
+        group_left = 0
+        for _ in range(per_leaf):
+            if number >= count:
+                return number
+            code = assetcode.num_to_code(USER_NUMBER, number)
+
+            if group_every and number % group_every == 0:
+                group_dir = os.path.join(directory, f'kit-sr{code}')
+                os.mkdir(group_dir)
+                _write(os.path.join(group_dir, 'info'), GROUP.format(code=code))
+                group_left = 3
+                number += 1
+                continue
+
+            name = TYPES[number % len(TYPES)]
+            target = directory
+            if group_left:
+                target = group_dir
+                group_left -= 1
+
+            _write(
+                os.path.join(target, f'{name}-sr{code}'),
+                PART.format(
+                    code=code,
+                    name=name,
+                    number=number,
+                    labelled='true' if number % 2 else 'false',
+                    value=number % 100,
+                    condition=CONDITIONS[number % len(CONDITIONS)],
+                ),
+            )
+            number += 1
+
+    return number
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+Benchmark building the tree of a deep synthetic inventory, and looking up the
+parts and types within each of its subtrees.
+
+The tree is built lazily, so that parsing the asset files doesn't dominate the
+time taken, and memory is measured with ``tracemalloc``.
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import synthetic
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--assets', type=int, default=20000)
+    parser.add_argument('--depth', type=int, default=10)
+    parser.add_argument('--fanout', type=int, default=2)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        root = os.path.join(workdir, 'inventory')
+        os.environ['SR_CACHE_DIR'] = os.path.join(workdir, 'cache')
+
+        count = synthetic.generate(
+            root,
+            args.assets,
+            depth=args.depth,
+            fanout=args.fanout,
+        )
+        print(f"Generated {count} assets, {args.depth} levels deep")
+
+        from sr.tools.inventory import inventory
+
+        def build():
+            return inventory.Inventory(root, lazy=True).root
+
+        def look_up(tree):
+            trees = [tree]
+            i = 0
+            while i < len(trees):
+                trees.extend(
+                    child
+                    for child in trees[i].children.values()
+                    if hasattr(child, 'children')
+                )
+                i += 1
+
+            for t in trees:
+                len(t.parts)
+                t.types.get('battery')
+            return len(trees)
+
+        # Time without tracing, as tracemalloc slows down allocation
+        build()  # warm the cache
+        start = time.perf_counter()
+        tree = build()
+        built = time.perf_counter() - start
+        trees = look_up(tree)
+        looked_up = time.perf_counter() - start - built
+        del tree
+
+        tracemalloc.start()
+        tree = build()
+        built_memory = tracemalloc.get_traced_memory()[0]
+        look_up(tree)
+        total_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        print(f"{'build':>10}: {built:7.3f}s  {built_memory / 2**20:7.1f} MiB")
+        print(
+            f"{'look up':>10}: {looked_up:7.3f}s  "
+            f"{(total_memory - built_memory) / 2**20:7.1f} MiB  ({trees} trees)",
+        )
+        print(
+            f"{'total':>10}: {built + looked_up:7.3f}s  "
+            f"{total_memory / 2**20:7.1f} MiB",
+        )
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -54,6 +54,8 @@ setup(
     ],
     extras_require={
         'cam-serial, mcv4b-part-code': ['pyudev'],
+        'inv-daemon': ['inotify_simple'],
+        'inv-history, check-my-git': ['pygit2'],
         'save-passwords': ['keyring'],
     },
     include_package_data=True,
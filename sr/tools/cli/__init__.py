@@ -4,36 +4,101 @@ import sys
 import traceback
 
 from sr.tools import __description__, __version__
-from sr.tools.inventory.inventory import NotAnInventoryError
+from sr.tools.inventory.errors import InvalidFileError, NotAnInventoryError
 
-# make sure to update this with new tools if they are created
-__all__ = [
-    'cam_serial',
-    'check_my_git',
-    'clone',
-    'comp_calculate_league_matches',
-    'help',
-    'inv_edit',
-    'inv_findpart',
-    'inv_history',
-    'inv_list_assy_templates',
-    'inv_list_templates',
-    'inv_mv',
-    'inv_new_asset',
-    'inv_new_group',
-    'inv_query',
-    'inv_set_attr',
-    'inv_show_parent',
-    'inv_show',
-    'inv_sync_asset',
-    'inv_touch',
-    'inv_validate',
-    'list_commands',
-    'mcv4b_part_code',
-    'repolist',
-    'schedule_knockout',
-    'update',
-]
+# The name of each command, the module it's in and its help text. This is kept
+# here, rather than found by importing every module, so that only the module
+# of the command being run needs to be imported. Make sure to update this with
+# new tools if they are created.
+COMMANDS = {
+    'cam-serial': (
+        'cam_serial',
+        'Displays the serial number of connected SR cameras',
+    ),
+    'check-my-git': (
+        'check_my_git',
+        'Checks whether you have git configured sanely.',
+    ),
+    'cog': ('clone', 'Clone an SR git repository'),
+    'clone': ('clone', 'Clone an SR git repository'),
+    'comp-calculate-league-matches': (
+        'comp_calculate_league_matches',
+        'Calculate team appearances in an SR league',
+    ),
+    'help': ('help', 'Get information about an sr command.'),
+    'inv-daemon': (
+        'inv_daemon',
+        "Keep the inventory loaded, so that other commands run quicker.",
+    ),
+    'inv-edit': ('inv_edit', 'Edit inventory items by part code.'),
+    'inv-findpart': (
+        'inv_findpart',
+        'Find the location of a specific item in the inventory.',
+    ),
+    'inv-history': ('inv_history', 'Get the history of some assets.'),
+    'inv-import': (
+        'inv_import',
+        "Create many new assets at once from a manifest.",
+    ),
+    'inv-list-assy-templates': (
+        'inv_list_assy_templates',
+        'List assembly templates.',
+    ),
+    'inv-list-templates': ('inv_list_templates', 'List inventory templates.'),
+    'inv-mv': ('inv_mv', "Move inventory items into the CWD."),
+    'inv-new-asset': (
+        'inv_new_asset',
+        "Create a new instance of an asset with a unique asset code.",
+    ),
+    'inv-new-group': (
+        'inv_new_group',
+        "Promote a directory to a tracked assembly.",
+    ),
+    'inv-query': ('inv_query', 'Perform query on the inventory'),
+    'inv-set-attr': (
+        'inv_set_attr',
+        "Sets an attribute on one or more items or assemblies.",
+    ),
+    'inv-showparent': ('inv_show_parent', 'Show parent of items.'),
+    'inv-show-parent': ('inv_show_parent', 'Show parent of items.'),
+    'inv-show': (
+        'inv_show',
+        'Show the metadata of a given part, and its git history.',
+    ),
+    'inv-sync-asset': (
+        'inv_sync_asset',
+        "Replace the contents of an asset file with the contents of its "
+        "corresponding template. WARNING: This command will completely "
+        "overwrite an asset file, this includes the 'labelled' field.",
+    ),
+    'inv-touch': ('inv_touch', 'Increment revision of an asset.'),
+    'inv-validate': ('inv_validate', 'Check the state of the inventory.'),
+    'list-commands': ('list_commands', 'List all available commands.'),
+    'mcv4b-part-code': (
+        'mcv4b_part_code',
+        "Finds connected MCv4b motorboards by searching or waiting for "
+        "insertion.  Two output formats are provided: 'code' - just the SR "
+        "part code; 'path' - just the local inventory.git path (see "
+        "--inv-dir)",
+    ),
+    'repolist': ('repolist', "Display a list of SR repos"),
+    'schedule-knockout': (
+        'schedule_knockout',
+        "Create the schedule for the first round of a knock-out",
+    ),
+    'update': ('update', 'Update the tools.'),
+}
+
+__all__ = sorted({module for module, _ in COMMANDS.values()})
+
+
+def _selected_command(args):
+    # The first argument which isn't an option, since the top-level options
+    # don't take values
+    for arg in args:
+        if not arg.startswith('-'):
+            return arg
+    return None
 
 
 def get_version():
@@ -54,10 +119,17 @@ def main(args=sys.argv):
         version=get_version(),
     )
 
+    # Only the module of the command being run is imported, and adds its full
+    # parser. The others just get a placeholder, for the help and for
+    # list-commands.
     subparsers = parser.add_subparsers()
-    for command in __all__:
-        name = f'{__name__}.{command}'
+    selected = COMMANDS.get(_selected_command(args[1:]), (None, None))[0]
+    if selected is not None:
+        name = f'{__name__}.{selected}'
         importlib.import_module(name).add_subparser(subparsers)
+    for command, (module, help_text) in COMMANDS.items():
+        if module != selected:
+            subparsers.add_parser(command, help=help_text)
 
     args = parser.parse_args(args=args[1:])
 
@@ -80,6 +152,9 @@ def main(args=sys.argv):
         except NotAnInventoryError as e:
             print(e, file=sys.stderr)
             sys.exit(2)
+        except InvalidFileError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
         except Exception as e:
             traceback.print_exc()
             print(e, file=sys.stderr)
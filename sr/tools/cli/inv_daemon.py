@@ -0,0 +1,61 @@
+def command(args):
+    import os
+    import sys
+
+    from sr.tools.inventory import daemon
+    from sr.tools.inventory.inventory import (
+        find_top_level_dir,
+        NotAnInventoryError,
+    )
+
+    top = find_top_level_dir()
+    if top is None:
+        raise NotAnInventoryError(os.getcwd())
+
+    client = daemon.connect(top)
+    if args.stop:
+        if client is None:
+            print("No inventory daemon is running.", file=sys.stderr)
+            sys.exit(1)
+        client.call('stop')
+        return
+
+    if client is not None:
+        pid = client.call('ping')['pid']
+        print(f"An inventory daemon is already running (pid {pid}).", file=sys.stderr)
+        sys.exit(1)
+
+    watcher = daemon.get_watcher(top, poll=args.poll)
+    server = daemon.InventoryDaemon(top, watcher=watcher)
+    print(
+        f"Serving the inventory at {top} on {server.socket_path}, watching for "
+        f"changes with {watcher.__class__.__name__}.",
+    )
+    try:
+        server.serve_forever(interval=args.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def add_subparser(subparsers):
+    parser = subparsers.add_parser(
+        'inv-daemon',
+        help="Keep the inventory loaded, so that other commands run quicker.",
+    )
+    parser.add_argument(
+        '--poll',
+        action='store_true',
+        help="Poll for changes, even if inotify is available.",
+    )
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=1.0,
+        help="How often to check for changes, in seconds (default: 1).",
+    )
+    parser.add_argument(
+        '--stop',
+        action='store_true',
+        help="Stop the daemon which is running for this inventory.",
+    )
+    parser.set_defaults(func=command)
@@ -5,7 +5,7 @@ def command(args):
     from sr.tools.inventory import assetcode
     from sr.tools.inventory.inventory import get_inventory
 
-    inv = get_inventory()
+    inv = get_inventory(lazy=True, daemon=True)
 
     parts = []
     for c in args.part_code:
@@ -18,7 +18,7 @@ def command(args):
             sys.exit(1)
 
         try:
-            part = inv.root.parts[code]
+            part = inv.locate(code)
         except KeyError:
             print("Error: There is no part with code %s." % code, file=sys.stderr)
             sys.exit(1)
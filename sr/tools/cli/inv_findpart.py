@@ -13,7 +13,7 @@ def command(args):
     COLOUR_RED = "\033[1;31m"
     COLOUR_YELLOW = "\033[1;33m"
 
-    inv = get_inventory()
+    inv = get_inventory(lazy=True)
 
     parts = []
     spec_type = ASSET_CODE
@@ -56,14 +56,16 @@ def command(args):
         else:
             path = part.path
 
-        if args.asset_stat and hasattr(part, "condition"):
-            if part.condition == "broken":
+        if args.asset_stat:
+            # Groups report the condition of their elements as a whole
+            condition = part.effective_condition
+            if condition == "broken":
                 stat_colour = COLOUR_RED
-            elif part.condition == "unknown":
+            elif condition == "unknown":
                 stat_colour = COLOUR_YELLOW
-            elif part.condition == "working":
+            elif condition == "working":
                 stat_colour = COLOUR_GREEN
-            print(path, stat_colour, part.condition, COLOUR_RESET)
+            print(path, stat_colour, condition, COLOUR_RESET)
         else:
             print(path)
 
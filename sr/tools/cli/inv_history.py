@@ -1,190 +1,136 @@
-class CachedAssetFinder:
+def describe(event):
     """
-    A class that can be used for finding assets in trees.
+    Describe an event in the history of an asset.
 
-    The results are also cached to improve performance.
-
-    :param repo: The repository to work on.
-    """
-
-    def __init__(self, repo):
-        self.repo = repo
-
-    def search(self, code=None, id=None, path=None):  # noqa: A002
-        """
-        Set the search mode.
-
-        The finder has two modes, one for finding assets from their code and
-        one for finding assets from their blob ID and path.
-
-        :param code: The asset code to search for.
-        :param id: The blob ID to search for.
-        :param path: The path to search for.
-        """
-        self._cache = {}
-        self.search_code = code
-        self.search_id = id
-        self.search_path = path
-
-    def _test_object(self, id_, name, path):
-        if self.search_id and self.search_path:
-            if id_ == self.search_id and self.search_path == path:
-                return True
-        else:
-            if self.search_code in name:
-                return True
-
-    def test(self, obj, name=None, path=''):
-        """
-        Test if the Git object (typically a tree) contains the asset.
-
-        :param obj: The object to test.
-        """
-        try:
-            return self._cache[obj.id]
-        except KeyError:
-            pass
-
-        import pygit2
-
-        if isinstance(obj, pygit2.Tree):
-            for entry in obj:
-                entry_path = '/'.join([path, entry.name])
-                res = self.test(self.repo[entry.id], entry.name, entry_path)
-                if res:
-                    return res
-
-            self._cache[obj.id] = None
-            return None
-        elif isinstance(obj, pygit2.Blob):
-            if self._test_object(obj.id, name, path):
-                return (self.search_code, obj.id, path)
-            else:
-                self._cache[obj.id] = None
-                return None
-        else:
-            raise ValueError('Must be a tree or blob.')
-
-
-def find_asset_by_code(asset_finder, asset_code, all_commits):
+    :param event: The event.
+    :type event: :class:`~sr.tools.inventory.history.HistoryEvent`
+    :rtype: str
     """
-    Find an asset by the asset code.
-
-    :param asset_finder: The cached asset finder to use.
-    :param asset_code: The code of the asset to search for.
-    :param all_commits: All the commits to look for.
-    :returns: A pair containing the result from the 'test' and the commit.
-    """
-    asset_finder.search(code=asset_code)
-
-    for commit in all_commits:
-        res = asset_finder.test(commit.tree)
-        if res:
-            return res, commit
-
-
-def get_history(repo, asset_code):
-    """
-    Get the history of an asset in the repository.
-
-    :param repo: The repository to look in.
-    :param asset_code: The code of the asset to look for.
-    :returns: An iterator where each item is a tuple containing a status of the
-              the event, the commit and any additional arguments.
-    """
-    import pygit2
-
-    asset_finder = CachedAssetFinder(repo)
-    asset_finder.search(code=asset_code)
-
-    sort_mode = pygit2.GIT_SORT_TOPOLOGICAL | pygit2.GIT_SORT_REVERSE
-    all_commits = repo.walk(repo.head.target, sort_mode)
-
-    old_res, _ = added_res, added_commit = find_asset_by_code(
-        asset_finder,
-        asset_code,
-        all_commits,
-    )
-    asset_finder.search(id=added_res[1], path=added_res[2])
-
-    yield ('A', added_commit, added_res[2])
-
-    for commit in all_commits:
-        res = asset_finder.test(commit.tree)
-        if res is None:
-            res2, commit = find_asset_by_code(asset_finder, asset_code, all_commits)
-            asset_finder.search(id=res2[1], path=res2[2])
-
-            if old_res[2] != res2[2]:
-                yield ('R', commit, (old_res[2], res2[2]))
-            else:
-                yield ('M', commit, (old_res[1], res2[1]))
+    import os
 
-            old_res = res2
+    if event.status == 'A':
+        return f"'{event.path}' created."
+    elif event.status == 'R':
+        return "Moved from '{}' into '{}'.".format(
+            os.path.dirname(event.old_path),
+            os.path.dirname(event.path),
+        )
+    elif event.status == 'M':
+        return 'Contents modifed.'
+    elif event.status == 'D':
+        return f"'{event.old_path}' deleted."
+    return 'Something happened.'
 
 
 def command(args):
     import datetime
-    import os
+    import json
+    import sys
     import textwrap
 
-    import pygit2
-
+    from sr.tools import git
     from sr.tools.environment import get_terminal_size
+    from sr.tools.inventory.history import get_histories, HistoryIndex
     from sr.tools.inventory.inventory import assetcode, get_inventory
 
-    inventory = get_inventory()
-    repo = pygit2.Repository(inventory.root_path)
+    if not args.asset_codes and args.query is None:
+        print("Give the codes of some assets or a query.", file=sys.stderr)
+        sys.exit(1)
 
-    asset_code = f'sr{assetcode.normalise(args.asset_code)}'
+    inventory = get_inventory(daemon=args.query is not None)
+    repo = git.repository(inventory.root_path)
 
-    for event in get_history(repo, asset_code):
-        status = event[0]
-        commit = event[1]
-
-        if args.output == 'commits':
-            print(commit.id)
-        else:
-            description = ''
-            if status == 'A':
-                description = f"'{event[2]}' created."
-            elif status == 'R':
-                old_path = event[2][0]
-                new_path = event[2][1]
-                description = "Moved from '{}' into '{}'.".format(
-                    os.path.dirname(old_path),
-                    os.path.dirname(new_path),
-                )
-            elif status == 'M':
-                description = 'Contents modifed.'
-            else:
-                description = 'Something happened.'
+    codes = [assetcode.normalise(code) for code in args.asset_codes]
+    if args.query is not None:
+        from pyparsing import ParseException
 
+        try:
+            for asset in inventory.query(args.query):
+                asset_code = getattr(asset, 'code', None)
+                if asset_code is not None:
+                    codes.append(asset_code)
+        except ParseException as e:
+            print("Query Error:", e, file=sys.stderr)
+            sys.exit(1)
+    codes = list(dict.fromkeys(codes))
+    prefix = len(codes) > 1
+
+    if args.no_index:
+        events = get_histories(repo, codes)
+    else:
+        index = HistoryIndex(repo)
+        index.update()
+        events = (
+            (code, event)
+            for code in codes
+            for event in index.events(code)
+        )
+
+    found = set()
+    for code, event in events:
+        found.add(code)
+        if args.output == 'json':
+            print(json.dumps(dict(code=code, **event._asdict())), flush=True)
+            continue
+        elif args.output == 'commits':
+            print(f'sr{code} {event.commit}' if prefix else event.commit)
+            continue
+
+        description = describe(event)
+        if prefix:
+            description = f'sr{code}: {description}'
+        if args.output == 'full':
             terminal_width, terminal_height = get_terminal_size()
+            commit = repo[event.commit]
+            print(
+                'Commit {} by {} on {}'.format(
+                    commit.id,
+                    commit.committer.name,
+                    datetime.datetime.fromtimestamp(commit.commit_time),
+                ),
+            )
+
+            for line in textwrap.wrap(description, width=terminal_width - 2):
+                print(' ', line)
+            print()
+        else:
+            print(description)
 
-            if args.output == 'full':
-                print(
-                    'Commit {} by {} on {}'.format(
-                        commit.id,
-                        commit.committer.name,
-                        datetime.datetime.fromtimestamp(commit.commit_time),
-                    ),
-                )
-
-                for line in textwrap.wrap(description, width=terminal_width - 2):
-                    print(' ', line)
-                print()
-            else:
-                print(description)
+    missing = [code for code in codes if code not in found]
+    for code in missing:
+        print(f"There is no history for sr{code}.", file=sys.stderr)
+    if missing:
+        sys.exit(1)
 
 
 def add_subparser(subparsers):
-    parser = subparsers.add_parser('inv-history', help='Get the history of an asset.')
-    parser.add_argument('asset_code', help='The code of the asset to inspect.')
+    parser = subparsers.add_parser(
+        'inv-history',
+        help='Get the history of some assets.',
+    )
+    parser.add_argument(
+        'asset_codes',
+        metavar='asset_code',
+        nargs='*',
+        help='The codes of the assets to inspect.',
+    )
+    parser.add_argument(
+        '--query',
+        '-q',
+        help="Also inspect the assets found by a query.",
+    )
     parser.add_argument(
         '--output',
         '-o',
-        choices=['commits', 'description', 'full'],
+        choices=['commits', 'description', 'full', 'json'],
         default='full',
+        help="The format to print events in. 'json' prints a JSON object for "
+        "each event on its own line (default: full).",
+    )
+    parser.add_argument(
+        '--no-index',
+        action='store_true',
+        help="Follow the assets through the commits rather than using the "
+        "history index.",
     )
     parser.set_defaults(func=command)
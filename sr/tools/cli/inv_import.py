@@ -0,0 +1,247 @@
+TRUE_VALUES = ('1', 'true', 'yes', 'y')
+
+
+class _Templates:
+    """Reads each template at most once, falling back to the default one."""
+
+    def __init__(self, gitdir):
+        self.gitdir = gitdir
+        self._texts = {}
+        self._elements = {}
+
+    def text(self, kind, name):
+        import os
+
+        key = (kind, name)
+        if key not in self._texts:
+            path = os.path.join(self.gitdir, ".meta", kind, name)
+            if not os.path.isfile(path):
+                print(
+                    f'A template for the {kind[:-1]} "{name}" could not be '
+                    'found. The default template will be used.',
+                )
+                path = os.path.join(self.gitdir, ".meta", kind, "default")
+            with open(path) as file:
+                self._texts[key] = file.read()
+        return self._texts[key]
+
+    def elements(self, name):
+        """
+        Get the elements of an assembly, as pairs of the name of each element
+        and the number of them, since elements may be listed as a mapping of
+        a name to a count.
+        """
+        from sr.tools import yamlio
+
+        if name not in self._elements:
+            data = yamlio.load(self.text("assemblies", name))
+            elements = []
+            for element in (data or {}).get("elements", []):
+                count = 1
+                if isinstance(element, dict) and len(element) == 1:
+                    element, count = list(element.items())[0]
+                if not isinstance(element, str) or not isinstance(count, int):
+                    raise ValueError(
+                        f'the assembly template "{name}" has an invalid '
+                        f"element: {element!r}",
+                    )
+                elements.append((element, count))
+            self._elements[name] = elements
+        return self._elements[name]
+
+
+def load_manifest(path):
+    """
+    Load a manifest of assets to create.
+
+    The manifest is either a CSV file with a header row, or a YAML list of
+    mappings. Each row or mapping has a ``template`` and optionally a
+    ``count`` (defaulting to one), a ``directory`` to create the assets in
+    (defaulting to the current one) and an ``assembly`` flag, which makes it
+    create groups from an assembly template, along with all their elements.
+
+    :param str path: The path to the manifest.
+    :returns: A list of dicts with the keys ``template``, ``count``,
+              ``directory`` and ``assembly``.
+    :raises ValueError: If the manifest is invalid.
+    """
+    import csv
+
+    from sr.tools import yamlio
+
+    if path.lower().endswith(".csv"):
+        with open(path, newline="") as file:
+            rows = list(csv.DictReader(file))
+    else:
+        rows = yamlio.load_file(path) or []
+        if not isinstance(rows, list):
+            raise ValueError(f"{path}: the manifest must be a list of assets")
+
+    entries = []
+    for number, row in enumerate(rows, 1):
+        if not isinstance(row, dict) or not row.get("template"):
+            raise ValueError(f"{path}: entry {number} has no template")
+
+        try:
+            count = int(row.get("count") or 1)
+        except (TypeError, ValueError):
+            count = 0
+        if count < 1:
+            raise ValueError(f"{path}: entry {number} has an invalid count")
+
+        assembly = row.get("assembly") or False
+        if isinstance(assembly, str):
+            assembly = assembly.strip().lower() in TRUE_VALUES
+
+        entries.append({
+            "template": str(row["template"]),
+            "count": count,
+            "directory": str(row.get("directory") or "."),
+            "assembly": bool(assembly),
+        })
+    return entries
+
+
+def _write_asset(path, template, assetcd):
+    with open(path, "w") as file:
+        file.write(template.replace("[ASSET_CODE]", assetcd))
+
+
+def create_assets(gitdir, entries, allocate, verbose=False):
+    """
+    Create the assets in a manifest.
+
+    Each template is read once however many assets are created from it, and
+    the codes of all the assets are allocated with a single call. All the
+    templates are read before any codes are allocated or files are created,
+    so that an invalid template doesn't leave anything half-done.
+
+    :param str gitdir: The root of the inventory.
+    :param list entries: The entries of the manifest, as returned by
+                         :func:`load_manifest`.
+    :param allocate: A function which allocates the given number of new asset
+                     codes, returning them as a list.
+    :param bool verbose: Whether to print the name of each new asset.
+    :returns: The paths of the new assets and groups, not including the
+              elements within the groups, and the codes of all the assets.
+    :rtype: tuple
+    :raises ValueError: If an assembly template has an invalid element.
+    """
+    import os
+
+    templates = _Templates(gitdir)
+
+    total = 0
+    for entry in entries:
+        name = entry["template"]
+        size = 1
+        if entry["assembly"]:
+            templates.text("assemblies", name)
+            for element, count in templates.elements(name):
+                templates.text("parts", element)
+                size += count
+        else:
+            templates.text("parts", name)
+        total += size * entry["count"]
+    if total == 0:
+        return [], []
+    allocated = allocate(total)
+    codes = iter(allocated)
+
+    paths = []
+    for entry in entries:
+        name = entry["template"]
+        directory = entry["directory"]
+        os.makedirs(directory, exist_ok=True)
+
+        for _ in range(entry["count"]):
+            assetcd = next(codes)
+            path = os.path.join(directory, f"{name}-sr{assetcd}")
+            if entry["assembly"]:
+                os.mkdir(path)
+                _write_asset(
+                    os.path.join(path, "info"),
+                    templates.text("assemblies", name),
+                    assetcd,
+                )
+                for element, count in templates.elements(name):
+                    for _ in range(count):
+                        elementcd = next(codes)
+                        _write_asset(
+                            os.path.join(path, f"{element}-sr{elementcd}"),
+                            templates.text("parts", element),
+                            elementcd,
+                        )
+            else:
+                _write_asset(path, templates.text("parts", name), assetcd)
+
+            if verbose:
+                print(f'Created "{path}"')
+            paths.append(path)
+    return paths, allocated
+
+
+def command(args):
+    import subprocess
+    import sys
+    import time
+
+    from sr.tools.inventory.inventory import get_inventory
+
+    try:
+        entries = load_manifest(args.manifest)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    start = time.time()
+
+    inventory = get_inventory(daemon=True)
+    gitdir = inventory.root_path
+
+    userno = inventory.current_user_number
+
+    try:
+        paths, codes = create_assets(
+            gitdir,
+            entries,
+            lambda count: inventory.allocate_asset_codes(userno, count),
+            verbose=args.verbose,
+        )
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.git_add and paths:
+        subprocess.check_call(["git", "add", "--"] + paths)
+
+    elapsed = time.time() - start
+    rate = len(codes) / elapsed if elapsed > 0 else float("inf")
+    print(f"Created {len(codes)} assets in {elapsed:.2f}s ({rate:.0f} assets/s).")
+
+
+def add_subparser(subparsers):
+    parser = subparsers.add_parser(
+        'inv-import',
+        help="Create many new assets at once from a manifest.",
+    )
+    parser.add_argument(
+        "-g",
+        "--git-add",
+        action="store_true",
+        default=False,
+        help="Stage the new assets with git.",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        default=False,
+        help="Print the name of each new asset.",
+    )
+    parser.add_argument(
+        "manifest",
+        metavar="MANIFEST",
+        help="A YAML or CSV file listing the assets to create.",
+    )
+    parser.set_defaults(func=command)
@@ -1,15 +1,15 @@
 def command(args):
     import os
-    import subprocess
     import sys
 
+    from sr.tools import git
     from sr.tools.inventory import assetcode
     from sr.tools.inventory.inventory import get_inventory
 
-    inv = get_inventory()
+    inv = get_inventory(lazy=True, daemon=True)
     cwd = os.getcwd()
 
-    parts = []
+    paths = []
     for c in args.assetcodes:
         code = assetcode.normalise(c)
 
@@ -20,32 +20,35 @@ def command(args):
             sys.exit(1)
 
         try:
-            part = inv.root.parts[code]
+            part = inv.locate(code)
         except KeyError:
             print(f"Error: There is no part with code {code}.", file=sys.stderr)
             sys.exit(1)
 
-        if part.parent.path == cwd:
+        if part.parent_path == cwd:
             print(f"Warning: Part {code} is already in {cwd}.")
             continue
 
-        if hasattr(part.parent, "code"):
+        if part.parent_code is not None:
             if args.assy:
-                parts.append(part.parent)
+                paths.append(part.parent_path)
             else:
                 print(
                     f"Warning: Part {code} is in an assembly.",
                     "To move the assembly, use the -a switch.",
                     file=sys.stderr,
                 )
-                parts.append(part)
+                paths.append(part.path)
 
         else:
-            parts.append(part)
+            paths.append(part.path)
 
-    if parts:
-        paths = [x.path for x in parts]
-        subprocess.check_call(['git', 'mv'] + paths + ['.'])
+    if paths:
+        try:
+            git.move(paths, '.')
+        except git.GitError as e:
+            print(f"Error: {e}.", file=sys.stderr)
+            sys.exit(1)
     else:
         print("Warning: No parts to move", file=sys.stderr)
 
@@ -1,13 +1,13 @@
-def command(args):
-    import os
-
-    from sr.tools.environment import open_editor
-    from sr.tools.inventory.inventory import get_inventory
-
-    assetname = args.assetname
+def create_asset(gitdir, assetname, assetcd):
+    """
+    Create a new asset in the current directory from its template.
 
-    inventory = get_inventory()
-    gitdir = inventory.root_path
+    :param str gitdir: The root of the inventory.
+    :param str assetname: The name of the asset's template.
+    :param str assetcd: The asset's code.
+    :returns: The path of the new asset file.
+    """
+    import os
 
     # Check that a template for the new asset exists
     templatefn = os.path.join(gitdir, ".meta", "parts", assetname)
@@ -18,10 +18,6 @@ def command(args):
         )
         templatefn = os.path.join(gitdir, ".meta", "parts", "default")
 
-    # Get the git name/email of the user
-    userno = inventory.current_user_number
-    assetcd = inventory.get_next_asset_code(userno)
-
     assetfn = f"{assetname}-sr{assetcd}"
 
     print(
@@ -30,17 +26,27 @@ def command(args):
 
     # Copy the template to the actual asset file
     # Insert the asset code into the file while we're at it
-    templatefile = open(templatefn)
-    assetfile = open(assetfn, "w")
+    with open(templatefn) as templatefile, open(assetfn, "w") as assetfile:
+        for line in templatefile:
+            assetfile.write(line.replace("[ASSET_CODE]", assetcd))
 
-    for line in templatefile:
-        assetfile.write(line.replace("[ASSET_CODE]", assetcd))
+    return assetfn
 
-    templatefile.close()
-    assetfile.close()
 
-    if args.start_editor:
-        open_editor(assetfn)
+def command(args):
+    from sr.tools.environment import open_editor
+    from sr.tools.inventory.inventory import get_inventory
+
+    inventory = get_inventory(daemon=True)
+    gitdir = inventory.root_path
+
+    # Get the git name/email of the user
+    userno = inventory.current_user_number
+    for assetcd in inventory.allocate_asset_codes(userno, args.count):
+        assetfn = create_asset(gitdir, args.assetname, assetcd)
+
+        if args.start_editor:
+            open_editor(assetfn)
 
 
 def add_subparser(subparsers):
@@ -56,6 +62,13 @@ def add_subparser(subparsers):
         dest="start_editor",
         help="Open up the newly created asset file in $EDITOR",
     )
+    parser.add_argument(
+        "-n",
+        "--count",
+        type=int,
+        default=1,
+        help="The number of assets to create (default: 1).",
+    )
     parser.add_argument(
         "assetname",
         metavar="ASSET",
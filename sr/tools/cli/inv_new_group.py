@@ -1,9 +1,7 @@
 def command(args):
-    import argparse
     import os
 
-    import yaml
-
+    from sr.tools import yamlio
     from sr.tools.cli import inv_new_asset
     from sr.tools.environment import open_editor
     from sr.tools.inventory.inventory import get_inventory
@@ -18,8 +16,17 @@ def command(args):
     if not os.path.isfile(templatefn):
         templatefn = os.path.join(gitdir, ".meta", "assemblies", "default")
 
+    elements = []
+    if args.create_all:
+        assy_data = yamlio.load_file(templatefn)
+        elements = assy_data.get("elements", [])
+
+    # Allocate the codes of the group and all its elements at once
     userno = inventory.current_user_number
-    assetcd = inventory.get_next_asset_code(userno)
+    assetcd, *elementcds = inventory.allocate_asset_codes(
+        userno,
+        1 + len(elements),
+    )
 
     groupname = f"{dirname}-sr{assetcd}"
 
@@ -44,15 +51,12 @@ def command(args):
     if args.start_editor:
         open_editor(os.path.join(groupname, "info"))
 
-    if args.create_all:
-        assy_data = yaml.safe_load(open(templatefn))
-        if "elements" in assy_data:
-            os.chdir(groupname)
-            for element in assy_data["elements"]:
-                other_args = argparse.Namespace()
-                other_args.assetname = element
-                other_args.start_editor = args.start_editor
-                inv_new_asset.command(other_args)
+    if elements:
+        os.chdir(groupname)
+        for element, elementcd in zip(elements, elementcds):
+            assetfn = inv_new_asset.create_asset(gitdir, element, elementcd)
+            if args.start_editor:
+                open_editor(assetfn)
 
 
 def add_subparser(subparsers):
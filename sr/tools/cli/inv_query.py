@@ -5,17 +5,28 @@ def command(args):
 
     from sr.tools.inventory.inventory import get_inventory
 
-    inventory = get_inventory()
+    inventory = get_inventory(daemon=True)
 
     query_str = args.query
     style = 'codes' if args.codes else 'paths'
     verbose = args.v
 
     try:
+        if args.explain:
+            print(inventory.explain(query_str))
+            return
+
         count = 0
         for asset in inventory.query(query_str):
+            if style == 'codes':
+                # Plain directories (such as from ``parent of``) have no code
+                asset_code = getattr(asset, 'code', None)
+                if asset_code is None:
+                    continue
+                print(asset_code)
+            else:
+                print(asset.path)
             count += 1
-            print(asset.code if style == 'codes' else asset.path)
         if verbose:
             print(f"# {count} results", file=sys.stderr)
     except ParseException as e:
@@ -28,5 +39,10 @@ def add_subparser(subparsers):
     parser.add_argument('--codes', action='store_true')
     parser.add_argument('--paths', action='store_true')
     parser.add_argument('-v', action='store_true')
+    parser.add_argument(
+        '--explain',
+        action='store_true',
+        help="Show how the query would be evaluated, rather than running it.",
+    )
     parser.add_argument('query')
     parser.set_defaults(func=command)
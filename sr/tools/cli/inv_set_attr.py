@@ -27,19 +27,19 @@ def replace_line(path, key, value):
 def command(args):
     import sys
 
-    from sr.tools.inventory import assetcode
     from sr.tools.inventory.inventory import get_inventory
 
-    inv = get_inventory()
+    inv = get_inventory(lazy=True, daemon=True)
 
     for code in args.asset:
-        part = inv.root.parts[assetcode.normalise(code)]
-        if part is not None:
-            replace_line(part.info_path, args.attrname, args.attrvalue)
-        else:
+        try:
+            part = inv.locate(code)
+        except KeyError:
             print("Could not find asset:", code, file=sys.stderr)
             sys.exit(1)
 
+        replace_line(part.info_path, args.attrname, args.attrvalue)
+
 
 def add_subparser(subparsers):
     parser = subparsers.add_parser(
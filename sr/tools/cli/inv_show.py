@@ -1,24 +1,19 @@
 def command(args):
     import pydoc
-    import subprocess
 
-    from sr.tools.inventory import assetcode
+    from sr.tools import git
     from sr.tools.inventory.inventory import get_inventory
 
-    inv = get_inventory()
+    inv = get_inventory(lazy=True, daemon=True)
 
-    partcode = assetcode.normalise(args.partcode)
-    part = inv.root.parts[partcode]
+    part = inv.locate(args.partcode)
 
     pager_text = "Full path: " + part.path + '\n'
     with open(part.info_path) as info_file:
         pager_text += info_file.read() + '\n'
 
     pager_text += "Log\n===\n"
-    pager_text += subprocess.check_output(
-        ['git', '--no-pager', 'log', '--color', '--follow', '-C', '-M', part.path],
-        universal_newlines=True,
-    )
+    pager_text += git.log(part.path, color=True)
 
     pydoc.pager(pager_text)
 
@@ -1,10 +1,11 @@
 def command(args):
+    import os
     import sys
 
     from sr.tools.inventory import assetcode
     from sr.tools.inventory.inventory import get_inventory
 
-    inv = get_inventory()
+    inv = get_inventory(lazy=True, daemon=True)
 
     parts = []
     for c in args.part_code:
@@ -17,7 +18,7 @@ def command(args):
             sys.exit(1)
 
         try:
-            part = inv.root.parts[code]
+            part = inv.locate(code)
         except KeyError:
             print("Error: There is no part with code %s." % code, file=sys.stderr)
             sys.exit(1)
@@ -27,11 +28,12 @@ def command(args):
     for part in parts:
         print("# item -> parent")
 
-        if hasattr(part.parent, "code"):
-            print(f"{part.code} -> {part.parent.code}")
+        if part.parent_code is not None:
+            print(f"{part.code} -> {part.parent_code}")
 
-        elif hasattr(part.parent, "name"):
-            print(f"{part.code} -> dir({part.parent.name})")
+        else:
+            parent_name = os.path.basename(part.parent_path)
+            print(f"{part.code} -> dir({parent_name})")
 
 
 def command_deprecated(args):
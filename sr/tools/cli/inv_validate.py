@@ -1,50 +1,42 @@
-CHECKS = []
-
-
-def check(fn):
-    CHECKS.append(fn)
-    return fn
-
-
-def get_duplicates(items):
-    import collections
-
-    return [x for x, y in collections.Counter(items).items() if y > 1]
-
-
-@check
-def check_no_duplicates(inventory):
-    duplicate_asset_codes = get_duplicates(inventory.asset_codes)
-    if duplicate_asset_codes:
-        codes_str = ", ".join(duplicate_asset_codes)
-        return "There are duplicate asset codes: " + codes_str
-
-
-@check
-def check_assets_are_valid(inventory):
-    from sr.tools.inventory.assetcode import is_valid
-
-    invalid_asset_codes = [code for code in inventory.asset_codes if not is_valid(code)]
-
-    if invalid_asset_codes:
-        codes_str = ", ".join(invalid_asset_codes)
-        return "There are invalid asset codes: " + codes_str
+def command(args):
+    import json
+    import os
+    import sys
 
+    from sr.tools.inventory.inventory import (
+        find_top_level_dir,
+        NotAnInventoryError,
+    )
+    from sr.tools.inventory.validation import changed_since, validate
 
-def command(args):
-    from sr.tools.inventory.inventory import get_inventory
+    root_path = find_top_level_dir()
+    if root_path is None:
+        raise NotAnInventoryError(os.getcwd())
 
-    inventory = get_inventory()
+    changed = None
+    if args.since is not None:
+        changed = changed_since(root_path, args.since)
 
+    # Problems are printed as they're found, rather than once every check has
+    # finished.
     errors = 0
-    for check_fn in CHECKS:
-        message = check_fn(inventory)
-        if message:
-            print(message)
-            errors += 1
+    for problem in validate(root_path, workers=args.jobs, changed=changed):
+        errors += 1
+        if args.format == 'json':
+            print(json.dumps(problem._asdict()), flush=True)
+        elif problem.path is None:
+            print(problem.message, flush=True)
+        else:
+            print(f"{problem.path}: {problem.message}", flush=True)
 
-    if errors == 0:
-        print('No problems found. :)')
+    if args.format == 'text':
+        if errors == 0:
+            print('No problems found. :)')
+        else:
+            print(f'Found {errors} problems.')
+
+    if errors:
+        sys.exit(1)
 
 
 def add_subparser(subparsers):
@@ -52,4 +44,27 @@ def add_subparser(subparsers):
         'inv-validate',
         help='Check the state of the inventory.',
     )
+    parser.add_argument(
+        '--format',
+        choices=['text', 'json'],
+        default='text',
+        help="The format to print problems in. 'json' prints a JSON object "
+        "for each problem on its own line (default: text).",
+    )
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        default=None,
+        help="The number of processes to check asset files in (default: "
+        "$SR_INVENTORY_WORKERS, or the number of CPUs).",
+    )
+    parser.add_argument(
+        '--since',
+        metavar='REV',
+        default=None,
+        help="Only load and check the files of assets which have changed "
+        "since a git revision. Asset codes and names are still checked "
+        "throughout the inventory.",
+    )
     parser.set_defaults(func=command)
@@ -36,23 +36,18 @@ def partcode_match(device):
     Returns True if the udev Device has a valid SR partcode in its 'serial'
     attribute.
     """
-    import re
-
-    from sr.tools.inventory import assetcode
+    from sr.tools.inventory.assetcode import CODEC
 
     if 'serial' not in device.attributes:
         return False
 
-    ALPHA = "".join(assetcode.alphabet_lut)
-    PARTCODE_RE = re.compile(f"sr([{ALPHA}]+)$", re.IGNORECASE)
-
     # does it look like a partcode?
-    match = PARTCODE_RE.match(device.attributes['serial'])
+    match = CODEC.regex.fullmatch(device.attributes['serial'])
     if not match:
         return False
     try:
         # is the partcode valid?
-        assetcode.code_to_num(match.groups()[0])
+        CODEC.decode(match.group(1))
         return True
     except ValueError:
         return False
@@ -100,11 +95,9 @@ def wait_for_first_insertion(context):
 
 
 def command(args):
-    import os
-
     import pyudev
 
-    from sr.tools.inventory import query
+    from sr.tools.inventory.inventory import get_inventory
 
     context = pyudev.Context()
 
@@ -119,11 +112,11 @@ def command(args):
         if args.output == "code":
             print(serial)
         else:
-            os.chdir(args.inv_dir)
-            res = query.query(f"code:{serial}")[0]
+            inventory = get_inventory(args.inv_dir, daemon=True)
+            location = inventory.locate(serial)
 
             if args.output == "path":
-                print(res.path)
+                print(location.path)
 
 
 def add_subparser(subparsers):
@@ -13,7 +13,7 @@ def command(args):
     import math
     import sys
 
-    import yaml
+    from sr.tools import yamlio
 
     # Round the number of teams up to a power of two
     rounded_teams = int(2 ** math.ceil(math.log(args.n_teams, 2)))
@@ -48,7 +48,7 @@ def command(args):
         matches[ins_order[n % n_matches]].append(n)
 
     if args.yaml:
-        sys.stdout.write(yaml.dump(matches))
+        sys.stdout.write(yamlio.dump(matches))
     else:
         for n, match in enumerate(matches):
             print(" {}:\t{}".format(n, "\t".join([str(x) for x in match])))
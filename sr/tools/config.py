@@ -3,8 +3,7 @@
 import getpass
 import sys
 
-import yaml
-
+from sr.tools import yamlio
 from sr.tools.environment import get_config_filename
 
 try:
@@ -42,7 +41,7 @@ class Config(dict):
         :raises IOError: If the YAML file cannot be read.
         """
         with open(fname) as file:
-            d = yaml.safe_load(file)
+            d = yamlio.load(file)
 
         if d is not None:
             self.update(d)
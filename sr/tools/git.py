@@ -0,0 +1,309 @@
+"""
+Access to git repositories from within the tools.
+
+Operations are done in-process with ``pygit2`` where possible, and by running
+``git`` otherwise. Importing ``pygit2`` takes much longer than running ``git``
+once, so it's only used by processes which have already imported it, or which
+use git often enough for it to pay off. The repository object for each
+checkout is shared for the lifetime of the process.
+"""
+
+import datetime
+import os
+import subprocess
+import sys
+
+# The number of git operations to run with ``git`` before importing pygit2
+SUBPROCESS_LIMIT = 16
+
+_operations = 0
+_pygit2_missing = False
+# Repository objects, by the path of their git directory
+_repositories = {}
+
+
+class GitError(Exception):
+    """Raised when a git operation fails."""
+
+
+def _pygit2():
+    """Get the pygit2 module, if it should be used for the next operation."""
+    global _operations, _pygit2_missing
+
+    _operations += 1
+    pygit2 = sys.modules.get('pygit2')
+    if pygit2 is None and not _pygit2_missing and _operations > SUBPROCESS_LIMIT:
+        try:
+            import pygit2
+        except ImportError:
+            _pygit2_missing = True
+    return pygit2
+
+
+def repository(path=None):
+    """
+    Get the repository containing a directory.
+
+    The repository object is shared with everything else which asks for the
+    same repository. This always uses ``pygit2``.
+
+    :param str path: The directory. If this is None, the current working
+                     directory is used.
+    :returns: The repository, or None if the directory isn't in one.
+    :rtype: :class:`pygit2.Repository`
+    :raises ImportError: If ``pygit2`` is not installed.
+    """
+    import pygit2
+
+    gitdir = pygit2.discover_repository(os.path.abspath(path or os.curdir))
+    if gitdir is None:
+        return None
+    try:
+        return _repositories[gitdir]
+    except KeyError:
+        repo = _repositories[gitdir] = pygit2.Repository(gitdir)
+        return repo
+
+
+def _run(args, cwd=None):
+    return subprocess.check_output(
+        ['git'] + args,
+        cwd=cwd,
+        universal_newlines=True,
+    )
+
+
+def top_level(path=None):
+    """
+    Find the top level of the working tree containing a directory.
+
+    :param str path: The directory. If this is None, the current working
+                     directory is used.
+    :returns: The top level directory, or None if the directory isn't in a
+              working tree.
+    :rtype: str or None
+    """
+    if _pygit2() is None:
+        try:
+            return _run(['rev-parse', '--show-toplevel'], cwd=path).strip()
+        except subprocess.CalledProcessError:
+            return None
+
+    repo = repository(path)
+    if repo is None or repo.workdir is None:
+        return None
+    return os.path.normpath(repo.workdir)
+
+
+def config(name, path=None):
+    """
+    Get the value of a git configuration option.
+
+    :param str name: The name of the option, such as ``'user.name'``.
+    :param str path: A directory within the repository to look up the option
+                     for. If this is None, the current working directory is
+                     used. Outside a repository, only the global options are
+                     looked at.
+    :returns: The value of the option.
+    :rtype: str
+    :raises KeyError: If the option is not set.
+    """
+    repo = None
+    if _pygit2() is not None:
+        repo = repository(path)
+
+    if repo is None:
+        try:
+            return _run(['config', name], cwd=path).rstrip('\n')
+        except subprocess.CalledProcessError:
+            raise KeyError(name) from None
+    return repo.config[name]
+
+
+def _blob_id(tree, path):
+    try:
+        return tree[path].id
+    except KeyError:
+        return None
+
+
+def _renamed_from(old_tree, new_tree, path):
+    """Find the path a file was renamed or copied from, if it was."""
+    import pygit2
+
+    diff = old_tree.diff_to_tree(new_tree)
+    diff.find_similar(
+        flags=pygit2.GIT_DIFF_FIND_RENAMES | pygit2.GIT_DIFF_FIND_COPIES,
+    )
+    for delta in diff.deltas:
+        if delta.new_file.path != path:
+            continue
+        if delta.status in (pygit2.GIT_DELTA_RENAMED, pygit2.GIT_DELTA_COPIED):
+            return delta.old_file.path
+    return None
+
+
+def _follow(repo, path):
+    """Find the commits which changed a file, following renames."""
+    import pygit2
+
+    # The path of the file in each commit still to be looked at
+    paths = {repo.head.target: path}
+
+    sort_mode = pygit2.GIT_SORT_TOPOLOGICAL | pygit2.GIT_SORT_TIME
+    for commit in repo.walk(repo.head.target, sort_mode):
+        path = paths.pop(commit.id, None)
+        if path is None:
+            continue
+        blob_id = _blob_id(commit.tree, path)
+        if blob_id is None:
+            continue
+
+        # Like git, follow a merge's history through the parent it's the same
+        # as, if there is one
+        parents = commit.parents
+        same = [p for p in parents if _blob_id(p.tree, path) == blob_id]
+        if same:
+            paths.setdefault(same[0].id, path)
+            continue
+
+        yield commit
+        if not parents:
+            continue
+        old_path = path
+        if _blob_id(parents[0].tree, path) is None:
+            old_path = _renamed_from(parents[0].tree, commit.tree, path)
+            if old_path is None:
+                continue
+        for parent in parents:
+            paths.setdefault(parent.id, old_path)
+
+
+def _format_commit(commit, color):
+    lines = []
+    header = f'commit {commit.id}'
+    lines.append(f'\033[33m{header}\033[m' if color else header)
+    if len(commit.parents) > 1:
+        lines.append(
+            'Merge: ' + ' '.join(str(p.id)[:7] for p in commit.parents),
+        )
+
+    author = commit.author
+    date = datetime.datetime.fromtimestamp(
+        author.time,
+        datetime.timezone(datetime.timedelta(minutes=author.offset)),
+    )
+    lines.append(f'Author: {author.name} <{author.email}>')
+    lines.append(f'Date:   {date:%a %b} {date.day} {date:%H:%M:%S %Y %z}')
+    lines.append('')
+    lines.extend('    ' + line for line in commit.message.rstrip('\n').split('\n'))
+    return '\n'.join(lines) + '\n'
+
+
+def log(path, color=False):
+    """
+    Get the log of the commits which changed a file, following it through
+    renames and copies, in the format ``git log --follow`` shows it in.
+
+    :param str path: The path to the file.
+    :param bool color: Whether to highlight the output for a terminal.
+    :returns: The log.
+    :rtype: str
+    """
+    path = os.path.abspath(path)
+    directory = os.path.dirname(path)
+    repo = None
+    if _pygit2() is not None:
+        repo = repository(directory)
+
+    if repo is None or repo.head_is_unborn:
+        args = ['--no-pager', 'log', '--follow', '-C', '-M']
+        if color:
+            args.append('--color')
+        return _run(args + ['--', path], cwd=directory)
+
+    relpath = os.path.relpath(path, repo.workdir).replace(os.sep, '/')
+    return '\n'.join(
+        _format_commit(commit, color)
+        for commit in _follow(repo, relpath)
+    )
+
+
+def _move_back(moved):
+    """Undo some renames, given as pairs of the old and new paths."""
+    for path, target in reversed(moved):
+        os.rename(target, path)
+
+
+def move(paths, destination):
+    """
+    Move files and directories into a directory, like ``git mv``.
+
+    :param list paths: The files and directories to move. These must be
+                       tracked, or contain tracked files.
+    :param str destination: The directory to move them into.
+    :raises GitError: If they couldn't be moved. If so, none of them are.
+    """
+    pygit2 = _pygit2()
+    repo = None
+    if pygit2 is not None:
+        repo = repository(destination)
+
+    if repo is None:
+        args = [os.path.abspath(path) for path in paths]
+        try:
+            subprocess.check_call(
+                ['git', 'mv'] + args + [os.path.abspath(destination)],
+                cwd=destination,
+            )
+        except subprocess.CalledProcessError as e:
+            # git mv doesn't put back what it moved before a rename failed
+            moved = []
+            for path in args:
+                target = os.path.join(destination, os.path.basename(path))
+                if not os.path.lexists(path) and os.path.lexists(target):
+                    moved.append((path, target))
+            _move_back(moved)
+            raise GitError("git mv failed") from e
+        return
+
+    def relative(path):
+        relpath = os.path.relpath(os.path.abspath(path), repo.workdir)
+        return relpath.replace(os.sep, '/')
+
+    index = repo.index
+    index.read()
+
+    moves = []
+    for path in paths:
+        source = relative(path)
+        target = os.path.join(destination, os.path.basename(os.path.normpath(path)))
+        entries = [
+            entry
+            for entry in index
+            if entry.path == source or entry.path.startswith(source + '/')
+        ]
+        if not entries:
+            raise GitError(f"'{path}' is not under version control")
+        if os.path.lexists(target):
+            raise GitError(f"'{target}' already exists")
+        moves.append((path, target, source, relative(target), entries))
+
+    moved = []
+    for path, target, _, _, _ in moves:
+        try:
+            os.rename(path, target)
+        except OSError as e:
+            _move_back(moved)
+            raise GitError(f"Couldn't move '{path}': {e}") from e
+        moved.append((path, target))
+
+    for _, _, source, target_relpath, entries in moves:
+        for entry in entries:
+            index.remove(entry.path)
+            index.add(pygit2.IndexEntry(
+                target_relpath + entry.path[len(source):],
+                entry.id,
+                entry.mode,
+            ))
+    index.write()
@@ -0,0 +1,184 @@
+"""
+Allocation of new asset codes.
+
+Rather than looking at every asset in the inventory to find the next free code,
+the highest part number in use by each user (their *high-water mark*) is kept
+in a table in the cache directory. Allocating codes just advances the user's
+mark, under a lock so that processes allocating at the same time are never
+given the same codes.
+"""
+
+import contextlib
+import hashlib
+import os
+
+import six.moves.cPickle as pickle
+
+from sr.tools.inventory import assetcode, inventory
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """
+    Hold an exclusive lock on a file, creating it if necessary, waiting for
+    any other process holding it to release it first.
+
+    :param str path: The path of the lock file.
+    """
+    with open(path, 'a+b') as file:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        else:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def high_water_marks(codes):
+    """
+    Find the highest part number of each user in some asset codes.
+
+    :param codes: The asset codes. Invalid codes are ignored.
+    :returns: A dict mapping user numbers to their highest part number.
+    :rtype: dict
+    """
+    marks = {}
+    for numbers in assetcode.decode_many(codes):
+        if numbers is None:
+            continue
+        user_number, part_number = numbers
+        if part_number > marks.get(user_number, -1):
+            marks[user_number] = part_number
+    return marks
+
+
+class CodeAllocator:
+    """
+    Allocates new asset codes for an inventory.
+
+    The table of high-water marks is built from the inventory's
+    :class:`~sr.tools.inventory.inventory.CodeIndex`. It is brought up to date
+    with the index whenever the git checkout changes, and with any untracked
+    or modified files in the working tree every time codes are handed out. Any
+    marks which are higher than those in the inventory are kept, so that codes
+    which have been allocated but not yet committed are never given out again.
+
+    :param str root_path: The root path of the inventory.
+    :param code_index: The index of the inventory's codes. If this is None, a
+                       new one is created.
+    :type code_index: :class:`~sr.tools.inventory.inventory.CodeIndex`
+    :param str table_path: The file to store the table in. If this is None, a
+                           file within the cache directory named after the
+                           root path is used. A lock file is created alongside
+                           it.
+    """
+
+    def __init__(self, root_path, code_index=None, table_path=None):
+        """Create a new allocator."""
+        self.root_path = os.path.abspath(root_path)
+        if code_index is None:
+            code_index = inventory.CodeIndex(self.root_path)
+        self.code_index = code_index
+
+        if table_path is None:
+            ho = hashlib.sha256()
+            ho.update(self.root_path.encode('UTF-8'))
+            table_path = os.path.join(inventory.CACHE_DIR, ho.hexdigest() + '.marks')
+        self.table_path = table_path
+        self.lock_path = table_path + '.lock'
+
+    def _read(self):
+        try:
+            with open(self.table_path, 'rb') as file:
+                return pickle.load(file)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            return None, {}
+
+    def _write(self, state, marks):
+        tmp_path = f'{self.table_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            pickle.dump((state, marks), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.table_path)
+
+    def _untracked_codes(self):
+        """
+        Find the codes of assets which are untracked or modified in the git
+        working tree, which the state of the checkout doesn't reflect.
+        """
+        codes = []
+        for path, blob_id in inventory._read_git_index(self.root_path).items():
+            if blob_id is not None:
+                continue
+            # Untracked groups are listed by the files within them
+            for name in path.split('/'):
+                m = inventory.RE_PART.match(name)
+                if m is not None:
+                    codes.append(m.group(2))
+        return codes
+
+    def _marks(self):
+        # Fingerprint the state before reading the index, so that changes made
+        # meanwhile cause another update next time.
+        state = inventory._git_state(self.root_path)
+        stored_state, marks = self._read()
+        codes = []
+        if state is None or state != stored_state:
+            codes += self.code_index.reload()
+        if state is not None:
+            # Assets created without being staged don't change the state
+            codes += self._untracked_codes()
+        for user_number, mark in high_water_marks(codes).items():
+            marks[user_number] = max(mark, marks.get(user_number, -1))
+        return state, marks
+
+    def peek(self, user_number):
+        """
+        Get the asset code which would be allocated next for a user, without
+        reserving it.
+
+        :param int user_number: The user to get the code for.
+        :returns: The code.
+        :rtype: str
+        """
+        # The table is replaced atomically, so there's no need for the lock
+        _, marks = self._marks()
+        return assetcode.num_to_code(user_number, marks.get(user_number, -1) + 1)
+
+    def allocate(self, user_number, count=1):
+        """
+        Allocate new asset codes for a user.
+
+        The codes are reserved as soon as they are allocated, so they won't be
+        allocated again even if no assets are created with them.
+
+        :param int user_number: The user to allocate the codes for.
+        :param int count: The number of codes to allocate.
+        :returns: The codes, in order of their part numbers.
+        :rtype: list of str
+        """
+        if count < 1:
+            raise ValueError(f"Cannot allocate {count} asset codes")
+
+        with file_lock(self.lock_path):
+            state, marks = self._marks()
+            first = marks.get(user_number, -1) + 1
+            marks[user_number] = first + count - 1
+            self._write(state, marks)
+
+        return assetcode.encode_many(
+            (user_number, part_number)
+            for part_number in range(first, first + count)
+        )
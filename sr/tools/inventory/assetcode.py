@@ -2,8 +2,21 @@
 A set of functions for dealing with asset codes in the inventory.
 
 Asset codes are constructed from part numbers and user numbers.
+
+Each number is written least significant digit first in base 16, using the
+first sixteen characters of the alphabet for its last digit and the other
+sixteen for the digits before it, so that the end of each number is marked.
+A Luhn mod 32 check digit follows.
+
+The conversions are done by an :class:`AssetCodec`, which builds lookup tables
+for the alphabet once. The functions in this module use a shared instance,
+:data:`CODEC`. Many codes can be converted at once with :func:`decode_many` and
+:func:`encode_many`, which avoid the per-call overhead of the single code
+functions.
 """
 
+import re
+
 from sr.tools.inventory import luhn
 
 # The characters used in asset codes. They have been chosen to avoid similar
@@ -62,6 +75,208 @@ def normalise(asset_code):
         return asset_code
 
 
+class AssetCodec:
+    """
+    Encodes, decodes and validates asset codes using lookup tables built once
+    for an alphabet.
+
+    Validating a code takes one dict lookup for each pair of its characters,
+    using a table of what each pair adds to the Luhn checksum.
+
+    :param alphabet: The 32 characters used in asset codes, in order of value.
+    """
+
+    # Fields are written this many digits at a time from tables of every
+    # number below 16 ** CHUNK.
+    CHUNK = 3
+
+    def __init__(self, alphabet):
+        """Build the tables for an alphabet."""
+        self.alphabet = tuple(alphabet)
+        if len(self.alphabet) != 32:
+            raise ValueError("Asset code alphabets must have 32 characters")
+
+        #: The value of each character, and what each character adds to the
+        #: Luhn checksum when it is doubled. These are shared with
+        #: :mod:`~sr.tools.inventory.luhn`.
+        self.values, self.doubled = luhn.tables(self.alphabet)
+        #: What each pair of characters adds to the Luhn checksum, when the
+        #: second is an even number of characters from the end of a code.
+        self.pairs = {
+            a + b: self.doubled[a] + self.values[b]
+            for a in self.alphabet
+            for b in self.alphabet
+        }
+
+        #: A regular expression for the characters of an asset code.
+        self.pattern = '[{}]+'.format(''.join(self.alphabet))
+        #: A compiled regular expression which matches an asset code with its
+        #: 'sr' prefix, in either case, capturing the code.
+        self.regex = re.compile(f'sr({self.pattern})', re.IGNORECASE)
+
+        limit = 16 ** self.CHUNK
+        self._limit = limit
+        self._fields = [self._field(num) for num in range(limit)]
+        self._prefixes = [
+            self._field(num + limit)[:self.CHUNK]
+            for num in range(limit)
+        ]
+
+    def _field(self, num):
+        """Write a number as one of the fields of an asset code."""
+        digits = ''
+        while num > 15:
+            digits += self.alphabet[num % 16 + 16]
+            num //= 16
+        return digits + self.alphabet[num]
+
+    def _checksum(self, asset_code):
+        # Raises KeyError for characters which aren't in the alphabet
+        if len(asset_code) % 2:
+            # A leading zero doesn't change the checksum, and makes every
+            # character part of a pair
+            asset_code = self.alphabet[0] + asset_code
+        pairs = self.pairs
+        total = 0
+        for i in range(0, len(asset_code), 2):
+            total += pairs[asset_code[i:i + 2]]
+        return total % 32
+
+    def is_valid(self, asset_code):
+        """
+        Check if an asset code is valid.
+
+        :param str asset_code: The asset code to check, which will be
+                               normalised.
+        :returns: True if valid, else False.
+        :rtype: bool
+        """
+        asset_code = asset_code.strip().upper()
+        if asset_code.startswith('SR'):
+            asset_code = asset_code[2:]
+        try:
+            return self._checksum(asset_code) == 0
+        except KeyError:
+            return False
+
+    def is_valid_many(self, asset_codes):
+        """
+        Check which of many asset codes are valid.
+
+        :param asset_codes: An iterable of the asset codes to check, which
+                            will be normalised.
+        :returns: Whether each code is valid, in the same order.
+        :rtype: list of bool
+        """
+        return list(map(self.is_valid, asset_codes))
+
+    def _encode_field(self, num):
+        prefix = ''
+        while num >= self._limit:
+            prefix += self._prefixes[num % self._limit]
+            num //= self._limit
+        return prefix + self._fields[num]
+
+    def encode(self, user_number, part_number):
+        """
+        Convert a user/part number combo to an asset code.
+
+        :param int user_number: The user number.
+        :param int part_number: The part number.
+        :returns: The asset code.
+        :rtype: str
+        :raises ValueError: If either number is negative.
+        """
+        if user_number < 0 or part_number < 0:
+            raise ValueError(
+                'User ({}) or part ({}) number cannot be '
+                'negative. '.format(user_number, part_number),
+            )
+
+        assetno = self._encode_field(user_number) + self._encode_field(part_number)
+        checksum = self._checksum(assetno + self.alphabet[0])
+        return assetno + self.alphabet[-checksum]
+
+    def encode_many(self, pairs):
+        """
+        Convert many user/part number combos to asset codes.
+
+        :param pairs: An iterable of pairs of user and part numbers.
+        :returns: The asset codes, in the same order.
+        :rtype: list of str
+        :raises ValueError: If any of the numbers are negative.
+        """
+        encode = self.encode
+        return [encode(user_number, part_number) for user_number, part_number in pairs]
+
+    def _decode(self, asset_code):
+        # Remove checkdigit
+        asset_code = asset_code[:-1]
+
+        values = self.values
+        field = [0, 0]
+        fieldno = 0
+        shift = 0
+        for c in asset_code:
+            if fieldno == 2:
+                raise ValueError(
+                    f"Error in asset code '{asset_code}', too many fields",
+                )
+            num = values[c]
+            if num > 15:
+                field[fieldno] += (num - 16) << shift
+                shift += 4
+            else:
+                field[fieldno] += num << shift
+                fieldno += 1
+                shift = 0
+
+        return (field[0], field[1])
+
+    def decode(self, asset_code):
+        """
+        Convert an asset code to a user/part number combo.
+
+        :param str asset_code: The asset code to convert, which will be
+                               normalised.
+        :returns: A tuple consisting of the user and part number.
+        :rtype: pair of ints
+        :raises ValueError: If the code is invalid.
+        """
+        asset_code = normalise(asset_code)
+        if not self.is_valid(asset_code):
+            raise ValueError(f"Asset code '{asset_code}' is not valid")
+
+        return self._decode(asset_code)
+
+    def decode_many(self, asset_codes):
+        """
+        Convert many asset codes to user/part number combos.
+
+        :param asset_codes: An iterable of the asset codes, which will be
+                            normalised.
+        :returns: A pair of the user and part number for each code, in the
+                  same order, or None for each invalid code.
+        :rtype: list
+        """
+        results = []
+        append = results.append
+        for asset_code in asset_codes:
+            asset_code = normalise(asset_code)
+            try:
+                if self._checksum(asset_code) == 0:
+                    append(self._decode(asset_code))
+                    continue
+            except (KeyError, ValueError):
+                pass
+            append(None)
+        return results
+
+
+#: The codec for the inventory's asset codes.
+CODEC = AssetCodec(ALPHABET)
+
+
 def is_valid(asset_code):
     """
     Check if an asset code is valid.
@@ -70,13 +285,7 @@ def is_valid(asset_code):
     :returns: True if valid, else False.
     :rtype: bool
     """
-    asset_code = normalise(asset_code)
-
-    invalid_characters = set(asset_code) - ALPHABET_SET
-    if invalid_characters:
-        return False
-
-    return luhn.is_valid(asset_code, ALPHABET)
+    return CODEC.is_valid(asset_code)
 
 
 def num_to_code(user_number, part_number):
@@ -88,28 +297,7 @@ def num_to_code(user_number, part_number):
     :returns: An asset code string.
     :rtype: str
     """
-    if user_number < 0 or part_number < 0:
-        raise ValueError(
-            'User ({}) or part ({}) number cannot be '
-            'negative. '.format(user_number, part_number),
-        )
-
-    assetno = ''
-    for num in (user_number, part_number):
-        while True:
-            if num > 15:
-                r = num % 16
-                assetno = assetno + ALPHABET[r + 16]
-                num = num // 16
-            else:
-                assetno = assetno + ALPHABET[num]
-                break
-
-    checkdigit = luhn.calc_check_digit(assetno, ALPHABET)
-
-    assetno = assetno + checkdigit
-    assert luhn.is_valid(assetno, ALPHABET)
-    return assetno
+    return CODEC.encode(user_number, part_number)
 
 
 def code_to_num(asset_code):
@@ -120,28 +308,32 @@ def code_to_num(asset_code):
     :returns: A tuple consisting of the user and part number.
     :rtype: pair of ints
     """
-    asset_code = normalise(asset_code)
-    if not is_valid(asset_code):
-        raise ValueError(f"Asset code '{asset_code}' is not valid")
-
-    # Remove checkdigit
-    asset_code = asset_code[:-1]
-
-    field = [0, 0]
-    fieldno = 0
-    i = 0
-    for c in asset_code:
-        if fieldno == 2:
-            raise ValueError(
-                f"Error in asset code '{asset_code}', too many fields",
-            )
-        num = ALPHABET.index(c)
-        if num > 15:
-            field[fieldno] = field[fieldno] + (num - 16) * (16 ** i)
-        else:
-            field[fieldno] = field[fieldno] + num * (16 ** i)
-            fieldno += 1
-            i = -1
-        i += 1
-
-    return (field[0], field[1])
+    return CODEC.decode(asset_code)
+
+
+def encode_many(pairs):
+    """
+    Convert many user/part number combos to asset codes.
+
+    :param pairs: An iterable of pairs of user and part numbers.
+    :returns: The asset codes, in the same order.
+    :rtype: list of str
+    :raises ValueError: If any of the numbers are negative.
+    """
+    return CODEC.encode_many(pairs)
+
+
+def decode_many(asset_codes):
+    """
+    Convert many asset codes to user/part number combos.
+
+    Unlike :func:`code_to_num`, invalid codes don't raise an exception, so
+    that a whole inventory's worth of codes can be converted at once.
+
+    :param asset_codes: An iterable of the asset codes, which will be
+                        normalised.
+    :returns: A pair of the user and part number for each code, in the same
+              order, or None for each invalid code.
+    :rtype: list
+    """
+    return CODEC.decode_many(asset_codes)
@@ -0,0 +1,536 @@
+"""
+A long-running process which keeps an inventory loaded, and serves requests
+about it over a Unix domain socket.
+
+The daemon watches the inventory for changes (using inotify where the
+``inotify_simple`` module is available, and by polling otherwise) and keeps
+its copy up to date, so that commands which use it don't need to load the
+inventory themselves.
+
+The protocol is line based: each request is a JSON object on a line of its
+own, naming a ``method`` and its ``params``, and each is answered with a JSON
+object on a line of its own containing either the ``result`` or an ``error``.
+For example::
+
+    {"method": "locate", "params": {"code": "51R"}}
+    {"result": {"code": "51R", "name": "motor-board", "path": ...}}
+
+    {"method": "locate", "params": {"code": "ZZZ"}}
+    {"error": {"type": "KeyError", "message": "'ZZZ'"}}
+
+The methods are ``ping``, ``stop``, ``query``, ``explain``, ``locate``,
+``user_number``, ``allocate_codes`` and ``next_code``; see
+:class:`InventoryClient` for their parameters.
+"""
+
+import hashlib
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+
+from sr.tools.inventory import inventory
+
+# How often the daemon checks for changes to the inventory, in seconds
+CHECK_INTERVAL = 1.0
+
+
+def get_socket_path(root_path):
+    """
+    Get the path of the socket a daemon for an inventory listens on.
+
+    :param str root_path: The root path of the inventory.
+    :returns: A path within the cache directory, named after the root path.
+              It is kept short to fit within the limit on the length of socket
+              paths.
+    :rtype: str
+    """
+    ho = hashlib.sha256()
+    ho.update(os.path.abspath(root_path).encode('UTF-8'))
+    return os.path.join(inventory.CACHE_DIR, ho.hexdigest()[:16] + '.sock')
+
+
+def _is_ignored_dir(name):
+    return name == '.git'
+
+
+class PollingWatcher:
+    """
+    Watches a directory tree for changes by comparing the modification times
+    and sizes of everything in it with those when it was last checked.
+
+    :param str root_path: The directory to watch.
+    """
+
+    def __init__(self, root_path):
+        """Create a new watcher, taking a snapshot of the tree."""
+        self.root_path = root_path
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for dirpath, dirnames, filenames in os.walk(self.root_path):
+            dirnames[:] = [d for d in dirnames if not _is_ignored_dir(d)]
+            for name in dirnames + filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.lstat(path)
+                except OSError:
+                    continue
+                snapshot[path] = (st.st_mtime_ns, st.st_size, st.st_ino)
+        return snapshot
+
+    def changes(self):
+        """
+        Check for changes to the tree since the last check.
+
+        :returns: The paths which have been created, modified or removed.
+        :rtype: set
+        """
+        old = self._snapshot
+        new = self._snapshot = self._scan()
+        paths = old.keys() | new.keys()
+        return {path for path in paths if old.get(path) != new.get(path)}
+
+    def close(self):
+        """Stop watching."""
+
+
+class InotifyWatcher:
+    """
+    Watches a directory tree for changes using inotify, which is much cheaper
+    than polling large trees.
+
+    :param str root_path: The directory to watch.
+    :raises ImportError: If the ``inotify_simple`` module is not available.
+    :raises OSError: If inotify is not supported.
+    """
+
+    def __init__(self, root_path):
+        """Create a new watcher, watching every directory in the tree."""
+        from inotify_simple import flags, INotify
+
+        self.root_path = root_path
+        self._flags = 0
+        for flag in (
+            flags.CREATE,
+            flags.DELETE,
+            flags.MODIFY,
+            flags.CLOSE_WRITE,
+            flags.MOVED_FROM,
+            flags.MOVED_TO,
+            flags.ATTRIB,
+        ):
+            self._flags |= flag
+        self._is_dir = flags.ISDIR
+        self._inotify = INotify()
+        self._watches = {}
+        self._watch_tree(root_path)
+
+    def _watch_tree(self, top):
+        for dirpath, dirnames, _ in os.walk(top):
+            dirnames[:] = [d for d in dirnames if not _is_ignored_dir(d)]
+            try:
+                wd = self._inotify.add_watch(dirpath, self._flags)
+            except OSError:
+                continue
+            self._watches[wd] = dirpath
+
+    def changes(self):
+        """
+        Check for changes to the tree since the last check.
+
+        :returns: The paths which have been created, modified or removed.
+        :rtype: set
+        """
+        changed = set()
+        for event in self._inotify.read(timeout=0):
+            dirpath = self._watches.get(event.wd)
+            if dirpath is None or _is_ignored_dir(event.name):
+                continue
+
+            path = os.path.join(dirpath, event.name) if event.name else dirpath
+            changed.add(path)
+            if event.mask & self._is_dir and os.path.isdir(path):
+                # A new (or moved in) directory needs watching too, and
+                # anything created in it before it was watched is a change.
+                self._watch_tree(path)
+                for dirpath, dirnames, filenames in os.walk(path):
+                    changed.update(
+                        os.path.join(dirpath, name) for name in dirnames + filenames
+                    )
+        return changed
+
+    def close(self):
+        """Stop watching."""
+        self._inotify.close()
+
+
+def get_watcher(root_path, poll=False):
+    """
+    Get a watcher for a directory tree, using inotify where it is available.
+
+    :param str root_path: The directory to watch.
+    :param bool poll: Whether to poll for changes even if inotify is available.
+    :returns: A :class:`InotifyWatcher` or :class:`PollingWatcher`.
+    """
+    if not poll:
+        try:
+            return InotifyWatcher(root_path)
+        except (ImportError, OSError):
+            pass
+    return PollingWatcher(root_path)
+
+
+def _location(node):
+    parent = node.parent
+    return inventory.AssetLocation(
+        code=getattr(node, 'code', None),
+        name=node.name,
+        path=node.path,
+        parent_path=getattr(parent, 'path', None),
+        parent_code=getattr(parent, 'code', None),
+        is_group=isinstance(node, inventory.ItemGroup),
+    )
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line.decode('UTF-8'))
+                response = self.server.inventory_daemon.handle(
+                    request['method'],
+                    request.get('params', {}),
+                )
+            except Exception as e:
+                response = {
+                    'error': {
+                        'type': e.__class__.__name__,
+                        'message': str(e),
+                        'args': [a for a in e.args if isinstance(a, (str, int))],
+                    },
+                }
+            self.wfile.write(json.dumps(response).encode('UTF-8') + b'\n')
+            self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class InventoryDaemon:
+    """
+    Keeps an inventory loaded and up to date, and serves requests about it.
+
+    :param str root_path: The root path of the inventory.
+    :param str socket_path: The path of the socket to listen on. If this is
+                            None, :func:`get_socket_path` is used.
+    :param watcher: The watcher to follow changes to the inventory with. If
+                    this is None, one is chosen by :func:`get_watcher`.
+    """
+
+    def __init__(self, root_path, socket_path=None, watcher=None):
+        """Load the inventory and start listening."""
+        self.root_path = os.path.abspath(root_path)
+        self.socket_path = socket_path or get_socket_path(self.root_path)
+        self.watcher = watcher or get_watcher(self.root_path)
+
+        self._lock = threading.RLock()
+        self._stopping = threading.Event()
+        # Changes which couldn't be applied yet, and why
+        self._pending = set()
+        self._error = None
+        self.inventory = self._load()
+
+        if os.path.exists(self.socket_path):
+            client = connect(self.root_path, self.socket_path)
+            if client is not None:
+                client.close()
+                raise RuntimeError(f"A daemon is already running at {self.socket_path}")
+            # Left behind by a daemon which didn't exit cleanly
+            os.unlink(self.socket_path)
+        self.server = _Server(self.socket_path, _RequestHandler)
+        self.server.inventory_daemon = self
+
+    def _load(self):
+        inv = inventory.Inventory(self.root_path)
+        inv.query_table  # build everything up front
+        return inv
+
+    def update(self, paths):
+        """
+        Bring the inventory up to date with changes to some paths.
+
+        :param paths: The paths which have changed.
+        """
+        if not paths:
+            return
+        with self._lock:
+            self.inventory.refresh(paths)
+            self.inventory.query_table
+
+    def sync(self):
+        """
+        Apply any changes which have happened since the last check.
+
+        If they can't be applied, such as while a file is only partly written,
+        the error is reported and they are tried again by the next call.
+
+        :returns: Whether the inventory is up to date.
+        :rtype: bool
+        """
+        with self._lock:
+            self._pending |= self.watcher.changes()
+            try:
+                self.update(self._pending)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                if error != self._error:
+                    print(f"Failed to update the inventory: {error}", file=sys.stderr)
+                self._error = error
+                return False
+            self._pending = set()
+            self._error = None
+            return True
+
+    def handle(self, method, params):
+        """
+        Handle a request.
+
+        :param str method: The name of the method to call.
+        :param dict params: The parameters for the method.
+        :returns: The response.
+        :rtype: dict
+        """
+        try:
+            handler = getattr(self, '_method_' + method)
+        except AttributeError:
+            raise ValueError(f"Unknown method '{method}'") from None
+        with self._lock:
+            return {'result': handler(**params)}
+
+    def _method_ping(self):
+        return {'root_path': self.root_path, 'pid': os.getpid()}
+
+    def _method_stop(self):
+        self.stop()
+
+    def _method_query(self, query):
+        return [_location(node)._asdict() for node in self.inventory.query(query)]
+
+    def _method_explain(self, query):
+        return self.inventory.explain(query)
+
+    def _method_locate(self, code):
+        # The tree is kept up to date, unlike the inventory's code index
+        code = inventory.assetcode.normalise(code)
+        parts = self.inventory.root.parts
+        if code not in parts:
+            # It may have been created since the last check
+            self.sync()
+            parts = self.inventory.root.parts
+        return _location(parts[code])._asdict()
+
+    def _method_user_number(self, name, email):
+        return self.inventory.users[(name, email)]
+
+    def _method_allocate_codes(self, user_number, count):
+        self.sync()
+        return self.inventory.allocate_asset_codes(user_number, count)
+
+    def _method_next_code(self, user_number):
+        self.sync()
+        return self.inventory.get_next_asset_code(user_number)
+
+    def serve_forever(self, interval=CHECK_INTERVAL):
+        """
+        Serve requests and follow changes until :meth:`stop` is called.
+
+        :param float interval: How often to check for changes, in seconds.
+                               Queries may see changes this late, though
+                               allocating asset codes always checks first.
+        """
+        thread = threading.Thread(
+            target=self.server.serve_forever,
+            kwargs={'poll_interval': min(interval, 0.5)},
+            daemon=True,
+        )
+        thread.start()
+        try:
+            while not self._stopping.wait(interval):
+                self.sync()
+        finally:
+            self.server.shutdown()
+            self.close()
+
+    def stop(self):
+        """Stop :meth:`serve_forever`, from another thread."""
+        self._stopping.set()
+
+    def close(self):
+        """Stop listening, and remove the socket."""
+        self.server.server_close()
+        self.watcher.close()
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+
+class DaemonError(Exception):
+    """
+    Raised when the daemon fails to handle a request.
+
+    :param str type_: The name of the type of the exception in the daemon.
+                      Also accessible as the ``type`` attribute.
+    :param str message: The exception's message.
+    """
+
+    def __init__(self, type_, message):
+        super().__init__(type_, message)
+        self.type = type_
+        self.message = message
+
+    def __str__(self):
+        return f"{self.type}: {self.message}"
+
+
+class InventoryClient:
+    """
+    A client for an :class:`InventoryDaemon`, which can stand in for an
+    :class:`~sr.tools.inventory.inventory.Inventory` for commands which only
+    locate, query or allocate asset codes.
+
+    Query results are :class:`~sr.tools.inventory.inventory.AssetLocation`\\ s,
+    rather than nodes of the tree.
+
+    :param str root_path: The root path of the inventory.
+    :param sock: A socket connected to the daemon.
+    """
+
+    def __init__(self, root_path, sock):
+        """Create a new client."""
+        self.root_path = root_path
+        self._sock = sock
+        self._file = sock.makefile('rwb')
+
+    def call(self, method, **params):
+        """
+        Call a method on the daemon.
+
+        :param str method: The name of the method.
+        :returns: The method's result.
+        :raises DaemonError: If the method fails.
+        """
+        request = {'method': method, 'params': params}
+        self._file.write(json.dumps(request).encode('UTF-8') + b'\n')
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("The inventory daemon closed the connection")
+
+        response = json.loads(line.decode('UTF-8'))
+        if 'error' in response:
+            error = response['error']
+            if error['type'] == 'KeyError':
+                raise KeyError(*error['args'])
+            raise DaemonError(error['type'], error['message'])
+        return response['result']
+
+    def locate(self, code):
+        """
+        Find where an asset is in the inventory.
+
+        :param str code: The code of the asset.
+        :rtype: :class:`~sr.tools.inventory.inventory.AssetLocation`
+        :raises KeyError: If there is no asset with the code.
+        """
+        code = inventory.assetcode.normalise(code)
+        return inventory.AssetLocation(**self.call('locate', code=code))
+
+    def query(self, query_str):
+        """
+        Run a query on the inventory.
+
+        :param str query_str: The query.
+        :returns: The locations of the matching nodes.
+        :rtype: list of :class:`~sr.tools.inventory.inventory.AssetLocation`
+        :raises pyparsing.ParseException: If the query could not be parsed.
+        """
+        # Check the query here, so that errors are the same as without the
+        # daemon
+        from sr.tools.inventory import query_parser
+
+        query_parser.search_tree(query_str)
+        return [
+            inventory.AssetLocation(**location)
+            for location in self.call('query', query=query_str)
+        ]
+
+    def explain(self, query_str):
+        """Describe how a query would be run on the inventory."""
+        return self.call('explain', query=query_str)
+
+    @property
+    def current_user_number(self):
+        """
+        Get the user ID of the currently configured Git user.
+
+        :raises KeyError: If the user doesn't exist.
+        """
+        name, email = inventory.Inventory.get_current_git_user()
+        return self.call('user_number', name=name, email=email)
+
+    def allocate_asset_codes(self, user_number, count=1):
+        """
+        Allocate new asset codes.
+
+        :param int user_number: The user number for the asset codes.
+        :param int count: The number of codes to allocate.
+        :returns: The new asset codes.
+        :rtype: list of str
+        """
+        return self.call('allocate_codes', user_number=user_number, count=count)
+
+    def get_next_asset_code(self, user_number):
+        """
+        Get the next available asset code, without reserving it.
+
+        :param int user_number: The user number for the asset code.
+        :returns: The new asset code.
+        """
+        return self.call('next_code', user_number=user_number)
+
+    def close(self):
+        """Close the connection to the daemon."""
+        self._file.close()
+        self._sock.close()
+
+
+def connect(root_path, socket_path=None):
+    """
+    Connect to the daemon for an inventory, if one is running.
+
+    :param str root_path: The root path of the inventory.
+    :param str socket_path: The path of the daemon's socket. If this is None,
+                            :func:`get_socket_path` is used.
+    :returns: A client, or None if there is no daemon.
+    :rtype: :class:`InventoryClient` or None
+    """
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+
+    socket_path = socket_path or get_socket_path(root_path)
+    if not os.path.exists(socket_path):
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return None
+    return InventoryClient(root_path, sock)
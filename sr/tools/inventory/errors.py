@@ -0,0 +1,35 @@
+"""
+Exceptions raised when working with the inventory.
+
+These are kept apart from :mod:`sr.tools.inventory.inventory` so that they can
+be caught without importing everything needed to load an inventory.
+"""
+
+
+class NotAnInventoryError(OSError):
+    """
+    Raised when an inventory object is created for a directory that is not an
+    inventory.
+
+    :param directory: The directory that is not an inventory. Also accessible
+                      as the ``directory`` attribute of this class.
+    """
+
+    def __init__(self, directory):
+        msg = f"'{directory}' is not an inventory."
+        super().__init__(msg)
+        self.directory = directory
+
+
+class InvalidFileError(ValueError):
+    """
+    Raised when an invalid file is found in the inventory.
+
+    :param path: The path to the file, relative to the inventory.
+                 Also accessible as the ``path`` attribute of this class.
+    """
+
+    def __init__(self, path, comment):
+        msg = f"Invalid asset: '{path}' {comment}."
+        super().__init__(msg)
+        self.path = path
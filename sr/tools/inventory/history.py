@@ -0,0 +1,514 @@
+"""
+A persistent index of the history of every asset in an inventory.
+
+The index is built by comparing the tree of each commit with its parent's,
+which only looks at the parts of the trees which differ, and recording an
+event for each asset whose file was added, modified, moved or deleted. It is
+stored in the cache directory along with the commit it was built up to, and
+extended from there with just the new commits when the inventory is next
+looked at, so looking up the history of an asset doesn't need to look at any
+commits at all once the index is up to date. The history of a single asset
+can also be found without the index with :func:`get_history`.
+
+This requires the ``pygit2`` module.
+"""
+
+import collections
+import hashlib
+import os
+import posixpath
+
+import six.moves.cPickle as pickle
+
+from sr.tools.inventory import inventory
+
+# Bump this whenever the stored format changes, so old indexes are rebuilt
+INDEX_VERSION = 1
+
+# The most assets which get_histories() looks up in each commit, rather than
+# comparing the commit's tree with its parent's
+LOOKUP_LIMIT = 16
+
+#: An event in the history of an asset. ``status`` is one of ``'A'`` (added),
+#: ``'M'`` (modified), ``'R'`` (moved) or ``'D'`` (deleted). ``commit`` is
+#: the hex ID of the commit, and the paths are relative to the top of the
+#: repository. ``old_path`` and ``old_blob_id`` are None for added assets,
+#: and ``path`` and ``blob_id`` are None for deleted ones.
+HistoryEvent = collections.namedtuple(
+    'HistoryEvent',
+    'status commit path old_path blob_id old_blob_id',
+)
+
+
+def asset_code_of(path):
+    """
+    Find the asset a file in the inventory belongs to.
+
+    :param str path: The path to the file, relative to the top of the
+                     inventory and separated with ``/``.
+    :returns: The code of the item which is the file, or of the group which
+              the file is the 'info' file of, or None if the file isn't
+              either.
+    :rtype: str or None
+    """
+    parts = path.split('/')
+    if parts[0] == '.meta':
+        return None
+    for part in parts:
+        if inventory.should_ignore(part):
+            return None
+
+    name = parts[-1]
+    if name == 'info':
+        if len(parts) < 2:
+            return None
+        name = parts[-2]
+
+    m = inventory.RE_PART.match(name)
+    if m is None:
+        return None
+    return m.group(2)
+
+
+def _blob_id(tree, path):
+    try:
+        return tree[path].id
+    except KeyError:
+        return None
+
+
+def _entries(tree):
+    if tree is None:
+        return {}
+    return {entry.name: entry for entry in tree}
+
+
+def tree_changes(old_tree, new_tree, prefix=''):
+    """
+    Find the files which differ between two trees.
+
+    Subtrees with the same ID in both trees are skipped without being looked
+    inside, so this takes time proportional to the number of entries changed
+    rather than to the size of the trees.
+
+    :param old_tree: The old tree, or None for an empty tree.
+    :type old_tree: :class:`pygit2.Tree`
+    :param new_tree: The new tree, or None for an empty tree.
+    :type new_tree: :class:`pygit2.Tree`
+    :param str prefix: A prefix for the paths of the files.
+    :returns: The path of each file which differs, with its blob ID in each
+              tree, or None if it isn't in that tree.
+    :rtype: iterator of tuple
+    """
+    import pygit2
+
+    old_entries = _entries(old_tree)
+    new_entries = _entries(new_tree)
+    for name in sorted(old_entries.keys() | new_entries.keys()):
+        old = old_entries.get(name)
+        new = new_entries.get(name)
+        if old is not None and new is not None and old.id == new.id:
+            continue
+
+        path = prefix + name
+        old_subtree = old if isinstance(old, pygit2.Tree) else None
+        new_subtree = new if isinstance(new, pygit2.Tree) else None
+        if old_subtree is not None or new_subtree is not None:
+            yield from tree_changes(old_subtree, new_subtree, path + '/')
+
+        old_id = None if old is None or old_subtree is not None else old.id
+        new_id = None if new is None or new_subtree is not None else new.id
+        if old_id is not None or new_id is not None:
+            yield path, old_id, new_id
+
+
+def commit_events(repo, commit):
+    """
+    Find what happened to assets in a commit, by comparing its tree with its
+    first parent's.
+
+    For merge commits, only the changes which aren't in any of the other
+    parents are included, so that changes made on a branch are only found in
+    the commits on the branch, and not again in the merge.
+
+    :param repo: The repository.
+    :type repo: :class:`pygit2.Repository`
+    :param commit: The commit.
+    :type commit: :class:`pygit2.Commit`
+    :returns: Pairs of asset codes and the :class:`HistoryEvent` for each,
+              in order of their codes.
+    :rtype: list of tuple
+    """
+    parents = commit.parents
+    parent_tree = parents[0].tree if parents else None
+    other_trees = [parent.tree for parent in parents[1:]]
+
+    added = {}
+    deleted = {}
+    modified = {}
+    for path, old_id, new_id in tree_changes(parent_tree, commit.tree):
+        if other_trees:
+            if any(_blob_id(t, path) == new_id for t in other_trees):
+                continue
+
+        if old_id is not None:
+            code = asset_code_of(path)
+            if code is not None:
+                if new_id is not None:
+                    modified[code] = (path, new_id, old_id)
+                    continue
+                deleted[code] = (path, old_id)
+
+        if new_id is not None:
+            code = asset_code_of(path)
+            if code is not None:
+                added[code] = (path, new_id)
+
+    commit_id = str(commit.id)
+    events = []
+    for code in sorted(added.keys() | deleted.keys() | modified.keys()):
+        if code in modified:
+            path, new_id, old_id = modified[code]
+            event = HistoryEvent(
+                'M',
+                commit_id,
+                path,
+                path,
+                str(new_id),
+                str(old_id),
+            )
+        elif code in added and code in deleted:
+            (path, new_id), (old_path, old_id) = added[code], deleted[code]
+            event = HistoryEvent(
+                'R',
+                commit_id,
+                path,
+                old_path,
+                str(new_id),
+                str(old_id),
+            )
+        elif code in added:
+            path, new_id = added[code]
+            event = HistoryEvent(
+                'A',
+                commit_id,
+                path,
+                None,
+                str(new_id),
+                None,
+            )
+        else:
+            old_path, old_id = deleted[code]
+            event = HistoryEvent(
+                'D',
+                commit_id,
+                None,
+                old_path,
+                None,
+                str(old_id),
+            )
+        events.append((code, event))
+    return events
+
+
+def _subtree(tree, path):
+    if not path:
+        return tree
+    import pygit2
+
+    try:
+        obj = tree[path]
+    except KeyError:
+        return None
+    return obj if isinstance(obj, pygit2.Tree) else None
+
+
+def _find_similar(old_tree, new_tree, path):
+    """Find where a file went using git's similarity detection."""
+    import pygit2
+
+    # Look in the directory which held the file before the whole tree, since
+    # diffing a tree with libgit2 looks at every file in it.
+    directory = posixpath.dirname(path)
+    for prefix in ([directory, ''] if directory else ['']):
+        old_subtree = _subtree(old_tree, prefix)
+        new_subtree = _subtree(new_tree, prefix)
+        if old_subtree is None or new_subtree is None:
+            continue
+        base = prefix + '/' if prefix else ''
+
+        diff = old_subtree.diff_to_tree(new_subtree)
+        diff.find_similar(flags=pygit2.GIT_DIFF_FIND_RENAMES)
+        for delta in diff.deltas:
+            if delta.status != pygit2.GIT_DELTA_RENAMED:
+                continue
+            if base + delta.old_file.path == path:
+                return base + delta.new_file.path, delta.new_file.id
+    return None
+
+
+def _find_moved(old_tree, new_tree, location, code, added):
+    """Find where a file which isn't in the new tree has been moved to."""
+    path, blob_id = location
+
+    # Files made from the same template are alike, but an asset can't become
+    # another one, so only files named after no asset or this one will do.
+    added = [
+        (new_path, new_id)
+        for new_path, new_id in added
+        if asset_code_of(new_path) in (None, code)
+    ]
+
+    # Most moves leave the file untouched, or keep its name
+    for new_path, new_id in added:
+        if new_id == blob_id:
+            return new_path, new_id
+    for new_path, new_id in added:
+        if asset_code_of(new_path) == code:
+            return new_path, new_id
+    if not added:
+        return None
+    found = _find_similar(old_tree, new_tree, path)
+    if found is None or asset_code_of(found[0]) not in (None, code):
+        return None
+    return found
+
+
+def _event(commit_id, old, new):
+    if old is None:
+        return HistoryEvent('A', commit_id, new[0], None, str(new[1]), None)
+    elif new is None:
+        return HistoryEvent('D', commit_id, None, old[0], None, str(old[1]))
+    return HistoryEvent(
+        'M' if new[0] == old[0] else 'R',
+        commit_id,
+        new[0],
+        old[0],
+        str(new[1]),
+        str(old[1]),
+    )
+
+
+def get_histories(repo, codes):
+    """
+    Get the history of some assets without using an index.
+
+    All the assets are followed through the commits in a single pass. Each
+    commit's tree is compared with its first parent's, which only looks at
+    the parts of the trees which differ, and the assets are found among the
+    files which differ by the paths they had in the parent. When one isn't
+    there any more, a file with the same contents or named after the asset is
+    looked for, and failing that git's similarity detection is used to find
+    where it was moved to, starting with the directory which held it.
+
+    Merge commits are handled in the same way as by :class:`HistoryIndex`.
+    The events are the same as those in the index, except when an asset's
+    file is moved to a path which isn't named after it: the index, which
+    only knows assets by the names of their files, has it deleted there,
+    while this follows it.
+
+    :param repo: The repository.
+    :type repo: :class:`pygit2.Repository`
+    :param codes: The normalised codes of the assets.
+    :returns: Pairs of asset codes and :class:`HistoryEvent` objects, as each
+              event is found, oldest first.
+    :rtype: iterator of tuple
+    """
+    import pygit2
+
+    if repo.head_is_unborn:
+        return
+    wanted = set(codes)
+
+    # The path and blob ID of each asset in each commit, and the asset at each
+    # of those paths. Commits which don't change any of the assets share their
+    # parent's dicts.
+    locations = {}
+
+    sort_mode = pygit2.GIT_SORT_TOPOLOGICAL | pygit2.GIT_SORT_REVERSE
+    for commit in repo.walk(repo.head.target, sort_mode):
+        tree = commit.tree
+        parents = commit.parents
+        if parents:
+            parent_tree = parents[0].tree
+            by_code, by_path = locations[parents[0].id]
+        else:
+            parent_tree = None
+            by_code, by_path = {}, {}
+
+        # Looking up a few assets is quicker than comparing the trees
+        if len(by_code) == len(wanted) <= LOOKUP_LIMIT:
+            if all(_blob_id(tree, p) == i for p, i in by_code.values()):
+                locations[commit.id] = by_code, by_path
+                continue
+
+        changes = {}
+        moved = []
+        added = []
+        for path, _, new_id in tree_changes(parent_tree, tree):
+            code = by_path.get(path)
+            if code is not None:
+                if new_id is None:
+                    moved.append(code)
+                else:
+                    changes[code] = path, new_id
+            elif new_id is not None:
+                added.append((path, new_id))
+                code = asset_code_of(path)
+                if code in wanted and code not in by_code:
+                    changes.setdefault(code, (path, new_id))
+        for code in moved:
+            changes[code] = _find_moved(
+                parent_tree,
+                tree,
+                by_code[code],
+                code,
+                added,
+            )
+
+        if changes:
+            by_code = dict(by_code)
+            by_path = dict(by_path)
+            for code, location in changes.items():
+                old = by_code.pop(code, None)
+                if old is not None:
+                    del by_path[old[0]]
+                if location is not None:
+                    by_code[code] = location
+                    by_path[location[0]] = code
+        locations[commit.id] = by_code, by_path
+
+        commit_id = str(commit.id)
+        for code in sorted(changes):
+            new = by_code.get(code)
+            if any(locations[p.id][0].get(code) == new for p in parents[1:]):
+                continue
+            old = locations[parents[0].id][0].get(code) if parents else None
+            yield code, _event(commit_id, old, new)
+
+
+def get_history(repo, code):
+    """
+    Get the history of an asset without using an index.
+
+    :param repo: The repository.
+    :type repo: :class:`pygit2.Repository`
+    :param str code: The normalised code of the asset.
+    :returns: The events in the asset's history, oldest first.
+    :rtype: iterator of :class:`HistoryEvent`
+    """
+    for _, event in get_histories(repo, [code]):
+        yield event
+
+
+class HistoryIndex:
+    """
+    A persistent index of the history of the assets in a repository.
+
+    :param repo: The repository of the inventory.
+    :type repo: :class:`pygit2.Repository`
+    :param str index_path: The file to store the index in. If this is None, a
+                           file within the cache directory named after the
+                           repository's working directory is used.
+    """
+
+    def __init__(self, repo, index_path=None):
+        """Create a new index."""
+        self.repo = repo
+
+        if index_path is None:
+            ho = hashlib.sha256()
+            ho.update(os.path.abspath(repo.workdir).encode('UTF-8'))
+            index_path = os.path.join(inventory.CACHE_DIR, ho.hexdigest() + '.history')
+        self.index_path = index_path
+
+        self._head = None
+        self._events = None
+
+    def _read(self):
+        try:
+            with open(self.index_path, 'rb') as file:
+                version, head, events = pickle.load(file)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            return None, {}
+
+        if version != INDEX_VERSION:
+            return None, {}
+        return head, events
+
+    def _write(self):
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp_path = f'{self.index_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            pickle.dump(
+                (INDEX_VERSION, self._head, self._events),
+                file,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp_path, self.index_path)
+
+    def _extends(self, head, walker):
+        """Whether the index can be extended from its head to ``head``."""
+        import pygit2
+
+        # The old head may have been garbage collected after a rewrite
+        if self._head is None or self._head not in self.repo:
+            return False
+        try:
+            if not self.repo.descendant_of(head, self._head):
+                return False
+            walker.hide(self._head)
+        except (KeyError, ValueError, pygit2.GitError):
+            return False
+        return True
+
+    def update(self):
+        """
+        Bring the index up to date with the repository's HEAD, indexing only
+        the commits since it was last updated. If HEAD has moved to a commit
+        which doesn't descend from that one, the index is rebuilt.
+
+        :returns: The number of commits which were indexed.
+        :rtype: int
+        """
+        import pygit2
+
+        if self._events is None:
+            self._head, self._events = self._read()
+
+        if self.repo.head_is_unborn:
+            head = None
+        else:
+            head = self.repo.head.target
+        if head is None or str(head) == self._head:
+            if head is None and self._head is not None:
+                self._head, self._events = None, {}
+                self._write()
+            return 0
+
+        sort_mode = pygit2.GIT_SORT_TOPOLOGICAL | pygit2.GIT_SORT_REVERSE
+        walker = self.repo.walk(head, sort_mode)
+        if not self._extends(head, walker):
+            self._events = {}
+
+        count = 0
+        for commit in walker:
+            for code, event in commit_events(self.repo, commit):
+                self._events.setdefault(code, []).append(event)
+            count += 1
+
+        self._head = str(head)
+        self._write()
+        return count
+
+    def events(self, code):
+        """
+        Get the history of an asset, as of when the index was last updated.
+
+        :param str code: The normalised code of the asset.
+        :returns: The events in the asset's history, oldest first.
+        :rtype: list of :class:`HistoryEvent`
+        """
+        if self._events is None:
+            self._head, self._events = self._read()
+        return list(self._events.get(code, ()))
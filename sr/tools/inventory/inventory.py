@@ -3,51 +3,33 @@ A set of classes and functions for working with
 :doc:`The Inventory </inventory/index>`.
 """
 
+import atexit
+import bisect
 import codecs
+import collections
+import collections.abc
 import email.utils
 import hashlib
 import os
 import re
 import subprocess
 import sys
+import time
 
 import six.moves.cPickle as pickle
-import yaml
 
+from sr.tools import git, yamlio
 from sr.tools.environment import get_cache_dir
 from sr.tools.inventory import assetcode
+from sr.tools.inventory.errors import InvalidFileError, NotAnInventoryError
 
 CACHE_DIR = get_cache_dir('inventory')
-RE_PART = re.compile("^(.+)-sr([%s]+)$" % "".join(assetcode.ALPHABET))
-
-
-class NotAnInventoryError(OSError):
-    """
-    Raised when an inventory object is created for a directory that is not an
-    inventory.
-
-    :param directory: The directory that is not an inventory. Also accessible
-                      as the ``directory`` attribute of this class.
-    """
-
-    def __init__(self, directory):
-        msg = f"'{directory}' is not an inventory."
-        super().__init__(msg)
-        self.directory = directory
-
-
-class InvalidFileError(ValueError):
-    """
-    Raised when an invalid file is found in the inventory.
-
-    :param path: The path to the file, relative to the inventory.
-                 Also accessible as the ``path`` attribute of this class.
-    """
-
-    def __init__(self, path, comment):
-        msg = f"Invalid asset: '{path}' {comment}."
-        super().__init__(msg)
-        self.path = path
+# The minimum number of files to parse before doing so in parallel
+PARALLEL_PARSE_THRESHOLD = 256
+# How long a code index waits after being rebuilt before a lookup which misses
+# rebuilds it again, unless the git checkout changes, in seconds
+CODE_INDEX_REBUILD_INTERVAL = 1.0
+RE_PART = re.compile(f"^(.+)-sr({assetcode.CODEC.pattern})$")
 
 
 def find_top_level_dir(start_dir=None):
@@ -59,14 +41,8 @@ def find_top_level_dir(start_dir=None):
     :returns: The top level directory or None.
     :rtype: str or None
     """
-    try:
-        cmd = ['git', 'rev-parse', '--show-toplevel']
-        gitdir = subprocess.check_output(
-            cmd,
-            universal_newlines=True,
-            cwd=start_dir,
-        ).strip()
-    except subprocess.CalledProcessError:
+    gitdir = git.top_level(start_dir)
+    if gitdir is None:
         return None
 
     usersfn = os.path.join(gitdir, ".meta", "users")
@@ -76,14 +52,29 @@ def find_top_level_dir(start_dir=None):
     return gitdir
 
 
-def get_inventory(directory=None):
+def get_inventory(directory=None, git_index=None, lazy=False, daemon=False):
     """
     Get an :class:`Inventory` object for a directory.
 
     :param str directory: The directory to find the inventory from. If this is
                           left as None, the current working directory is used.
+    :param bool git_index: Whether to load the inventory using the git index
+                           (see :class:`GitIndexCache`). If this is None, the
+                           ``SR_INVENTORY_GIT_INDEX`` environment variable
+                           decides, defaulting to off.
+    :param bool lazy: Whether to defer loading each asset's file until its
+                      information is first accessed. This makes loading much
+                      quicker for commands which only need the names, codes
+                      and locations of assets.
+    :param bool daemon: Whether to use an :doc:`inventory daemon
+                        </commands/inv-daemon>`, if one is running for the
+                        inventory and ``SR_INVENTORY_DAEMON`` isn't set to
+                        disable it. Only pass this for callers which just
+                        locate, query or allocate asset codes; see
+                        :class:`~sr.tools.inventory.daemon.InventoryClient`.
     :returns: An instance of an :class:`Inventory` object pointing to the
-              inventory in the directory specified.
+              inventory in the directory specified, or a client for the
+              daemon.
     :rtype: :class:`Inventory`
     :raises OSError: If the directory is not an inventory.
     """
@@ -94,7 +85,24 @@ def get_inventory(directory=None):
     if top is None:
         raise NotAnInventoryError(directory)
 
-    return Inventory(top)
+    if daemon and _env_flag('SR_INVENTORY_DAEMON', default=True):
+        from sr.tools.inventory import daemon as inventory_daemon  # circular
+
+        client = inventory_daemon.connect(top)
+        if client is not None:
+            return client
+
+    if git_index is None:
+        git_index = _env_flag('SR_INVENTORY_GIT_INDEX')
+
+    return Inventory(top, git_index=git_index, lazy=lazy)
+
+
+def _env_flag(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
 
 
 def should_ignore(path):
@@ -143,21 +151,707 @@ def cached_yaml_load(path):
             except EOFError:
                 os.remove(p)  # cache file corrupted, recreate it
 
-    y = yaml.safe_load(codecs.open(path, "r", encoding="utf-8"))
+    with codecs.open(path, "r", encoding="utf-8") as file:
+        y = _compact_info(yamlio.load(file))
     with open(p, 'wb') as file:
         pickle.dump(y, file)
     return y
 
 
+def _list_dir(path):
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_file():
+                entries.append((entry.name, False))
+            elif entry.is_dir():
+                entries.append((entry.name, True))
+    return entries
+
+
+def _read_git_index(root_path):
+    """
+    Read the files tracked within a git checkout from its index.
+
+    :param str root_path: The directory to list the files within. This may be
+                          a sub-directory of the checkout.
+    :returns: A dict mapping the path of each file, relative to
+              ``root_path`` and using '/' as the separator, to the hex blob ID
+              of its contents. Files which are modified or untracked in the
+              working tree map to ``None``, since their contents are not
+              stored in the index; deleted files are omitted.
+    :rtype: dict
+    """
+    try:
+        import pygit2
+    except ImportError:
+        return _read_git_index_subprocess(root_path)
+
+    repo = pygit2.Repository(root_path)
+    # pygit2 gives the working directory with any symlinks resolved
+    prefix = os.path.relpath(
+        os.path.realpath(root_path),
+        os.path.realpath(repo.workdir),
+    ).replace(os.sep, '/')
+    prefix = '' if prefix == '.' else prefix + '/'
+
+    files = {}
+    for entry in repo.index:
+        if entry.path.startswith(prefix):
+            files[entry.path[len(prefix):]] = str(entry.id)
+
+    worktree_changed = (
+        pygit2.GIT_STATUS_WT_NEW |
+        pygit2.GIT_STATUS_WT_MODIFIED |
+        pygit2.GIT_STATUS_WT_TYPECHANGE |
+        pygit2.GIT_STATUS_WT_RENAMED
+    )
+    for path, flags in repo.status().items():
+        if not path.startswith(prefix):
+            continue
+        path = path[len(prefix):]
+
+        if flags & pygit2.GIT_STATUS_WT_DELETED:
+            files.pop(path, None)
+        elif flags & worktree_changed:
+            files[path] = None
+
+    return files
+
+
+def _read_git_index_subprocess(root_path):
+    output = subprocess.check_output(
+        ['git', 'ls-files', '-s', '-z'],
+        cwd=root_path,
+        universal_newlines=True,
+    )
+    files = {}
+    for line in output.split('\0'):
+        if not line:
+            continue
+        info, path = line.split('\t', 1)
+        files[path] = info.split()[1]
+
+    # Tags: '?' is untracked, 'C' is modified and 'R' is deleted.
+    output = subprocess.check_output(
+        ['git', 'ls-files', '-z', '-t', '-m', '-o', '-d', '--exclude-standard'],
+        cwd=root_path,
+        universal_newlines=True,
+    )
+    deleted = set()
+    for line in output.split('\0'):
+        if not line:
+            continue
+        tag, path = line.split(' ', 1)
+        if tag == 'R':
+            deleted.add(path)
+        else:
+            files[path] = None
+
+    for path in deleted:
+        files.pop(path, None)
+
+    return files
+
+
+def _compact_info(info):
+    """
+    Intern the keys and condition of a parsed asset file, which are repeated
+    across every asset, so that all of the assets share one copy of each.
+    """
+    if not isinstance(info, dict):
+        return info
+
+    compact = {
+        sys.intern(key) if isinstance(key, str) else key: value
+        for key, value in info.items()
+    }
+    condition = compact.get('condition')
+    if isinstance(condition, str):
+        compact['condition'] = sys.intern(condition)
+    return compact
+
+
+def _parse_yaml_file(path):
+    return _compact_info(yamlio.load_file(path))
+
+
+def get_worker_count(workers=None):
+    """
+    Get the number of processes to use for parsing the inventory.
+
+    :param int workers: The requested number of processes. If this is None,
+                        the ``SR_INVENTORY_WORKERS`` environment variable is
+                        used if it's set to an integer, otherwise the number
+                        of CPUs.
+    :returns: The number of processes, where 1 means parsing serially.
+    :rtype: int
+    """
+    if workers is None:
+        try:
+            workers = int(os.environ.get('SR_INVENTORY_WORKERS', ''))
+        except ValueError:
+            workers = os.cpu_count() or 1
+    return max(1, workers)
+
+
+def parse_yaml_files(paths, workers=None):
+    """
+    Parse a number of YAML files, spreading the work over a pool of processes
+    when there are enough files to be worth it.
+
+    :param paths: The paths of the files to parse.
+    :type paths: list of str
+    :param int workers: The number of processes to use. See
+                        :func:`get_worker_count`.
+    :returns: The parsed contents of the files, in the same order as
+              ``paths``.
+    :rtype: list
+    """
+    workers = get_worker_count(workers)
+    if workers == 1 or len(paths) < PARALLEL_PARSE_THRESHOLD:
+        return [_parse_yaml_file(path) for path in paths]
+
+    import concurrent.futures
+
+    chunksize = max(1, len(paths) // (workers * 4))
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(_parse_yaml_file, paths, chunksize=chunksize))
+    except (OSError, concurrent.futures.process.BrokenProcessPool):
+        # Some environments can't start processes; parse serially instead.
+        return [_parse_yaml_file(path) for path in paths]
+
+
+def _git_blob_id(data):
+    ho = hashlib.sha1()
+    ho.update(b'blob %d\0' % len(data))
+    ho.update(data)
+    return ho.hexdigest()
+
+
+def git_changed_paths(root_path, old, new=None, untracked=False):
+    """
+    Find the files which have changed between two revisions of a git checkout.
+
+    :param str root_path: The directory to look for changes within.
+    :param str old: The older revision.
+    :param str new: The newer revision. If this is None, the changes up to the
+                    working tree are found.
+    :param bool untracked: Whether to include untracked files, which aren't
+                           ignored, when ``new`` is None.
+    :returns: The paths of the files, relative to ``root_path``. Renamed files
+              are listed under both their old and new names.
+    :rtype: list of str
+    """
+    cmd = ['git', 'diff', '--name-only', '--no-renames', '--relative', '-z', old]
+    if new is not None:
+        cmd.append(new)
+    output = subprocess.check_output(cmd, cwd=root_path)
+
+    if untracked and new is None:
+        cmd = ['git', 'ls-files', '--others', '--exclude-standard', '-z']
+        output += b'\0' + subprocess.check_output(cmd, cwd=root_path)
+
+    return [path for path in output.decode('UTF-8').split('\0') if path]
+
+
+class YAMLCache:
+    """
+    A consolidated cache of the parsed YAML files within an inventory.
+
+    Unlike :func:`cached_yaml_load`, which keeps one cache file per asset, the
+    entries for a whole inventory are kept in a single file. This is read once
+    when the cache is created and written back by :meth:`save`. Entries are
+    keyed by the path relative to the inventory root and are only used while
+    the modification time, size and inode of the file are unchanged.
+
+    :param str root_path: The root path of the inventory.
+    :param str cache_path: The file to store the cache in. If this is None, a
+                           file within the cache directory named after the
+                           root path is used.
+    """
+
+    cache_suffix = '.tree'
+
+    def __init__(self, root_path, cache_path=None):
+        """Create a new cache, loading any existing entries."""
+        self.root_path = os.path.abspath(root_path)
+
+        if cache_path is None:
+            ho = hashlib.sha256()
+            ho.update(self.root_path.encode('UTF-8'))
+            cache_path = os.path.join(CACHE_DIR, ho.hexdigest() + self.cache_suffix)
+        self.cache_path = cache_path
+
+        self._loaded_entries = None
+        self._seen = set()
+        self._dirty = False
+
+    @property
+    def _entries(self):
+        # Only read the cache file once something needs loading, so that lazy
+        # inventories which never load anything don't pay for it.
+        if self._loaded_entries is None:
+            self._loaded_entries = self._read()
+        return self._loaded_entries
+
+    @_entries.setter
+    def _entries(self, entries):
+        self._loaded_entries = entries
+
+    def _read(self):
+        try:
+            with open(self.cache_path, 'rb') as file:
+                entries = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return {}
+
+        if not isinstance(entries, dict):
+            return {}
+        return entries
+
+    def listdir(self, path):
+        """
+        List the files and directories within a directory of the inventory.
+
+        :param str path: The path of the directory.
+        :returns: A list of ``(name, is_dir)`` pairs.
+        :rtype: list of tuples
+        """
+        return _list_dir(path)
+
+    def reset_listing(self):
+        """
+        Forget the files and directories listed so far, so that subsequent
+        calls to :meth:`listdir` see any changes since. Directories are read
+        afresh on every call by this class, so there is nothing to forget.
+        """
+
+    def _fingerprint(self, path):
+        # Identifies the current contents of the file
+        path = os.path.abspath(path)
+        key = os.path.relpath(path, self.root_path)
+        st = os.stat(path)
+        return key, (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _get(self, fingerprint):
+        key, stamp = fingerprint
+        self._seen.add(key)
+
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != stamp:
+            raise KeyError(key)
+        return entry[1]
+
+    def _put(self, fingerprint, data):
+        key, stamp = fingerprint
+        self._entries[key] = (stamp, data)
+        self._dirty = True
+
+    def load(self, path):
+        """
+        Load a YAML file, possibly from the cache.
+
+        :param str path: The path to load.
+        :returns: The loaded YAML file.
+        :rtype: dict
+        """
+        fingerprint = self._fingerprint(path)
+        try:
+            return self._get(fingerprint)
+        except KeyError:
+            pass
+
+        y = _parse_yaml_file(path)
+        self._put(fingerprint, y)
+        return y
+
+    def prefetch(self, paths, workers=None):
+        """
+        Load a number of YAML files into the cache, parsing those which are
+        not already cached in parallel (see :func:`parse_yaml_files`).
+
+        :param paths: The paths to load.
+        :type paths: list of str
+        :param int workers: The number of processes to parse the files with.
+        """
+        misses = []
+        for path in paths:
+            fingerprint = self._fingerprint(path)
+            try:
+                self._get(fingerprint)
+            except KeyError:
+                misses.append((path, fingerprint))
+
+        parsed = parse_yaml_files([path for path, _ in misses], workers)
+        for (_, fingerprint), y in zip(misses, parsed):
+            self._put(fingerprint, y)
+
+    def _should_prune(self):
+        return len(self._seen) != len(self._entries)
+
+    def save(self, prune=False):
+        """
+        Write the cache back to disk, if anything has changed.
+
+        :param bool prune: Whether to drop the entries for any files which
+                           have not been loaded since the cache was created.
+                           This should only be used once the whole inventory
+                           has been loaded.
+        """
+        if prune and self._should_prune():
+            self._entries = {
+                key: entry
+                for key, entry in self._entries.items()
+                if key in self._seen
+            }
+            self._dirty = True
+
+        if not self._dirty:
+            return
+
+        # Write to a temporary file first so that concurrent readers never see
+        # a partially written cache.
+        tmp_path = f'{self.cache_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            pickle.dump(self._entries, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.cache_path)
+
+        self._dirty = False
+
+
+class GitIndexCache(YAMLCache):
+    """
+    A cache of the parsed YAML files within an inventory, driven by the git
+    index of the checkout.
+
+    The files in the inventory are listed from the index in one go, rather
+    than by scanning each directory, and entries in the cache are keyed by the
+    git blob ID of the file contents. Files which are unchanged from the index
+    are therefore never read or stat-ed once cached, and entries survive
+    switching branches and back. Files which are modified or untracked are
+    read and hashed to find their entries. Files which git ignores are not
+    part of the inventory in this mode.
+
+    :param str root_path: The root path of the inventory.
+    :param str cache_path: The file to store the cache in. If this is None, a
+                           file within the cache directory named after the
+                           root path is used.
+    """
+
+    cache_suffix = '.blobs'
+
+    def __init__(self, root_path, cache_path=None):
+        """Create a new cache from the git index."""
+        super().__init__(root_path, cache_path)
+        self._files = None
+        self._dirs = None
+
+    def _read_index(self):
+        if self._files is not None:
+            return
+
+        self._files = _read_git_index(self.root_path)
+        self._dirs = {}
+        for path in self._files:
+            parts = path.split('/')
+            for i in range(len(parts)):
+                children = self._dirs.setdefault('/'.join(parts[:i]), {})
+                children[parts[i]] = i < len(parts) - 1
+
+    def _relpath(self, path):
+        path = os.path.relpath(os.path.abspath(path), self.root_path)
+        path = path.replace(os.sep, '/')
+        return '' if path == '.' else path
+
+    def listdir(self, path):
+        self._read_index()
+        return list(self._dirs.get(self._relpath(path), {}).items())
+
+    def reset_listing(self):
+        self._files = None
+        self._dirs = None
+
+    def _fingerprint(self, path):
+        self._read_index()
+        blob_id = self._files.get(self._relpath(path))
+
+        if blob_id is None:
+            with open(path, 'rb') as file:
+                blob_id = _git_blob_id(file.read())
+        return blob_id
+
+    def _get(self, fingerprint):
+        self._seen.add(fingerprint)
+        return self._entries[fingerprint]
+
+    def _put(self, fingerprint, data):
+        self._entries[fingerprint] = data
+        self._dirty = True
+
+    def _should_prune(self):
+        # Keep the entries for other revisions of the inventory around, so that
+        # they are still cached after switching branches, unless the cache has
+        # grown well beyond the size of the inventory.
+        return len(self._entries) > 2 * len(self._seen)
+
+
+def _git_state(root_path):
+    """
+    Get a fingerprint of the state of the git checkout, without running git.
+
+    The fingerprint covers HEAD, the ref which it points to and the index, all
+    of which change whenever files are committed, staged or checked out.
+
+    :param str root_path: The top level of the checkout.
+    :returns: A tuple which changes along with the state of the checkout, or
+              None if the directory isn't a git checkout.
+    """
+    git_dir = os.path.join(root_path, '.git')
+    if os.path.isfile(git_dir):
+        # A worktree or submodule, where '.git' points at the real directory.
+        with open(git_dir) as file:
+            content = file.read().strip()
+        if content.startswith('gitdir:'):
+            git_dir = os.path.join(root_path, content[len('gitdir:'):].strip())
+
+    try:
+        with open(os.path.join(git_dir, 'HEAD')) as file:
+            head = file.read().strip()
+    except OSError:
+        return None
+
+    names = ['index', 'packed-refs']
+    if head.startswith('ref:'):
+        names.append(head[len('ref:'):].strip())
+
+    state = [head]
+    for name in names:
+        try:
+            st = os.stat(os.path.join(git_dir, name))
+        except OSError:
+            state.append(None)
+        else:
+            state.append((st.st_mtime_ns, st.st_size))
+    return tuple(state)
+
+
+class AssetLocation(
+    collections.namedtuple(
+        'AssetLocation',
+        ('code', 'name', 'path', 'parent_path', 'parent_code', 'is_group'),
+    ),
+):
+    """
+    The location of an asset within the inventory, as found by
+    :meth:`Inventory.locate`.
+
+    :param str code: The code of the asset.
+    :param str name: The name (type) of the asset.
+    :param str path: The path to the asset's file, or directory for groups.
+    :param str parent_path: The path to the directory containing the asset.
+    :param str parent_code: The code of the group containing the asset, or
+                            None if it is within a plain directory.
+    :param bool is_group: Whether the asset is a group.
+    """
+
+    __slots__ = ()
+
+    @property
+    def info_path(self):
+        """The path to the file containing the asset's information."""
+        if self.is_group:
+            return os.path.join(self.path, "info")
+        return self.path
+
+
+class CodeIndex:
+    """
+    A persistent index of where each asset code is in an inventory.
+
+    The index is built from the names of the files and directories in the
+    inventory, without loading any of them, and stored in the cache directory
+    along with a fingerprint of the state of the git checkout. It is rebuilt
+    when that state changes, or when a lookup misses or finds a path which no
+    longer exists, so lookups for assets which have been created or moved
+    without involving git still succeed. Lookups which miss only rebuild it
+    again once :data:`CODE_INDEX_REBUILD_INTERVAL` has passed, or the state
+    has changed, so that looking up many unknown codes stays quick.
+
+    :param str root_path: The root path of the inventory.
+    :param str index_path: The file to store the index in. If this is None, a
+                           file within the cache directory named after the
+                           root path is used.
+    """
+
+    def __init__(self, root_path, index_path=None):
+        """Create a new index."""
+        self.root_path = os.path.abspath(root_path)
+
+        if index_path is None:
+            ho = hashlib.sha256()
+            ho.update(self.root_path.encode('UTF-8'))
+            index_path = os.path.join(CACHE_DIR, ho.hexdigest() + '.codes')
+        self.index_path = index_path
+
+        self._entries = None
+        # When the index was last rebuilt, and the state of the checkout then
+        self._rebuilt_at = None
+        self._state = None
+
+    def _read(self):
+        state = _git_state(self.root_path)
+
+        try:
+            with open(self.index_path, 'rb') as file:
+                stored_state, entries = pickle.load(file)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            return self.rebuild()
+
+        if state is None or stored_state != state:
+            return self.rebuild()
+
+        self._entries = entries
+        self._rebuilt_at = None
+        return entries
+
+    def _scan(self, relpath, parent_code, in_group, entries):
+        path = os.path.join(self.root_path, relpath) if relpath else self.root_path
+        for fname, is_dir in _list_dir(path):
+            if should_ignore(fname):
+                continue
+            if in_group and fname == 'info' and not is_dir:
+                continue
+
+            child_relpath = os.path.join(relpath, fname)
+            m = RE_PART.match(fname)
+            if m is not None:
+                entries[m.group(2)] = (child_relpath, relpath, parent_code, is_dir)
+
+            if is_dir:
+                code = m.group(2) if m is not None else None
+                self._scan(child_relpath, code, code is not None, entries)
+
+    def rebuild(self):
+        """
+        Rebuild the index by scanning the inventory, and store it.
+
+        :returns: A dict mapping each asset code to a tuple of the path to
+                  the asset relative to the inventory, the path of its parent,
+                  the code of its parent group and whether it is a group.
+        :rtype: dict
+        """
+        # Fingerprint the state before scanning, so that changes made during
+        # the scan cause another rebuild next time.
+        state = _git_state(self.root_path)
+
+        entries = {}
+        self._scan('', None, False, entries)
+
+        tmp_path = f'{self.index_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            pickle.dump((state, entries), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.index_path)
+
+        self._entries = entries
+        self._rebuilt_at = time.monotonic()
+        self._state = state
+        return entries
+
+    def reload(self):
+        """
+        Read the stored index again, rebuilding it if the state of the git
+        checkout has changed since it was stored.
+
+        :returns: The entries in the index, as returned by :meth:`rebuild`.
+        :rtype: dict
+        """
+        return self._read()
+
+    @property
+    def entries(self):
+        """
+        The entries in the index, as returned by :meth:`rebuild`.
+
+        :rtype: dict
+        """
+        if self._entries is None:
+            self._read()
+        return self._entries
+
+    def _location(self, code, entry):
+        relpath, parent_relpath, parent_code, is_group = entry
+        if parent_relpath:
+            parent_path = os.path.join(self.root_path, parent_relpath)
+        else:
+            parent_path = self.root_path
+
+        return AssetLocation(
+            code=code,
+            name=RE_PART.match(os.path.basename(relpath)).group(1),
+            path=os.path.join(self.root_path, relpath),
+            parent_path=parent_path,
+            parent_code=parent_code,
+            is_group=is_group,
+        )
+
+    def _stale(self):
+        """Check whether a lookup which misses should rebuild the index."""
+        if self._rebuilt_at is None:
+            return True
+        if time.monotonic() - self._rebuilt_at >= CODE_INDEX_REBUILD_INTERVAL:
+            return True
+        return _git_state(self.root_path) != self._state
+
+    def locate(self, code):
+        """
+        Find where an asset is in the inventory.
+
+        :param str code: The normalised code of the asset.
+        :returns: The location of the asset.
+        :rtype: :class:`AssetLocation`
+        :raises KeyError: If there is no asset with the code.
+        """
+        entry = self.entries.get(code)
+        if entry is not None:
+            location = self._location(code, entry)
+            if os.path.exists(location.path):
+                return location
+
+        if self._stale():
+            entry = self.rebuild().get(code)
+            if entry is not None:
+                return self._location(code, entry)
+
+        raise KeyError(code)
+
+
+def _load_info(path, cache):
+    if cache is None:
+        return cached_yaml_load(path)
+    return cache.load(path)
+
+
 class Item:
     """
     An item in the inventory.
 
     :param str path: The path to the item.
     :param parent: The item parent.
+    :param cache: The :class:`YAMLCache` to load the item from. If this is
+                  None, :func:`cached_yaml_load` is used.
+    :param bool lazy: Whether to defer loading (and validating) the item's
+                      file until its information is first accessed.
     """
 
-    def __init__(self, path, parent=None):
+    mandatory_properties = ("labelled", "description", "value", "condition")
+
+    # There can be a great many items, so they are kept compact: everything
+    # about an item other than where it is lives in its 'info'.
+    __slots__ = ('path', 'parent', 'name', 'code', '_cache', '_info')
+
+    def __init__(self, path, parent=None, cache=None, lazy=False):
         """Create a new ``Item`` object."""
         self.path = path
         self.parent = parent
@@ -168,33 +862,239 @@ class Item:
                 "does not have a valid name (should be"
                 " in the form <name>-sr<part-code>)",
             )
-        self.name = m.group(1)
+        self.name = sys.intern(m.group(1))
         self.code = m.group(2)
 
-        # Load data from yaml file
-        self.info_path = path
-        self.info = cached_yaml_load(self.info_path)
+        self._cache = cache
+        self._info = None
+        if not lazy:
+            self.validate()
+
+    @property
+    def info_path(self):
+        """The path of the item's file, which is the item itself."""
+        return self.path
 
+    @property
+    def info(self):
+        """The contents of the item's file, loaded on first access."""
+        if self._info is None:
+            info = _load_info(self.info_path, self._cache)
+            self._check_info(info)
+            self._info = info
+        return self._info
+
+    def _check_info(self, info):
+        self.check_info(info, self.code, self.path)
+
+    @classmethod
+    def check_info(cls, info, code, path):
+        """
+        Check the contents of an item's file.
+
+        :param dict info: The contents of the file.
+        :param str code: The code of the item, from its file name.
+        :param str path: The path to the item.
+        :raises InvalidFileError: If the code in the file doesn't match.
+        :raises ValueError: If the file is missing a mandatory property.
+        """
         # Verify that assetcode matches filename
-        if self.info["assetcode"] != self.code:
-            print(
-                "Code in asset filename does not match contents of file:",
-                file=sys.stderr,
+        if info["assetcode"] != code:
+            raise InvalidFileError(
+                path,
+                f"has the code '{info['assetcode']}' in its contents, which "
+                f"does not match the code '{code}' in its filename",
             )
-            print("\t code in filename: '%s'" % self.code, file=sys.stderr)
-            print("\t code in contents: '%s'" % self.info["assetcode"], file=sys.stderr)
-            print("\n\tOffending file:", self.path, file=sys.stderr)
-            sys.exit(1)
 
-        # The mandatory properties
-        for pname in ["labelled", "description", "value", "condition"]:
-            try:
-                setattr(self, pname, self.info[pname])
-            except KeyError:
+        for pname in cls.mandatory_properties:
+            if pname not in info:
                 raise ValueError(
-                    f"Part sr{self.code} is missing '{pname}' property.",
+                    f"Part sr{code} is missing '{pname}' property.",
                 )
 
+    def validate(self):
+        """
+        Load the item's file, if it has not been already, and check that it
+        is valid.
+
+        :raises ValueError: If the file is missing a mandatory property.
+        """
+        self.info
+
+    @property
+    def labelled(self):
+        """Whether the item is labelled."""
+        return self.info["labelled"]
+
+    @property
+    def description(self):
+        """The description of the item."""
+        return self.info["description"]
+
+    @property
+    def value(self):
+        """The value of the item."""
+        return self.info["value"]
+
+    @property
+    def condition(self):
+        """The condition of the item."""
+        return self.info["condition"]
+
+    @property
+    def effective_condition(self):
+        """
+        The condition of the item, for consistency with
+        :attr:`ItemGroup.effective_condition`.
+        """
+        return self.condition
+
+
+class _TreeIndex:
+    """
+    An index of the parts in a tree and all of the trees within it, built in
+    a single pass over the tree.
+
+    The parts are stored in the order :meth:`ItemTree.walk` yields them, in
+    which the parts within any one tree are contiguous, so the parts of each
+    tree are a range of positions in the index.
+
+    :param root: The :class:`ItemTree` to index.
+    """
+
+    def __init__(self, root):
+        self.nodes = []
+        self.spans = {}
+        # The last position of each code, and every position of those which
+        # are duplicated
+        self.codes = {}
+        self.duplicates = {}
+        self.types = {}
+        self._visit(root)
+
+    def _visit(self, tree):
+        start = len(self.nodes)
+        for child in tree.children.values():
+            if hasattr(child, 'children'):
+                self._visit(child)
+
+            if hasattr(child, 'code'):
+                position = len(self.nodes)
+                self.nodes.append(child)
+                previous = self.codes.get(child.code)
+                if previous is not None:
+                    self.duplicates.setdefault(child.code, [previous]).append(position)
+                self.codes[child.code] = position
+                self.types.setdefault(child.name, []).append(position)
+        self.spans[tree] = (start, len(self.nodes))
+
+
+class PartsView(collections.abc.Mapping):
+    """
+    A read-only mapping of the asset codes of the parts within a tree to the
+    parts.
+
+    :param tree: The :class:`ItemTree`.
+    """
+
+    def __init__(self, tree):
+        """Create a new view."""
+        self._tree = tree
+
+    def _positions(self):
+        index, start, stop = self._tree._index_range()
+        if not index.duplicates:
+            return index, range(start, stop)
+
+        # Like a dict, each code appears once, with its last part
+        last = {}
+        for position in range(start, stop):
+            last[index.nodes[position].code] = position
+        return index, sorted(last.values())
+
+    def __getitem__(self, code):
+        index, start, stop = self._tree._index_range()
+        position = index.codes.get(code)
+        if position is not None and start <= position < stop:
+            return index.nodes[position]
+        for position in reversed(index.duplicates.get(code, ())):
+            if start <= position < stop:
+                return index.nodes[position]
+        raise KeyError(code)
+
+    def __iter__(self):
+        index, positions = self._positions()
+        return (index.nodes[position].code for position in positions)
+
+    def __len__(self):
+        return len(self._positions()[1])
+
+    def values(self):
+        """
+        Get the parts, in the order :meth:`ItemTree.walk` yields them.
+
+        :rtype: list
+        """
+        index, positions = self._positions()
+        if isinstance(positions, range):
+            return index.nodes[positions.start:positions.stop]
+        return [index.nodes[position] for position in positions]
+
+    def items(self):
+        """
+        Get the pairs of codes and parts.
+
+        :rtype: list of tuples
+        """
+        return [(part.code, part) for part in self.values()]
+
+
+class TypesView(collections.abc.Mapping):
+    """
+    A read-only mapping of the names of the types of the parts within a tree to
+    lists of the parts of each type.
+
+    :param tree: The :class:`ItemTree`.
+    """
+
+    def __init__(self, tree):
+        """Create a new view."""
+        self._tree = tree
+
+    def __getitem__(self, name):
+        index, start, stop = self._tree._index_range()
+        positions = index.types.get(name, ())
+        lo = bisect.bisect_left(positions, start)
+        hi = bisect.bisect_left(positions, stop, lo)
+        if lo == hi:
+            raise KeyError(name)
+        return [index.nodes[position] for position in positions[lo:hi]]
+
+    def __iter__(self):
+        index, start, stop = self._tree._index_range()
+        if start == 0 and stop == len(index.nodes):
+            return iter(list(index.types))
+        names = {}
+        for node in index.nodes[start:stop]:
+            names[node.name] = None
+        return iter(list(names))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+def _child_key(node):
+    """Get the key of a node in its parent's children."""
+    return getattr(node, 'code', node.name)
+
+
+def _invalidate_conditions(node):
+    """Discard the effective conditions of any groups a node is within."""
+    while node is not None:
+        if isinstance(node, ItemGroup):
+            node._effective_condition = None
+        node = node.parent
+
 
 class ItemTree:
     """
@@ -202,6 +1102,9 @@ class ItemTree:
 
     :param str path: The path to the tree.
     :param parent: The parent item or tree.
+    :param cache: The :class:`YAMLCache` to load the items from.
+    :param bool lazy: Whether to defer loading the files of the items until
+                      their information is first accessed.
     """
 
     special_fnames = {
@@ -213,22 +1116,33 @@ class ItemTree:
     }
     ignore_fnames = ('README.md',)
 
-    def __init__(self, path, parent=None):
+    __slots__ = (
+        'name',
+        'path',
+        'parent',
+        'cache',
+        'lazy',
+        'children',
+        'parts',
+        'types',
+        '_index',
+    )
+
+    def __init__(self, path, parent=None, cache=None, lazy=False):
         """Create a new item tree."""
         self.name = os.path.basename(path)
         self.path = path
         self.parent = parent
+        self.cache = cache
+        self.lazy = lazy
         self.children = {}
         self._find_children()
 
-        self.parts = {}
-        self.types = {}
-        for i in self.walk():
-            self.parts[i.code] = i
-
-            if i.name not in self.types:
-                self.types[i.name] = []
-            self.types[i.name].append(i)
+        # Both are views of an index shared by the whole tree, which is built
+        # in one pass on first use, rather than dicts at each level.
+        self.parts = PartsView(self)
+        self.types = TypesView(self)
+        self._index = None
 
     def _should_ignore(self, fname):
         """
@@ -243,28 +1157,116 @@ class ItemTree:
         return False
 
     def _find_children(self):
-        for fname in os.listdir(self.path):
+        if self.cache is None:
+            entries = _list_dir(self.path)
+        else:
+            entries = self.cache.listdir(self.path)
+
+        for fname, is_dir in entries:
             if self._should_ignore(fname):
                 continue
 
-            p = os.path.join(self.path, fname)
+            child = self._make_child(fname, is_dir)
+            self.children[_child_key(child)] = child
+
+    def _make_child(self, fname, is_dir):
+        p = os.path.join(self.path, fname)
 
-            if os.path.isfile(p):
-                if fname in self.special_fnames:
-                    raise InvalidFileError(p, self.special_fnames[fname])
+        if not is_dir:
+            if fname in self.special_fnames:
+                raise InvalidFileError(p, self.special_fnames[fname])
 
-                # it's got to be an item
-                i = Item(p, parent=self)
-                self.children[i.code] = i
+            # it's got to be an item
+            return Item(p, parent=self, cache=self.cache, lazy=self.lazy)
 
-            elif os.path.isdir(p):
-                # could either be a group or a collection
-                if RE_PART.match(p) is not None:
-                    a = ItemGroup(p, parent=self)
-                    self.children[a.code] = a
-                else:
-                    t = ItemTree(p, parent=self)
-                    self.children[t.name] = t
+        # could either be a group or a collection
+        if RE_PART.match(p) is not None:
+            return ItemGroup(p, parent=self, cache=self.cache, lazy=self.lazy)
+        return ItemTree(p, parent=self, cache=self.cache, lazy=self.lazy)
+
+    def _root(self):
+        root = self
+        while root.parent is not None:
+            root = root.parent
+        return root
+
+    def _index_range(self):
+        """
+        Get the index of the whole tree this tree is in, and the range of
+        positions within it which are the parts of this tree.
+        """
+        root = self._root()
+        if root._index is None:
+            root._index = _TreeIndex(root)
+
+        index = root._index
+        span = index.spans.get(self)
+        if span is None:
+            # This tree has been removed from the one it was in
+            index = _TreeIndex(self)
+            span = index.spans[self]
+        return index, span[0], span[1]
+
+    def refresh_children(self):
+        """
+        Re-read the tree's directory, adding nodes for any new entries and
+        removing those for entries which no longer exist, and update the
+        ``parts`` and ``types`` of the tree and all of the trees it is within
+        to match. Nodes for existing entries are kept as they are.
+
+        :returns: The nodes which were added, and those which were removed.
+        :rtype: tuple of two lists
+        """
+        if self.cache is None:
+            entries = _list_dir(self.path)
+        else:
+            entries = self.cache.listdir(self.path)
+
+        existing = {child.path: child for child in self.children.values()}
+        kept = set()
+        added = []
+        for fname, is_dir in entries:
+            if self._should_ignore(fname):
+                continue
+
+            child = existing.get(os.path.join(self.path, fname))
+            if child is not None and isinstance(child, ItemTree) == is_dir:
+                kept.add(child.path)
+            else:
+                added.append(self._make_child(fname, is_dir))
+
+        removed = [child for path, child in existing.items() if path not in kept]
+        for child in removed:
+            del self.children[_child_key(child)]
+        for child in added:
+            self.children[_child_key(child)] = child
+        if added or removed:
+            self._root()._index = None
+
+        return added, removed
+
+    def find(self, path):
+        """
+        Find the node for a path within the tree.
+
+        :param str path: The path of a file or directory within the tree.
+        :returns: The node, or None if there isn't one.
+        """
+        relpath = os.path.relpath(path, self.path)
+        if relpath == os.curdir:
+            return self
+        if relpath.split(os.sep)[0] == os.pardir:
+            return None
+
+        node = self
+        for fname in relpath.split(os.sep):
+            for child in getattr(node, 'children', {}).values():
+                if os.path.basename(child.path) == fname:
+                    node = child
+                    break
+            else:
+                return None
+        return node
 
     def walk(self):
         """
@@ -302,41 +1304,141 @@ class ItemGroup(ItemTree):
 
     :param str path: The path to the item group.
     :param parent: The parent item or tree.
+    :param cache: The :class:`YAMLCache` to load the items from.
+    :param bool lazy: Whether to defer loading the 'info' file of the group,
+                      and the files of its items, until their information is
+                      first accessed.
     """
 
     ignore_fnames = ('info',)
 
-    def __init__(self, path, parent=None):
+    __slots__ = ('code', '_info', '_effective_condition')
+
+    def __init__(self, path, parent=None, cache=None, lazy=False):
         """Create a new item group."""
-        ItemTree.__init__(self, path, parent=parent)
+        ItemTree.__init__(self, path, parent=parent, cache=cache, lazy=lazy)
 
         m = RE_PART.match(os.path.basename(path))
-        self.name = m.group(1)
+        self.name = sys.intern(m.group(1))
         self.code = m.group(2)
 
-        # Load info from 'info' file
-        self.info_path = os.path.join(path, "info")
-        self.info = cached_yaml_load(self.info_path)
+        self._info = None
+        self._effective_condition = None
+        if not lazy:
+            self.validate()
 
-        if self.info["assetcode"] != self.code:
-            print(
-                "Code in group directory name does not match info file:",
-                file=sys.stderr,
-            )
-            print("\t code in directory name: '%s'" % self.code, file=sys.stderr)
-            print(
-                "\t           code in info: '%s'" % self.info["assetcode"],
-                file=sys.stderr,
+    @property
+    def info_path(self):
+        """The path of the group's 'info' file."""
+        return os.path.join(self.path, "info")
+
+    @property
+    def info(self):
+        """The contents of the group's 'info' file, loaded on first access."""
+        if self._info is None:
+            info = _load_info(self.info_path, self.cache)
+            self._check_info(info)
+            self._info = info
+        return self._info
+
+    def _check_info(self, info):
+        self.check_info(info, self.code, self.path)
+
+    @staticmethod
+    def check_info(info, code, path):
+        """
+        Check the contents of a group's 'info' file.
+
+        :param dict info: The contents of the file.
+        :param str code: The code of the group, from its directory name.
+        :param str path: The path to the group.
+        :raises InvalidFileError: If the code in the file doesn't match.
+        :raises Exception: If the file lacks an elements field.
+        """
+        if info["assetcode"] != code:
+            raise InvalidFileError(
+                path,
+                f"has the code '{info['assetcode']}' in its info file, which "
+                f"does not match the code '{code}' in its directory name",
             )
-            print("\n\tOffending group:", self.path, file=sys.stderr)
-            sys.exit(1)
 
-        self.description = self.info["description"]
+        if "description" not in info:
+            raise KeyError("description")
+
+        if "elements" not in info:
+            raise Exception("Group %s lacks an elements field" % code)
 
-        if "elements" not in self.info:
-            raise Exception("Group %s lacks an elements field" % self.code)
+    def validate(self):
+        """
+        Load the group's 'info' file, if it has not been already, and check
+        that it is valid.
 
-        self.elements = self.info["elements"]
+        :raises Exception: If the file lacks an elements field.
+        """
+        self.info
+
+    @property
+    def description(self):
+        """The description of the group."""
+        return self.info["description"]
+
+    @property
+    def elements(self):
+        """The names of the elements which the group is expected to contain."""
+        return self.info["elements"]
+
+    @property
+    def effective_condition(self):
+        """
+        The condition of the group as a whole, given the conditions of its
+        elements.
+
+        This is 'broken' if any of the elements are missing or broken, the
+        condition of the elements if they all share one, and 'unknown'
+        otherwise. A group with no elements listed is 'working'. It is computed
+        on first access, from the cached conditions of any nested groups, and
+        cached until :meth:`invalidate_condition` is called.
+        """
+        if self._effective_condition is None:
+            self._effective_condition = self._compute_condition()
+        return self._effective_condition
+
+    def _compute_condition(self):
+        expected = self.elements
+        if expected is None:
+            return 'working'
+
+        states = set()
+        for name in expected:
+            count = 1
+            if isinstance(name, dict):
+                name, count = list(name.items())[0]
+
+            found = self.types.get(name, [])[:count]
+            states.update(element.effective_condition for element in found)
+            if len(found) != count:
+                states.add('broken')
+
+        if len(states) == 1:
+            return states.pop()
+        if 'broken' in states:
+            return 'broken'
+        return 'unknown'
+
+    def invalidate_condition(self):
+        """
+        Discard the cached :attr:`effective_condition` of the group, and of
+        any groups which it is part of, so that it is recomputed on next
+        access. Call this after changing the group or anything in it.
+        """
+        _invalidate_conditions(self)
+
+
+def _save_at_exit(cache):
+    try:
+        cache.save()
+    except OSError:
+        pass  # The cache is only an optimisation
 
 
 class Inventory:
@@ -344,20 +1446,171 @@ class Inventory:
     An inventory.
 
     :param str root_path: The root path to the inventory.
+    :param bool git_index: Whether to list and cache the files in the
+                           inventory using the git index, rather than by
+                           scanning the directories. See
+                           :class:`GitIndexCache`.
+    :param bool lazy: Whether to build the tree from the names of the files
+                      alone, deferring loading (and validating) each asset's
+                      file until its information is first accessed. Files
+                      parsed this way are written to the cache when the
+                      process exits.
+    :param int workers: The number of processes to parse uncached files with
+                        when building the tree. See :func:`get_worker_count`.
     """
 
-    def __init__(self, root_path):
+    def __init__(self, root_path, git_index=False, lazy=False, workers=None):
         """Create a new inventory."""
         self.root_path = root_path
-        self.root = ItemTree(root_path)
+        self.lazy = lazy
+        self.workers = workers
+        if git_index:
+            self.cache = GitIndexCache(root_path)
+        else:
+            self.cache = YAMLCache(root_path)
+        self.code_index = CodeIndex(root_path)
+        self._root = None
+        self._query_table = None
 
         self._load_users()
 
+    @property
+    def root(self):
+        """
+        The :class:`ItemTree` of everything in the inventory, which is built
+        on first access.
+        """
+        if self._root is None:
+            # Build the tree from the names of the files, then load all of the
+            # files in one go so that any which aren't cached can be parsed in
+            # parallel.
+            root = ItemTree(self.root_path, cache=self.cache, lazy=True)
+            if self.lazy:
+                # Files are loaded as they're used, so keep whichever were
+                # parsed for next time once the process is done with them.
+                atexit.register(_save_at_exit, self.cache)
+            else:
+                items = list(root.walk())
+                self.cache.prefetch([i.info_path for i in items], self.workers)
+                for item in items:
+                    item.validate()
+                self.cache.save(prune=True)
+            self._root = root
+        return self._root
+
+    def refresh(self, paths):
+        """
+        Bring the inventory up to date with changes to some files, re-reading
+        only those files and the directories containing them, and updating
+        the tree in place.
+
+        :param paths: The paths of the files and directories which have been
+                      created, modified or removed. For files which have been
+                      moved, include both the old and new paths.
+        """
+        self.cache.reset_listing()
+        users_path = os.path.join(self.root_path, '.meta', 'users')
+        paths = [os.path.abspath(path) for path in paths]
+        if users_path in paths:
+            self._load_users()
+
+        root = self._root
+        if root is None:
+            # Nothing has been loaded to update
+            return
+
+        relist = {}
+        reload = {}
+        for path in paths:
+            relpath = os.path.relpath(path, root.path)
+            parts = relpath.split(os.sep)
+            if relpath == os.curdir:
+                relist[root.path] = root
+                continue
+            if parts[0] == os.pardir or any(should_ignore(p) for p in parts):
+                continue
+
+            node = root.find(path)
+            if isinstance(node, Item):
+                reload[node.path] = node
+            elif node is not None:
+                relist[node.path] = node
+
+            if parts[-1] == 'info':
+                group = root.find(os.path.dirname(path))
+                if isinstance(group, ItemGroup):
+                    reload[group.path] = group
+
+            # Find the closest directory in the tree which contains the path,
+            # as the path may have been added to or removed from it.
+            parent = None
+            while parent is None:
+                path = os.path.dirname(path)
+                parent = root.find(path)
+            relist[parent.path] = parent
+
+        changed = []
+        # Parents sort before their children, so nodes which have gone by the
+        # time their turn comes can be skipped.
+        for path in sorted(relist):
+            tree = relist[path]
+            if root.find(path) is not tree:
+                continue
+            added, removed = tree.refresh_children()
+            for node in added:
+                changed.append(node)
+                changed.extend(getattr(node, 'walk', list)())
+            if added or removed:
+                _invalidate_conditions(tree)
+
+        for path, node in reload.items():
+            if root.find(path) is not node:
+                continue
+            node._info = None
+            _invalidate_conditions(node)
+            changed.append(node)
+
+        self._query_table = None
+        if not self.lazy:
+            items = [n for n in changed if hasattr(n, 'info_path')]
+            self.cache.prefetch([i.info_path for i in items], self.workers)
+            for item in items:
+                item.validate()
+            self.cache.save()
+
+    def refresh_from_git_diff(self, old, new=None):
+        """
+        Bring the inventory up to date with the changes between two revisions,
+        as for :meth:`refresh`.
+
+        :param str old: The revision the inventory was loaded at.
+        :param str new: The revision the inventory is now at. If this is None,
+                        the changes up to the working tree are used.
+        """
+        self.refresh(
+            os.path.join(self.root_path, path)
+            for path in git_changed_paths(self.root_path, old, new)
+        )
+
+    def locate(self, code):
+        """
+        Find where an asset is in the inventory, without building the tree.
+
+        This uses a persistent index of the inventory (see :class:`CodeIndex`),
+        so is much quicker than looking the asset up in :attr:`root`.
+
+        :param str code: The code of the asset, which will be normalised.
+        :returns: The location of the asset.
+        :rtype: :class:`AssetLocation`
+        :raises KeyError: If there is no asset with the code.
+        """
+        return self.code_index.locate(assetcode.normalise(code))
+
     def _load_users(self):
         self.users = {}
 
         with open(os.path.join(self.root_path, '.meta', 'users')) as file:
-            users = yaml.safe_load(file)
+            users = yamlio.load(file)
 
         for details, user_id in users.items():
             self.users[email.utils.parseaddr(details)] = user_id
@@ -380,16 +1633,9 @@ class Inventory:
 
         :returns: A tuple containing the name and email address.
         :rtype: tuple
+        :raises KeyError: If the name or email address isn't configured.
         """
-        name = subprocess.check_output(
-            ["git", "config", "user.name"],
-            universal_newlines=True,
-        ).strip()
-        email = subprocess.check_output(
-            ["git", "config", "user.email"],
-            universal_newlines=True,
-        ).strip()
-        return (name, email)
+        return (git.config("user.name"), git.config("user.email"))
 
     @property
     def asset_codes(self):
@@ -407,19 +1653,34 @@ class Inventory:
                     code = filename[filename.rindex('-sr') + 3:]
                     yield code
 
+    def allocate_asset_codes(self, user_number, count=1):
+        """
+        Allocate new asset codes, which are reserved so that they won't be
+        allocated again, even by other processes.
+
+        :param int user_number: The user number for the asset codes.
+        :param int count: The number of codes to allocate.
+        :returns: The new asset codes.
+        :rtype: list of str
+        """
+        from sr.tools.inventory.allocator import CodeAllocator  # circular
+
+        allocator = CodeAllocator(self.root_path, code_index=self.code_index)
+        return allocator.allocate(user_number, count)
+
     def get_next_asset_code(self, user_number):
         """
-        Get the next available asset code.
+        Get the next available asset code. Unlike
+        :meth:`allocate_asset_codes`, the code isn't reserved, so use that to
+        get codes for new assets.
 
         :param int user_number: The user number for the asset code.
         :returns: The new asset code.
         """
-        maxno = -1
-        for p in map(assetcode.code_to_num, self.asset_codes):
-            if p[0] == user_number:
-                maxno = max(maxno, p[1])
+        from sr.tools.inventory.allocator import CodeAllocator  # circular
 
-        return assetcode.num_to_code(user_number, maxno + 1)
+        allocator = CodeAllocator(self.root_path, code_index=self.code_index)
+        return allocator.peek(user_number)
 
     def query(self, query_str):
         """
@@ -430,7 +1691,39 @@ class Inventory:
         :rtype: list of :class:`Item`
         :raises pyparsing.ParseError: If the query could not be parsed.
         """
-        from sr.tools.inventory import query_parser  # circular dependency
+        # circular dependency
+        from sr.tools.inventory import query_parser, query_planner
+
+        table = self.query_table
+        tree = query_planner.plan(query_parser.search_tree(query_str), table)
+        return table.nodes_from_bits(tree.match_bits(table))
+
+    def explain(self, query_str):
+        """
+        Describe how a query would be run on the inventory.
+
+        :param str query_str: The query.
+        :returns: A description of the query plan, see
+                  :func:`~sr.tools.inventory.query_planner.explain`.
+        :rtype: str
+        :raises pyparsing.ParseError: If the query could not be parsed.
+        """
+        # circular dependency
+        from sr.tools.inventory import query_parser, query_planner
+
+        table = self.query_table
+        tree = query_planner.plan(query_parser.search_tree(query_str), table)
+        return query_planner.explain(tree, table)
+
+    @property
+    def query_table(self):
+        """
+        The :class:`~sr.tools.inventory.query_table.QueryTable` of all the
+        parts in the inventory, which queries are evaluated against. Its
+        columns are computed as queries need them and kept for later queries.
+        """
+        if self._query_table is None:
+            from sr.tools.inventory.query_table import QueryTable
 
-        tree = query_parser.search_tree(query_str)
-        return tree.match(self.root.parts.values())
+            self._query_table = QueryTable(self.root.parts.values())
+        return self._query_table
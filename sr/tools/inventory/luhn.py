@@ -41,8 +41,57 @@ The default alphabet is '0123456789'.
 False
 >>> checksum('1234', alphabet='0123456789abcdef')
 14
+
+Many numbers can be validated at once with is_valid_many().
+
+>>> is_valid_many(['7894', '78949'])
+[False, True]
 """
 
+import functools
+
+
+def tables(alphabet):
+    """
+    Get lookup tables for an alphabet. The tables are built once for each
+    alphabet and shared by everything which uses it.
+
+    :param alphabet: The alphabet of digits, as a string or a sequence.
+    :returns: Two dicts, mapping each digit to its value and to its
+              contribution to the checksum when it is doubled.
+    :rtype: tuple
+    """
+    if not isinstance(alphabet, str):
+        alphabet = tuple(alphabet)
+    return _build_tables(alphabet)
+
+
+@functools.lru_cache(maxsize=None)
+def _build_tables(alphabet):
+    """
+    Build lookup tables for an alphabet.
+
+    :param alphabet: The alphabet of digits, as a string or a tuple.
+    :returns: Two dicts, mapping each digit to its value and to its
+              contribution to the checksum when it is doubled.
+    :rtype: tuple
+    """
+    n = len(alphabet)
+    single = {}
+    doubled = {}
+    for value, digit in enumerate(alphabet):
+        single.setdefault(digit, value)
+        doubled.setdefault(digit, sum(divmod(value * 2, n)))
+    return single, doubled
+
+
+def _sum(number, single, doubled):
+    # Every second digit, counting from the rightmost, is doubled
+    digits = number[::-1]
+    return sum(map(single.__getitem__, digits[::2])) + sum(
+        map(doubled.__getitem__, digits[1::2]),
+    )
+
 
 def checksum(number, alphabet='0123456789'):
     """
@@ -54,9 +103,11 @@ def checksum(number, alphabet='0123456789'):
     :returns: The checksum of the number.
     :rtype: int
     """
-    n = len(alphabet)
-    number = tuple(alphabet.index(i) for i in reversed(str(number)))
-    return (sum(number[::2]) + sum(sum(divmod(i * 2, n)) for i in number[1::2])) % n
+    single, doubled = tables(alphabet)
+    try:
+        return _sum(str(number), single, doubled) % len(alphabet)
+    except KeyError as e:
+        raise ValueError(f"{e.args[0]!r} is not in the alphabet") from None
 
 
 def is_valid(number, alphabet='0123456789'):
@@ -71,6 +122,31 @@ def is_valid(number, alphabet='0123456789'):
     return checksum(number, alphabet) == 0
 
 
+def is_valid_many(numbers, alphabet='0123456789'):
+    """
+    Check which of many numbers pass the Luhn checksum.
+
+    This is much quicker than calling :func:`is_valid` for each number, as the
+    alphabet is only looked at once.
+
+    :param numbers: An iterable of the numbers, as strings, to validate.
+    :param str alphabet: The alphabet of digits.
+    :returns: Whether each number is valid. Numbers containing digits which
+              aren't in the alphabet are invalid.
+    :rtype: list of bool
+    """
+    single, doubled = tables(alphabet)
+    n = len(alphabet)
+    results = []
+    append = results.append
+    for number in numbers:
+        try:
+            append(_sum(number, single, doubled) % n == 0)
+        except KeyError:
+            append(False)
+    return results
+
+
 def calc_check_digit(number, alphabet='0123456789'):
     """
     With the provided number, calculate the extra digit that should be appended
@@ -1,7 +1,30 @@
 import fnmatch
 from functools import reduce
 
-from sr.tools.inventory import assetcode, inventory
+from sr.tools.inventory import assetcode
+
+# Marks a property which a node doesn't have, as distinct from one which is None
+_MISSING = object()
+
+
+def _name(inv_node):
+    return getattr(inv_node, 'name', None)
+
+
+def _code(inv_node):
+    return inv_node.code
+
+
+def _serial(inv_node):
+    return inv_node.info.get("serial", None)
+
+
+def _labelled(inv_node):
+    return getattr(inv_node, 'labelled', _MISSING)
+
+
+def _is_assy(inv_node):
+    return hasattr(inv_node, 'code') and hasattr(inv_node, 'children')
 
 
 class ASTNode:
@@ -11,6 +34,30 @@ class ASTNode:
         """Get a string symbolic expression of the node."""
         return ""
 
+    def match_bits(self, table, within=None):
+        """
+        Find the nodes in a :class:`~sr.tools.inventory.query_table.QueryTable`
+        which match the operation defined in this AST node.
+
+        :param int within: A bitset of the only nodes which the caller is
+                           interested in, or None for all of them. Nodes
+                           outside of it need not be evaluated.
+        :returns: A bitset of the matching nodes, limited to ``within``.
+        :rtype: int
+        """
+        raise NotImplementedError(
+            f"match_bits(...) not implemented for {self.__class__}",
+        )
+
+    def estimate(self, table):
+        """
+        Estimate the fraction of the nodes in a table which this AST node will
+        match, for planning the order of evaluation.
+
+        :rtype: float
+        """
+        return 0.5
+
 
 class NonTerminal(ASTNode):
     """A non-terminal AST node."""
@@ -50,6 +97,9 @@ class Terminal(ASTNode):
         """
         return list(filter(self.match_single, inv_nodes))
 
+    def match_bits(self, table, within=None):
+        return table.where(table.nodes[:table.size], self.match_single, within)
+
 
 class Not(NonTerminal):
     """
@@ -67,6 +117,14 @@ class Not(NonTerminal):
         matches = self.node.match(inv_nodes)
         return list({x for x in inv_nodes if x not in matches})
 
+    def match_bits(self, table, within=None):
+        if within is None:
+            within = table.universe
+        return within & ~self.node.match_bits(table, within)
+
+    def estimate(self, table):
+        return 1 - self.node.estimate(table)
+
     def sexpr(self):
         return f"(NOT {self.node.sexpr()})"
 
@@ -92,6 +150,17 @@ class And(NonTerminal):
             {x for x in inv_nodes if (x in left_matches and x in right_matches)},
         )
 
+    def match_bits(self, table, within=None):
+        # Only the nodes matching the left side need checking against the
+        # right, so the planner puts the more selective side on the left.
+        left_matches = table.universe & self.left.match_bits(table, within)
+        if not left_matches:
+            return 0
+        return self.right.match_bits(table, left_matches)
+
+    def estimate(self, table):
+        return self.left.estimate(table) * self.right.estimate(table)
+
     def sexpr(self):
         return f"(AND {self.left.sexpr()} {self.right.sexpr()})"
 
@@ -115,6 +184,22 @@ class Or(NonTerminal):
         right_matches = self.right.match(inv_nodes)
         return list({x for x in inv_nodes if (x in left_matches or x in right_matches)})
 
+    def match_bits(self, table, within=None):
+        # Only the nodes not matching the left side need checking against the
+        # right, so the planner puts the less selective side on the left.
+        if within is None:
+            within = table.universe
+        left_matches = within & self.left.match_bits(table, within)
+        remaining = within & ~left_matches
+        if not remaining:
+            return left_matches
+        return left_matches | self.right.match_bits(table, remaining)
+
+    def estimate(self, table):
+        left = self.left.estimate(table)
+        right = self.right.estimate(table)
+        return left + right - left * right
+
     def sexpr(self):
         return f"(OR {self.left.sexpr()} {self.right.sexpr()})"
 
@@ -132,53 +217,19 @@ class Condition(Terminal):
         super().__init__()
         self.conditions = set(conditions)
 
-    def _flatten(self, lst):
-        if type(lst) not in (list, tuple):
-            return lst
-        ret = []
-        for i in lst:
-            if type(i) in (list, tuple):
-                ret.extend(self._flatten(i))
-            else:
-                ret.append(i)
-        return ret
-
     def _state(self, inv_node):
-        if isinstance(inv_node, inventory.Item):
-            return inv_node.condition
-
-        elif isinstance(inv_node, inventory.ItemGroup):
-            expected = inv_node.elements
-            if expected is None:
-                return 'working'
-            ret = []
-            for name in expected:
-                count = 1
-                if isinstance(name, dict):
-                    name, count = list(name.items())[0]
-                if name not in inv_node.types:
-                    ret.append('broken')
-                if name in inv_node.types:
-                    c = 0
-                    for type_ in inv_node.types[name]:
-                        if c == count:
-                            break
-                        ret.append(self._state(type_))
-                        c += 1
-                    if c != count:
-                        ret.append('broken')
-                else:
-                    ret.append('broken')
-            ret = set(self._flatten(ret))
-            if len(ret) == 1:
-                return ret.pop()
-            if 'broken' in ret:
-                return 'broken'
-            return 'unknown'
+        return getattr(inv_node, 'effective_condition', None)
 
     def match_single(self, inv_node):
         return self._state(inv_node) in self.conditions
 
+    def match_bits(self, table, within=None):
+        return table.lookup('condition', self._state, self.conditions, within)
+
+    def estimate(self, table):
+        # There are only three conditions, so this is never very selective
+        return min(1, len(self.conditions) / 3)
+
     def sexpr(self):
         return f"(Condition {list(self.conditions)})"
 
@@ -195,13 +246,23 @@ class Type(Terminal):
         super().__init__()
         self.types = types
 
+    def _match_name(self, name):
+        for type_ in self.types:
+            if fnmatch.fnmatchcase(name, type_):
+                return True
+        return False
+
     def match_single(self, inv_node):
         if hasattr(inv_node, 'name'):
-            for type_ in self.types:
-                if fnmatch.fnmatch(inv_node.name, type_):
-                    return True
+            return self._match_name(inv_node.name)
         return False
 
+    def match_bits(self, table, within=None):
+        return table.lookup_patterns('name', _name, self.types, within)
+
+    def estimate(self, table):
+        return min(1, 0.05 * len(self.types))
+
     def sexpr(self):
         return f"(Type {list(self.types)})"
 
@@ -224,6 +285,14 @@ class Labelled(Terminal):
             return inv_node.labelled == self.labelled
         return False
 
+    def match_bits(self, table, within=None):
+        labelled = table.column('labelled', _labelled)
+        return table.where(
+            labelled,
+            lambda x: x is not _MISSING and x == self.labelled,
+            within,
+        )
+
     def sexpr(self):
         return f"(Labelled {self.labelled})"
 
@@ -242,9 +311,15 @@ class Assy(Terminal):
         self.assy = assy.lower() in ('true', '1', 'yes', 't')
 
     def match_single(self, inv_node):
-        return self.assy == (
-            hasattr(inv_node, 'code') and hasattr(inv_node, 'children')
-        )
+        return self.assy == _is_assy(inv_node)
+
+    def match_bits(self, table, within=None):
+        assy = table.column('assy', _is_assy)
+        return table.where(assy, self.assy.__eq__, within)
+
+    def estimate(self, table):
+        # Assemblies are much rarer than parts
+        return 0.05 if self.assy else 0.95
 
     def sexpr(self):
         return f"(Assy {self.assy})"
@@ -265,15 +340,25 @@ class TriState(Terminal):
         self.desired_val = desired_val.lower()
 
     def match_single(self, inv_node):
+        return self._match_value(inv_node.info.get(self.key, _MISSING))
+
+    def _match_value(self, value):
         if self.desired_val == 'unset':
-            return self.key not in inv_node.info.keys()
-        if self.key in inv_node.info.keys():
+            return value is _MISSING
+        if value is not _MISSING:
             if self.desired_val == "true":
-                return inv_node.info[self.key]
+                return value
             else:
-                return inv_node.info[self.key] is False
+                return value is False
         return False
 
+    def match_bits(self, table, within=None):
+        values = table.column(
+            f'info:{self.key}',
+            lambda inv_node: inv_node.info.get(self.key, _MISSING),
+        )
+        return table.where(values, self._match_value, within)
+
     def sexpr(self):
         return f"(TriState {self.key}: {self.desired_val})"
 
@@ -299,14 +384,33 @@ class Path(Terminal):
                 return n.path
             n = n.parent
 
-    def match_single(self, inv_node):
+    def _relative_path(self, inv_node):
+        if not hasattr(inv_node, 'path'):
+            return None
         root_path = self._root_path(inv_node)
-        if hasattr(inv_node, 'path'):
+        return inv_node.path[len(root_path) + 1:]
+
+    def _match_relative_path(self, relative_path):
+        if relative_path is not None:
             for path in self.paths:
-                if fnmatch.fnmatch(inv_node.path[len(root_path) + 1:], path):
+                if fnmatch.fnmatchcase(relative_path, path):
                     return True
         return False
 
+    def match_single(self, inv_node):
+        return self._match_relative_path(self._relative_path(inv_node))
+
+    def match_bits(self, table, within=None):
+        return table.lookup_patterns(
+            'path',
+            self._relative_path,
+            self.paths,
+            within,
+        )
+
+    def estimate(self, table):
+        return min(1, 0.2 * len(self.paths))
+
     def sexpr(self):
         return f"(Path {list(self.paths)})"
 
@@ -326,6 +430,13 @@ class Code(Terminal):
     def match_single(self, inv_node):
         return inv_node.code in self.codes
 
+    def match_bits(self, table, within=None):
+        return table.lookup('code', _code, self.codes, within)
+
+    def estimate(self, table):
+        # Codes are unique
+        return min(1, len(self.codes) / max(1, table.size))
+
     def sexpr(self):
         return f"(Code {list(self.codes)})"
 
@@ -345,6 +456,13 @@ class Serial(Terminal):
         serial = inv_node.info.get("serial", None)
         return serial in self.serials
 
+    def match_bits(self, table, within=None):
+        return table.lookup('serial', _serial, self.serials, within)
+
+    def estimate(self, table):
+        # Serials are nearly unique
+        return min(1, 2 * len(self.serials) / max(1, table.size))
+
     def sexpr(self):
         return f"(Serial {list(self.serials)})"
 
@@ -387,6 +505,22 @@ class Function(NonTerminal):
             ),
         )
 
+    def match_bits(self, table, within=None):
+        # The nodes being mapped are unrelated to those the caller wants, so
+        # the inner node is evaluated in full.
+        func = self._functions[self.func_name]
+        results = []
+        for inv_node in table.nodes_from_bits(self.node.match_bits(table)):
+            results.extend(func(inv_node))
+
+        bits = table.bits_from_nodes(results)
+        if within is not None:
+            bits &= within
+        return bits
+
+    def estimate(self, table):
+        return self.node.estimate(table)
+
     def sexpr(self):
         return f"(Function '{self.func_name}' {self.node.sexpr()})"
 
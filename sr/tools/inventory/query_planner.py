@@ -0,0 +1,105 @@
+"""
+Planning of the order in which the parts of a query are evaluated.
+
+Queries are evaluated with bitsets (see
+:mod:`~sr.tools.inventory.query_table`), where each side of an ``AND`` is only
+evaluated over the nodes matched by the side before it, and each side of an
+``OR`` only over those not yet matched. The planner orders the operands of
+each chain of ``AND``\\ s from most to least selective, and of each chain of
+``OR``\\ s from least to most selective, so that as little as possible is
+evaluated.
+"""
+
+from sr.tools.inventory import query_ast
+
+
+def _flatten(node, cls):
+    if isinstance(node, cls):
+        return _flatten(node.left, cls) + _flatten(node.right, cls)
+    return [node]
+
+
+def _rebuild(operands, cls):
+    node = operands[0]
+    for operand in operands[1:]:
+        node = cls(node, operand)
+    return node
+
+
+def plan(node, table):
+    """
+    Plan the evaluation of a query.
+
+    :param node: The root of the query's AST, as from
+                 :func:`~sr.tools.inventory.query_parser.search_tree`.
+    :param table: The :class:`~sr.tools.inventory.query_table.QueryTable` the
+                  query is to be evaluated against.
+    :returns: An equivalent AST, with the operands of each ``AND`` and ``OR``
+              in the order they should be evaluated in. The given AST is not
+              modified.
+    """
+    for cls, most_selective_first in ((query_ast.And, True), (query_ast.Or, False)):
+        if isinstance(node, cls):
+            operands = [plan(x, table) for x in _flatten(node, cls)]
+            # sorted() is stable, so equal estimates keep the written order
+            operands = sorted(
+                operands,
+                key=lambda x: x.estimate(table),
+                reverse=not most_selective_first,
+            )
+            return _rebuild(operands, cls)
+
+    if isinstance(node, query_ast.Not):
+        return query_ast.Not(plan(node.node, table))
+
+    if isinstance(node, query_ast.Function):
+        return query_ast.Function(node.func_name, plan(node.node, table))
+
+    return node
+
+
+def _label(node):
+    if isinstance(node, query_ast.And):
+        return "AND"
+    if isinstance(node, query_ast.Or):
+        return "OR"
+    if isinstance(node, query_ast.Not):
+        return "NOT"
+    if isinstance(node, query_ast.Function):
+        return f"Function '{node.func_name}'"
+    return node.sexpr()
+
+
+def _children(node):
+    if isinstance(node, (query_ast.And, query_ast.Or)):
+        return [node.left, node.right]
+    if isinstance(node, (query_ast.Not, query_ast.Function)):
+        return [node.node]
+    return []
+
+
+def explain(node, table):
+    """
+    Describe the plan for a query.
+
+    :param node: The planned AST, as from :func:`plan`.
+    :param table: The :class:`~sr.tools.inventory.query_table.QueryTable` the
+                  query is to be evaluated against.
+    :returns: A description of the plan, consisting of its symbolic expression
+              followed by a tree of the nodes in evaluation order, each with
+              its estimated number of matches.
+    :rtype: str
+    """
+    lines = [f"Plan over {table.size} nodes:", node.sexpr()]
+    rows = []
+
+    def rec(n, depth):
+        rows.append(('  ' * depth + _label(n), n.estimate(table) * table.size))
+        for child in _children(n):
+            rec(child, depth + 1)
+
+    rec(node, 0)
+    width = max(len(label) for label, _ in rows)
+    for label, estimate in rows:
+        lines.append(f"{label:<{width}}  ~{estimate:.0f}")
+    return "\n".join(lines)
@@ -0,0 +1,272 @@
+"""
+A columnar representation of inventory nodes, for evaluating queries.
+
+Sets of nodes are represented as bitsets, stored in Python integers, where bit
+``i`` is set if the node at position ``i`` of the table is in the set. This
+makes the logical operations in a query (AND, OR and NOT) single bitwise
+operations, rather than membership tests between lists of nodes.
+
+Columns which are commonly compared for equality (such as asset codes) can also
+be indexed, mapping each distinct value to the bitset of the nodes which have
+it, so that a lookup costs time in proportion to the number of values looked up
+rather than the size of the inventory. The distinct string values of an index
+are also kept sorted, so that wildcard patterns with a literal prefix only need
+to be tested against the values with that prefix.
+"""
+
+import bisect
+import fnmatch
+
+# Below this density of candidate nodes, predicates are only evaluated at the
+# positions of the candidates, rather than over the whole column.
+SPARSE_RATIO = 16
+
+_WILDCARDS = '*?['
+
+
+def _literal_prefix(pattern):
+    """Get the part of an ``fnmatch`` pattern before its first wildcard."""
+    for i, char in enumerate(pattern):
+        if char in _WILDCARDS:
+            return pattern[:i]
+    return pattern
+
+
+class _Index:
+    """An index of the distinct values of a column."""
+
+    def __init__(self, bits):
+        self.bits = bits
+        self.sorted_keys = sorted(k for k in bits if isinstance(k, str))
+
+
+class QueryTable:
+    """
+    A table of inventory nodes with lazily computed columns of their
+    properties.
+
+    The nodes the table is created with form the *universe* of a query: the
+    nodes which the terminals of the query are evaluated over. Functions in a
+    query (such as ``parent of``) can produce nodes outside of the universe;
+    these are added to the end of the table as they are found.
+
+    :param nodes: The nodes to query.
+    """
+
+    def __init__(self, nodes):
+        """Create a new table."""
+        self.nodes = list(nodes)
+        self.size = len(self.nodes)
+        self.universe = (1 << self.size) - 1
+        self._positions = {node: i for i, node in enumerate(self.nodes)}
+        self._columns = {}
+        self._indexes = {}
+
+    def column(self, name, getter):
+        """
+        Get a column of values, one for each node in the universe.
+
+        :param str name: The name of the column, which it is cached under.
+        :param getter: A function which returns the value of the column for a
+                       node. It is only called the first time the column is
+                       requested.
+        :returns: The values, in the order of the nodes in the table.
+        :rtype: list
+        """
+        try:
+            return self._columns[name]
+        except KeyError:
+            pass
+
+        values = [getter(node) for node in self.nodes[:self.size]]
+        self._columns[name] = values
+        return values
+
+    def _index(self, name, getter):
+        try:
+            return self._indexes[name]
+        except KeyError:
+            pass
+
+        positions = {}
+        for position, value in enumerate(self.column(name, getter)):
+            positions.setdefault(value, []).append(position)
+        index = _Index({
+            value: self.bits_from_positions(value_positions)
+            for value, value_positions in positions.items()
+        })
+        self._indexes[name] = index
+        return index
+
+    def _use_index(self, name, within):
+        # Don't build an index to test a handful of candidates
+        if name in self._indexes or within is None:
+            return True
+        return self.count(within) * SPARSE_RATIO >= self.size
+
+    def lookup(self, name, getter, values, within=None):
+        """
+        Get the bitset of the positions of a column equal to any of some values,
+        using an index of the column.
+
+        :param str name: The name of the column.
+        :param getter: The getter for the column, as for :meth:`column`.
+        :param values: The values to look up.
+        :param int within: A bitset of the only positions to test, or None for
+                           all of them.
+        :returns: The bitset.
+        :rtype: int
+        """
+        if not self._use_index(name, within):
+            values = set(values)
+            return self.where(self.column(name, getter), values.__contains__, within)
+
+        index = self._index(name, getter).bits
+        bits = 0
+        for value in values:
+            bits |= index.get(value, 0)
+        if within is not None:
+            bits &= within
+        return bits
+
+    def lookup_patterns(self, name, getter, patterns, within=None):
+        """
+        Get the bitset of the positions of a column which match any of some
+        ``fnmatch`` patterns, using an index of the column.
+
+        Patterns without wildcards are looked up directly, and those with
+        wildcards are only tested against the values which start with the
+        literal part of the pattern before its first wildcard.
+
+        :param str name: The name of the column.
+        :param getter: The getter for the column, as for :meth:`column`. Only
+                       string values can match.
+        :param patterns: The patterns.
+        :param int within: A bitset of the only positions to test, or None for
+                           all of them.
+        :returns: The bitset.
+        :rtype: int
+        """
+        if not self._use_index(name, within):
+            def predicate(value):
+                return isinstance(value, str) and any(
+                    fnmatch.fnmatchcase(value, pattern) for pattern in patterns
+                )
+
+            return self.where(self.column(name, getter), predicate, within)
+
+        index = self._index(name, getter)
+        bits = 0
+        for pattern in patterns:
+            prefix = _literal_prefix(pattern)
+            if prefix == pattern:
+                bits |= index.bits.get(pattern, 0)
+                continue
+
+            keys = index.sorted_keys
+            i = bisect.bisect_left(keys, prefix)
+            while i < len(keys) and keys[i].startswith(prefix):
+                if fnmatch.fnmatchcase(keys[i], pattern):
+                    bits |= index.bits[keys[i]]
+                i += 1
+        if within is not None:
+            bits &= within
+        return bits
+
+    def where(self, values, predicate, within=None):
+        """
+        Get the bitset of the positions of a column where a predicate holds.
+
+        :param values: The column of values.
+        :param predicate: The predicate to test each value with.
+        :param int within: A bitset of the only positions to test, or None for
+                           all of them.
+        :returns: The bitset.
+        :rtype: int
+        """
+        if within is not None and self.count(within) * SPARSE_RATIO < len(values):
+            bits = 0
+            for position in self.positions(within):
+                if position < len(values) and predicate(values[position]):
+                    bits |= 1 << position
+            return bits
+
+        flags = ''.join('1' if predicate(v) else '0' for v in reversed(values))
+        bits = int(flags, 2) if flags else 0
+        if within is not None:
+            bits &= within
+        return bits
+
+    @staticmethod
+    def positions(bits):
+        """
+        Iterate over the positions in a bitset, in ascending order.
+
+        :param int bits: The bitset.
+        :returns: An iteration of positions.
+        """
+        flags = bin(bits)[:1:-1]
+        position = flags.find('1')
+        while position != -1:
+            yield position
+            position = flags.find('1', position + 1)
+
+    def bits_from_positions(self, positions):
+        """
+        Get the bitset of some positions.
+
+        :param positions: The positions, which must be in the universe.
+        :returns: The bitset.
+        :rtype: int
+        """
+        if len(positions) * SPARSE_RATIO < self.size:
+            bits = 0
+            for position in positions:
+                bits |= 1 << position
+            return bits
+
+        flags = bytearray(b'0' * self.size)
+        for position in positions:
+            flags[position] = ord('1')
+        flags.reverse()
+        return int(flags, 2) if flags else 0
+
+    def bits_from_nodes(self, nodes):
+        """
+        Get the bitset for some nodes, adding any which are not already in the
+        table to its end.
+
+        :param nodes: The nodes.
+        :returns: The bitset.
+        :rtype: int
+        """
+        bits = 0
+        for node in nodes:
+            try:
+                position = self._positions[node]
+            except KeyError:
+                position = len(self.nodes)
+                self.nodes.append(node)
+                self._positions[node] = position
+            bits |= 1 << position
+        return bits
+
+    def nodes_from_bits(self, bits):
+        """
+        Get the nodes in a bitset, in the order of the table.
+
+        :param int bits: The bitset.
+        :returns: The nodes.
+        :rtype: list
+        """
+        return [self.nodes[position] for position in self.positions(bits)]
+
+    @staticmethod
+    def count(bits):
+        """
+        Count the nodes in a bitset.
+
+        :param int bits: The bitset.
+        :rtype: int
+        """
+        return bin(bits).count('1')
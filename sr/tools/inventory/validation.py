@@ -0,0 +1,520 @@
+"""
+Checking the inventory for problems.
+
+The inventory is walked once, and each node found is passed to every check in
+turn. Checks which only look at one node at a time, and need to do a lot of
+work for each, such as parsing its file, can be run in a pool of processes
+instead. Problems are yielded as soon as they are found, so that they can be
+reported while the rest of the inventory is checked.
+
+Asset files are checked against the templates they were made from, in
+``.meta/parts`` and ``.meta/assemblies``, which are compiled into a
+:class:`Schema` once per process. The checks which load asset files can be
+limited to those which have changed since a git revision (see
+:func:`changed_since`), while the rest, which only look at names, always see
+the whole inventory.
+"""
+
+import collections
+import functools
+import os
+
+from sr.tools.inventory import inventory
+from sr.tools.inventory.assetcode import CODEC
+
+#: A node of the inventory, as passed to the checks. ``kind`` is one of
+#: ``'item'``, ``'group'``, ``'directory'`` (a plain directory) or
+#: ``'file'`` (a file which isn't an asset). ``name`` is the type of the
+#: asset, or the file name for other nodes, and ``code`` is None for them.
+Node = collections.namedtuple('Node', 'path relpath kind name code')
+
+#: A problem found by a check. ``path`` is relative to the inventory, or None
+#: if the problem isn't with any one node.
+Problem = collections.namedtuple('Problem', 'check path message')
+
+
+def walk(root_path):
+    """
+    Walk through an inventory, yielding every node in it.
+
+    Nodes within a directory are yielded before the directory itself.
+
+    :param str root_path: The root of the inventory.
+    :returns: An iteration of :class:`Node`.
+    """
+    yield from _walk(root_path, '', False)
+
+
+def _walk(path, relpath, in_group):
+    if in_group:
+        ignored = inventory.ItemGroup.ignore_fnames
+    else:
+        ignored = inventory.ItemTree.ignore_fnames
+    for fname, is_dir in sorted(inventory._list_dir(path)):
+        if inventory.should_ignore(fname) or fname in ignored:
+            continue
+
+        child_path = os.path.join(path, fname)
+        child_relpath = os.path.join(relpath, fname)
+        m = inventory.RE_PART.match(fname)
+        if is_dir:
+            yield from _walk(child_path, child_relpath, m is not None)
+            if m is not None:
+                yield Node(child_path, child_relpath, 'group', m.group(1), m.group(2))
+            else:
+                yield Node(child_path, child_relpath, 'directory', fname, None)
+        elif m is not None and fname not in inventory.ItemTree.special_fnames:
+            yield Node(child_path, child_relpath, 'item', m.group(1), m.group(2))
+        else:
+            yield Node(child_path, child_relpath, 'file', fname, None)
+
+
+class Check:
+    """
+    A check of the inventory, which is shown each node in turn.
+
+    A check which sets :attr:`parallel` may be copied to other processes and
+    shown some of the nodes there, so it mustn't keep any state between
+    nodes, and :meth:`finish` isn't called for it.
+    """
+
+    #: The name of the check, used when reporting problems.
+    name = None
+    #: Whether the check can be run in a pool of processes.
+    parallel = False
+
+    def __init__(self, root_path):
+        """Create a new check of an inventory."""
+        self.root_path = root_path
+
+    def problem(self, node, message):
+        """
+        Create a problem found by this check.
+
+        :param node: The node with the problem, or None.
+        :type node: :class:`Node`
+        :param str message: A description of the problem.
+        :rtype: :class:`Problem`
+        """
+        return Problem(self.name, node.relpath if node is not None else None, message)
+
+    def visit(self, node):
+        """
+        Check a node.
+
+        :param node: The node to check.
+        :type node: :class:`Node`
+        :returns: Any problems with the node.
+        :rtype: iterable of :class:`Problem`
+        """
+        return ()
+
+    def finish(self):
+        """
+        Finish checking, once every node has been visited.
+
+        :returns: Any problems which can only be found after looking at every
+                  node.
+        :rtype: iterable of :class:`Problem`
+        """
+        return ()
+
+
+#: The checks which are run by default, in order.
+CHECKS = []
+
+
+def check(cls):
+    """Register a check to be run by default."""
+    CHECKS.append(cls)
+    return cls
+
+
+@check
+class FileNames(Check):
+    """Check that every file in the inventory is an asset."""
+
+    name = 'file-names'
+
+    def visit(self, node):
+        if node.kind != 'file':
+            return ()
+
+        comment = inventory.ItemTree.special_fnames.get(
+            node.name,
+            "does not have a valid name (should be in the form <name>-sr<part-code>)",
+        )
+        return [self.problem(node, f"Invalid asset: {comment}.")]
+
+
+@check
+class AssetCodes(Check):
+    """Check that every asset code is valid."""
+
+    name = 'asset-codes'
+
+    def visit(self, node):
+        if node.code is None or CODEC.is_valid(node.code):
+            return ()
+        return [self.problem(node, f"Invalid asset code: {node.code}")]
+
+
+@check
+class DuplicateCodes(Check):
+    """Check that no two assets have the same code."""
+
+    name = 'duplicate-codes'
+
+    def __init__(self, root_path):
+        super().__init__(root_path)
+        self.paths = collections.defaultdict(list)
+
+    def visit(self, node):
+        if node.code is not None:
+            self.paths[node.code].append(node.relpath)
+        return ()
+
+    def finish(self):
+        for code, paths in self.paths.items():
+            if len(paths) > 1:
+                yield Problem(
+                    self.name,
+                    None,
+                    f"Duplicate asset code {code}: {', '.join(paths)}",
+                )
+
+
+def _info_path(node):
+    if node.kind == 'group':
+        return os.path.join(node.path, 'info')
+    return node.path
+
+
+# Several checks load each asset's file in turn, so the last one is kept.
+@functools.lru_cache(maxsize=1)
+def _load_info(path):
+    return inventory._parse_yaml_file(path)
+
+
+def load_info(node):
+    """
+    Load the file of an asset, checking it as the inventory does when it
+    loads it.
+
+    :param node: The item or group.
+    :type node: :class:`Node`
+    :returns: The contents of the asset's file.
+    :rtype: dict
+    :raises Exception: If the file can't be loaded or is invalid.
+    """
+    info = _load_info(_info_path(node))
+    cls = inventory.ItemGroup if node.kind == 'group' else inventory.Item
+    cls.check_info(info, node.code, node.path)
+    return info
+
+
+@check
+class AssetFiles(Check):
+    """Check that every asset's file can be loaded, and is valid."""
+
+    name = 'asset-files'
+    parallel = True
+
+    def visit(self, node):
+        if node.kind not in ('item', 'group'):
+            return ()
+
+        try:
+            load_info(node)
+        except Exception as e:
+            return [self.problem(node, str(e))]
+        return ()
+
+
+def _type_name(types):
+    if types == (bool,):
+        return "a boolean"
+    if types == (int, float):
+        return "a number"
+    if types == (str,):
+        return "a string"
+    if types == (list,):
+        return "a list"
+    return "a mapping"
+
+
+class Schema:
+    """
+    The properties which the files made from a template must have, and the
+    types of their values.
+
+    Every property of the template is required, with a value of the same
+    type as the template's, where integers and floats are interchangeable.
+    Properties which are empty in the template may have any value. The asset
+    code isn't included, as it's checked separately.
+
+    :param dict template: The parsed template.
+    """
+
+    def __init__(self, template):
+        """Compile a schema from a template."""
+        #: The allowed types of each property's value, or None for any.
+        self.types = {}
+        for key, value in template.items():
+            if key == 'assetcode':
+                continue
+            if isinstance(value, bool):
+                types = (bool,)
+            elif isinstance(value, (int, float)):
+                types = (int, float)
+            elif isinstance(value, (str, list, dict)):
+                types = (type(value),)
+            else:
+                types = None
+            self.types[key] = types
+
+    def check(self, info):
+        """
+        Check the contents of an asset's file against the schema.
+
+        :param dict info: The contents of the file.
+        :returns: A description of each problem with the file.
+        :rtype: list of str
+        """
+        problems = []
+        for key, types in self.types.items():
+            if key not in info:
+                problems.append(f"is missing the '{key}' property")
+                continue
+
+            value = info[key]
+            if types is None:
+                continue
+            if isinstance(value, types):
+                # Booleans are integers too, but aren't numbers here
+                if bool in types or not isinstance(value, bool):
+                    continue
+            problems.append(
+                f"'{key}' should be {_type_name(types)}, "
+                f"not {type(value).__name__}",
+            )
+        return problems
+
+
+# Compiled schemas, by the path to their template, along with the stat of the
+# template they were compiled from.
+_schemas = {}
+
+
+def get_schema(path):
+    """
+    Get the schema for a template, compiling it only when the template has
+    changed since it was last compiled.
+
+    :param str path: The path to the template.
+    :returns: The schema, or None if there is no such template.
+    :rtype: :class:`Schema`
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _schemas.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    from sr.tools import yamlio
+
+    with open(path) as file:
+        # '[ASSET_CODE]' would be a list in YAML
+        text = file.read().replace('[ASSET_CODE]', "''")
+    schema = Schema(yamlio.load(text) or {})
+    _schemas[path] = (key, schema)
+    return schema
+
+
+def template_path(root_path, node):
+    """
+    Get the path of the template for an asset, as used when creating it.
+
+    :param str root_path: The root of the inventory.
+    :param node: The item or group.
+    :type node: :class:`Node`
+    :returns: The path to the template for the asset's type, or to the default
+              template if there is none for its type.
+    :rtype: str
+    """
+    kind = 'assemblies' if node.kind == 'group' else 'parts'
+    path = os.path.join(root_path, '.meta', kind, node.name)
+    if not os.path.isfile(path):
+        path = os.path.join(root_path, '.meta', kind, 'default')
+    return path
+
+
+@check
+class TemplateSchemas(Check):
+    """Check that every asset's file matches its type's template."""
+
+    name = 'schema'
+    parallel = True
+
+    def visit(self, node):
+        if node.kind not in ('item', 'group'):
+            return ()
+
+        try:
+            info = load_info(node)
+        except Exception:
+            return ()  # Reported by AssetFiles
+
+        schema = get_schema(template_path(self.root_path, node))
+        if schema is None:
+            return ()
+        return [self.problem(node, message) for message in schema.check(info)]
+
+
+@check
+class GroupElements(Check):
+    """Check that every group contains the elements listed in its info file."""
+
+    name = 'elements'
+    parallel = True
+
+    def visit(self, node):
+        if node.kind != 'group':
+            return ()
+
+        try:
+            elements = load_info(node)['elements']
+        except Exception:
+            return ()  # Reported by AssetFiles
+        if not isinstance(elements, list):
+            return [self.problem(node, "'elements' should be a list")]
+
+        # Elements are either names, or mappings of a name to a count, as in
+        # ItemGroup._compute_condition
+        problems = []
+        expected = collections.Counter()
+        for element in elements:
+            name, count = element, 1
+            if isinstance(element, dict) and len(element) == 1:
+                name, count = list(element.items())[0]
+            if not isinstance(name, str) or not isinstance(count, int):
+                problems.append(
+                    self.problem(node, f"has an invalid element: {element!r}"),
+                )
+                continue
+            expected[name] += count
+
+        actual = collections.Counter()
+        for fname, _ in inventory._list_dir(node.path):
+            m = inventory.RE_PART.match(fname)
+            if m is not None and not inventory.should_ignore(fname):
+                actual[m.group(1)] += 1
+
+        # Extra assets in a group don't affect its condition, so only missing
+        # elements are problems
+        for name in sorted(expected):
+            if actual[name] < expected[name]:
+                problems.append(self.problem(
+                    node,
+                    f"has {actual[name]} {name}, but its elements list "
+                    f"{expected[name]}",
+                ))
+        return problems
+
+
+def _visit(checks, node):
+    problems = []
+    for checker in checks:
+        problems.extend(checker.visit(node))
+    return problems
+
+
+def _visit_in_parallel(checks, nodes, workers):
+    visit = functools.partial(_visit, checks)
+    if workers == 1 or len(nodes) < inventory.PARALLEL_PARSE_THRESHOLD:
+        for node in nodes:
+            yield from visit(node)
+        return
+
+    import concurrent.futures
+
+    done = 0
+    chunksize = max(1, len(nodes) // (workers * 4))
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            for problems in pool.map(visit, nodes, chunksize=chunksize):
+                done += 1
+                yield from problems
+    except (OSError, concurrent.futures.process.BrokenProcessPool):
+        # Some environments can't start processes; check the rest serially.
+        for node in nodes[done:]:
+            yield from visit(node)
+
+
+def changed_since(root_path, revision):
+    """
+    Find which nodes of an inventory need checking again, after changes since
+    a git revision.
+
+    These are the assets which have been changed or added since the revision,
+    including untracked ones, along with the groups they are (or were) within.
+
+    :param str root_path: The root of the inventory.
+    :param str revision: The git revision.
+    :returns: The paths of the nodes, relative to the inventory, or None if
+              every node needs checking because the templates have changed.
+    :rtype: set of str or None
+    """
+    changed = set()
+    for path in inventory.git_changed_paths(root_path, revision, untracked=True):
+        path = os.path.normpath(path)
+        if path.split(os.sep)[0] == '.meta':
+            return None
+
+        if os.path.basename(path) == 'info':
+            path = os.path.dirname(path)
+        while path and path not in changed:
+            changed.add(path)
+            path = os.path.dirname(path)
+    return changed
+
+
+def validate(root_path, checks=None, workers=None, changed=None):
+    """
+    Check an inventory for problems.
+
+    :param str root_path: The root of the inventory.
+    :param checks: The checks to run. If this is None, new instances of each
+                   of the checks in :data:`CHECKS` are used.
+    :type checks: list of :class:`Check`
+    :param int workers: The number of processes to run parallel checks in.
+                        See :func:`~sr.tools.inventory.inventory.get_worker_count`.
+    :param changed: The paths, relative to the inventory, of the only nodes
+                    which parallel checks are run on, as returned by
+                    :func:`changed_since`. If this is None, they are run on
+                    every node.
+    :type changed: set of str
+    :returns: An iteration of the problems found, as they are found.
+    :rtype: iterable of :class:`Problem`
+    """
+    if checks is None:
+        checks = [cls(root_path) for cls in CHECKS]
+    serial = [checker for checker in checks if not checker.parallel]
+    parallel = [checker for checker in checks if checker.parallel]
+
+    nodes = []
+    for node in walk(root_path):
+        yield from _visit(serial, node)
+        if parallel and (changed is None or node.relpath in changed):
+            nodes.append(node)
+
+    if parallel:
+        workers = inventory.get_worker_count(workers)
+        yield from _visit_in_parallel(parallel, nodes, workers)
+
+    for checker in serial:
+        yield from checker.finish()
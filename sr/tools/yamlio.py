@@ -0,0 +1,51 @@
+"""
+Loading and dumping of YAML, using libyaml when PyYAML was built with it.
+
+The libyaml based loader and dumper are several times quicker than the pure
+Python ones, and produce the same results for the files the tools deal with.
+"""
+
+import yaml
+
+try:
+    from yaml import CSafeDumper as SafeDumper, CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeDumper, SafeLoader
+
+#: Whether the libyaml based loader and dumper are in use.
+LIBYAML = SafeLoader is not yaml.SafeLoader
+
+
+def load(stream):
+    """
+    Safely load a YAML document.
+
+    :param stream: The document, as a string, bytes or a file-like object.
+    :returns: The loaded document.
+    """
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def load_file(path):
+    """
+    Safely load a YAML file.
+
+    :param str path: The path to the file.
+    :returns: The loaded file.
+    """
+    with open(path, 'rb') as file:
+        return load(file)
+
+
+def dump(data, stream=None, **kwargs):
+    """
+    Safely dump data as YAML.
+
+    :param data: The data to dump.
+    :param stream: The file-like object to write to. If this is None, the
+                   YAML is returned as a string.
+    :param kwargs: Any other options for :func:`yaml.dump`.
+    :returns: The YAML if ``stream`` is None.
+    :rtype: str or None
+    """
+    return yaml.dump(data, stream, Dumper=SafeDumper, **kwargs)
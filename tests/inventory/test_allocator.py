@@ -0,0 +1,94 @@
+import threading
+import unittest
+
+from sr.tools.inventory import allocator
+
+from .utils import code, group_yaml, InventoryTestCase, part_yaml, USER_NUMBER
+
+
+class TestHighWaterMarks(unittest.TestCase):
+    def test_marks(self):
+        codes = [code(3), code(1), code(2, user_number=9), 'nonsense']
+        self.assertEqual(
+            {USER_NUMBER: 3, 9: 2},
+            allocator.high_water_marks(codes),
+        )
+
+
+class TestCodeAllocator(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.allocator = allocator.CodeAllocator(self.root)
+
+    def test_allocate(self):
+        self.assertEqual([code(6)], self.allocator.allocate(USER_NUMBER))
+        self.assertEqual([code(7)], self.allocator.allocate(USER_NUMBER))
+
+    def test_allocate_batch(self):
+        self.assertEqual(
+            [code(6), code(7), code(8)],
+            self.allocator.allocate(USER_NUMBER, 3),
+        )
+        self.assertEqual([code(9)], self.allocator.allocate(USER_NUMBER))
+
+    def test_allocate_new_user(self):
+        self.assertEqual([code(0, user_number=9)], self.allocator.allocate(9))
+
+    def test_peek(self):
+        self.assertEqual(code(6), self.allocator.peek(USER_NUMBER))
+        self.assertEqual(code(6), self.allocator.peek(USER_NUMBER))
+        self.assertEqual([code(6)], self.allocator.allocate(USER_NUMBER))
+        self.assertEqual(code(7), self.allocator.peek(USER_NUMBER))
+
+    def test_invalid_count(self):
+        with self.assertRaises(ValueError):
+            self.allocator.allocate(USER_NUMBER, 0)
+
+    def test_reserved_codes_persist(self):
+        self.allocator.allocate(USER_NUMBER, 2)
+        other = allocator.CodeAllocator(self.root)
+        self.assertEqual([code(8)], other.allocate(USER_NUMBER))
+
+    def test_sees_committed_assets(self):
+        self.git_commit_all()
+        self.assertEqual([code(6)], self.allocator.allocate(USER_NUMBER))
+
+        self.write(f'shelf/battery-sr{code(20)}', part_yaml(code(20)))
+        self.git_commit_all()
+        self.assertEqual([code(21)], self.allocator.allocate(USER_NUMBER))
+
+    def test_sees_untracked_assets(self):
+        self.git_commit_all()
+        self.assertEqual(code(6), self.allocator.peek(USER_NUMBER))
+
+        self.write(f'shelf/battery-sr{code(6)}', part_yaml(code(6)))
+        self.assertEqual(code(7), self.allocator.peek(USER_NUMBER))
+        self.write(f'vault/kit-sr{code(9)}/info', group_yaml(code(9), []))
+        self.assertEqual([code(10)], self.allocator.allocate(USER_NUMBER))
+
+    def test_keeps_reserved_codes_after_commit(self):
+        self.git_commit_all()
+        self.allocator.allocate(USER_NUMBER, 5)
+
+        self.write(f'shelf/battery-sr{code(6)}', part_yaml(code(6)))
+        self.git_commit_all()
+        self.assertEqual([code(11)], self.allocator.allocate(USER_NUMBER))
+
+    def test_concurrent(self):
+        results = []
+
+        def allocate():
+            other = allocator.CodeAllocator(self.root)
+            for _ in range(10):
+                results.extend(other.allocate(USER_NUMBER, 2))
+
+        threads = [threading.Thread(target=allocate) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(
+            sorted(code(n) for n in range(6, 86)),
+            sorted(results),
+        )
@@ -1,6 +1,6 @@
 import unittest
 
-from sr.tools.inventory import assetcode
+from sr.tools.inventory import assetcode, luhn
 
 
 class TestNormalise(unittest.TestCase):
@@ -39,3 +39,63 @@ class TestConversion(unittest.TestCase):
 
         num = assetcode.num_to_code(uid, pid)
         self.assertEqual(assetcode.code_to_num(num), (uid, pid))
+
+    def test_known_codes(self):
+        self.assertEqual(assetcode.num_to_code(0, 0), '000')
+        self.assertEqual(assetcode.code_to_num('srp1u28'), (23, 43))
+
+    def test_large_numbers(self):
+        for numbers in [(4095, 4096), (2 ** 40, 123456789)]:
+            code = assetcode.num_to_code(*numbers)
+            self.assertEqual(assetcode.code_to_num(code), numbers)
+
+
+class TestBatchConversion(unittest.TestCase):
+    def test_encode_many(self):
+        pairs = [(u, p) for u in range(0, 40, 3) for p in range(0, 5000, 7)]
+        self.assertEqual(
+            assetcode.encode_many(pairs),
+            [assetcode.num_to_code(u, p) for u, p in pairs],
+        )
+
+    def test_encode_many_negative(self):
+        with self.assertRaises(ValueError):
+            assetcode.encode_many([(1, 2), (1, -2)])
+
+    def test_decode_many(self):
+        pairs = [(u, p) for u in range(0, 40, 3) for p in range(0, 5000, 7)]
+        codes = assetcode.encode_many(pairs)
+        self.assertEqual(assetcode.decode_many(codes), pairs)
+
+    def test_decode_many_invalid(self):
+        self.assertEqual(
+            assetcode.decode_many(['srp1u28', 'abc', 'sr2017', 'P1U2']),
+            [(23, 43), None, None, None],
+        )
+
+
+class TestCodec(unittest.TestCase):
+    codec = assetcode.CODEC
+
+    def test_checksum_tables(self):
+        for code in ['P1U28', '000', '5M1Y', '7A']:
+            self.assertEqual(
+                luhn.checksum(code, assetcode.ALPHABET),
+                self.codec._checksum(code),
+            )
+
+    def test_regex(self):
+        match = self.codec.regex.fullmatch('srp1u28')
+        self.assertEqual('p1u28', match.group(1))
+        self.assertIsNone(self.codec.regex.fullmatch('p1u28'))
+        self.assertIsNone(self.codec.regex.fullmatch('srp1i28'))
+
+    def test_is_valid_many(self):
+        self.assertEqual(
+            [True, False, False],
+            self.codec.is_valid_many(['srp1u28', 'srp1u29', 'sr2017']),
+        )
+
+    def test_alphabet_size(self):
+        with self.assertRaises(ValueError):
+            assetcode.AssetCodec('0123456789')
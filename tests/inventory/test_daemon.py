@@ -0,0 +1,194 @@
+import os
+import threading
+import unittest
+from unittest import mock
+
+from sr.tools.inventory import daemon, inventory
+
+from .utils import code, InventoryTestCase, part_yaml
+
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+
+class TestDaemon(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.daemon = daemon.InventoryDaemon(
+            self.root,
+            watcher=daemon.PollingWatcher(self.root),
+        )
+        thread = threading.Thread(
+            target=self.daemon.serve_forever,
+            args=(0.1,),
+            name='serve_forever',
+        )
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.daemon.stop)
+
+        self.client = daemon.connect(self.root)
+        self.addCleanup(self.client.close)
+
+    def test_ping(self):
+        result = self.client.call('ping')
+        self.assertEqual(os.path.abspath(self.root), result['root_path'])
+
+    def test_locate(self):
+        location = self.client.locate(f'sr{self.codes[4].lower()}')
+        self.assertEqual(self.path(f'vault/kit-sr{self.codes[2]}'), location.parent_path)
+        self.assertEqual(self.codes[2], location.parent_code)
+        self.assertFalse(location.is_group)
+
+    def test_locate_new_and_moved(self):
+        self.write(f'shelf/battery-sr{code(6)}', part_yaml(code(6)))
+        location = self.client.locate(code(6))
+        self.assertEqual(self.path(f'shelf/battery-sr{code(6)}'), location.path)
+
+        os.rename(
+            self.path(f'shelf/battery-sr{self.codes[5]}'),
+            self.path(f'vault/battery-sr{self.codes[5]}'),
+        )
+        self.daemon.sync()
+        location = self.client.locate(self.codes[5])
+        self.assertEqual(self.path('vault'), location.parent_path)
+
+    def test_locate_unknown(self):
+        with self.assertRaises(KeyError):
+            self.client.locate(code(99))
+
+    def test_query(self):
+        results = self.client.query('type:battery')
+        self.assertEqual(
+            {self.codes[4], self.codes[5]},
+            {location.code for location in results},
+        )
+
+    def test_explain(self):
+        self.assertTrue(self.client.explain('cond:broken').startswith("Plan over"))
+
+    def test_unknown_method(self):
+        with self.assertRaises(daemon.DaemonError) as cm:
+            self.client.call('frobnicate')
+        self.assertEqual('ValueError', cm.exception.type)
+
+    def test_current_user_number(self):
+        with mock.patch.object(
+            inventory.Inventory,
+            'get_current_git_user',
+            return_value=('Test User', 'test@example.com'),
+        ):
+            self.assertEqual(5, self.client.current_user_number)
+
+    def test_next_code_sees_new_assets(self):
+        self.assertEqual(code(6), self.client.get_next_asset_code(5))
+        self.write(f'shelf/battery-sr{code(6)}', part_yaml(code(6)))
+        self.assertEqual(code(7), self.client.get_next_asset_code(5))
+
+    def test_allocating_checks_first(self):
+        threads = []
+        with mock.patch.object(
+            self.daemon,
+            'sync',
+            side_effect=lambda: threads.append(threading.current_thread().name),
+        ):
+            self.client.allocate_asset_codes(5, 2)
+            self.client.get_next_asset_code(5)
+        # Ignore the regular checks
+        self.assertEqual(2, sum(name != 'serve_forever' for name in threads))
+
+    def test_follows_changes(self):
+        self.write(
+            f'shelf/battery-sr{self.codes[5]}',
+            part_yaml(self.codes[5], condition='broken'),
+        )
+        self.daemon.sync()
+        results = self.client.query('cond:broken and type:battery')
+        self.assertEqual(2, len(results))
+
+    def test_survives_bad_files(self):
+        with mock.patch('sys.stderr') as stderr:
+            path = self.write(f'shelf/battery-sr{self.codes[5]}', 'condition: [')
+            self.write('shelf/notes', 'Not an asset.\n')
+            self.assertFalse(self.daemon.sync())
+            self.assertFalse(self.daemon.sync())
+        # Each error is only reported once
+        output = ''.join(c[0][0] for c in stderr.write.call_args_list)
+        self.assertEqual(1, output.count("Failed to update the inventory"))
+        self.assertEqual(os.getpid(), self.client.call('ping')['pid'])
+
+        os.remove(self.path('shelf/notes'))
+        with open(path, 'w') as file:
+            file.write(part_yaml(self.codes[5], condition='broken'))
+        self.assertTrue(self.daemon.sync())
+        results = self.client.query('cond:broken and type:battery')
+        self.assertEqual(2, len(results))
+
+    def test_already_running(self):
+        with self.assertRaises(RuntimeError):
+            daemon.InventoryDaemon(self.root, watcher=daemon.PollingWatcher(self.root))
+
+    def test_get_inventory(self):
+        with mock.patch.object(inventory, 'find_top_level_dir', return_value=self.root):
+            inv = inventory.get_inventory(daemon=True)
+            self.addCleanup(inv.close)
+            self.assertIsInstance(inv, daemon.InventoryClient)
+
+            with mock.patch.dict(os.environ, {'SR_INVENTORY_DAEMON': '0'}):
+                inv = inventory.get_inventory(daemon=True)
+            self.assertIsInstance(inv, inventory.Inventory)
+
+
+class TestConnect(InventoryTestCase):
+    def test_no_daemon(self):
+        self.assertIsNone(daemon.connect(self.root))
+
+    def test_stale_socket(self):
+        server = daemon.InventoryDaemon(
+            self.root,
+            watcher=daemon.PollingWatcher(self.root),
+        )
+        server.server.server_close()
+        self.assertIsNone(daemon.connect(self.root))
+
+        # A new daemon replaces the stale socket
+        server = daemon.InventoryDaemon(
+            self.root,
+            watcher=daemon.PollingWatcher(self.root),
+        )
+        server.close()
+        self.assertFalse(os.path.exists(server.socket_path))
+
+
+class TestPollingWatcher(InventoryTestCase):
+    def test_changes(self):
+        watcher = daemon.PollingWatcher(self.root)
+        self.assertEqual(set(), watcher.changes())
+
+        path = self.write('shelf/new-sr{}'.format(code(9)), part_yaml(code(9)))
+        os.remove(self.path(f'shelf/battery-sr{self.codes[5]}'))
+        self.assertEqual(
+            {path, self.path(f'shelf/battery-sr{self.codes[5]}'), self.path('shelf')},
+            watcher.changes(),
+        )
+        self.assertEqual(set(), watcher.changes())
+
+
+@unittest.skipIf(inotify_simple is None, "inotify_simple is not installed")
+class TestInotifyWatcher(InventoryTestCase):
+    def test_changes(self):
+        watcher = daemon.InotifyWatcher(self.root)
+        self.addCleanup(watcher.close)
+        self.assertEqual(set(), watcher.changes())
+
+        path = self.write(f'shelf/box/new-sr{code(9)}', part_yaml(code(9)))
+        self.assertEqual({self.path('shelf/box'), path}, watcher.changes())
+
+        # The new directory is watched too
+        path = self.write(f'shelf/box/new-sr{code(9)}', part_yaml(code(9), 'broken'))
+        self.assertEqual({path}, watcher.changes())
+
+        self.git('init', '--quiet')
+        self.assertEqual(set(), watcher.changes())
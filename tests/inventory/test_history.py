@@ -0,0 +1,286 @@
+import contextlib
+import io
+import json
+import os
+import unittest
+
+import sr.tools.cli
+from sr.tools.inventory import history
+
+from .utils import code, InventoryTestCase, part_yaml
+
+try:
+    import pygit2
+except ImportError:
+    pygit2 = None
+
+
+class TestAssetCodeOf(unittest.TestCase):
+    def test_paths(self):
+        c = code(1)
+        for path, expected in [
+            (f'shelf/battery-sr{c}', c),
+            (f'vault/kit-sr{c}/info', c),
+            (f'vault/kit-sr{c}/README.md', None),
+            ('shelf/info', None),
+            ('info', None),
+            (f'.meta/parts/battery-sr{c}', None),
+            (f'shelf/.battery-sr{c}', None),
+            ('README.md', None),
+        ]:
+            self.assertEqual(expected, history.asset_code_of(path), path)
+
+
+@unittest.skipIf(pygit2 is None, "pygit2 is not installed")
+class TestHistoryIndex(InventoryTestCase):
+    """
+    The history is::
+
+        1. The inventory is created.
+        2. Asset 5 is modified.
+        3. Asset 1 is moved to the shelf.
+        4. Asset 4 is deleted, and the kit renamed.
+    """
+
+    def setUp(self):
+        super().setUp()
+        c = self.codes
+        self.commits = []
+        self.commit()
+        self.write(f'shelf/battery-sr{c[5]}', part_yaml(c[5], condition='broken'))
+        self.commit()
+        self.git('mv', f'vault/motor-board-sr{c[1]}', 'shelf/')
+        self.commit()
+        self.git('rm', '--quiet', f'vault/kit-sr{c[2]}/battery-sr{c[4]}')
+        self.git('mv', f'vault/kit-sr{c[2]}', f'vault/box-sr{c[2]}')
+        self.commit()
+
+        self.repo = pygit2.Repository(self.root)
+        self.index = history.HistoryIndex(self.repo)
+
+    def commit(self):
+        self.git_commit_all()
+        self.commits.append(self.git('rev-parse', 'HEAD').strip())
+
+    def summary(self, code):
+        return [
+            (event.status, self.commits.index(event.commit), event.path, event.old_path)
+            for event in self.index.events(code)
+        ]
+
+    def test_events(self):
+        self.assertEqual(4, self.index.update())
+        c = self.codes
+        self.assertEqual(
+            [
+                ('A', 0, f'shelf/battery-sr{c[5]}', None),
+                ('M', 1, f'shelf/battery-sr{c[5]}', f'shelf/battery-sr{c[5]}'),
+            ],
+            self.summary(c[5]),
+        )
+        self.assertEqual(
+            [
+                ('A', 0, f'vault/motor-board-sr{c[1]}', None),
+                ('R', 2, f'shelf/motor-board-sr{c[1]}', f'vault/motor-board-sr{c[1]}'),
+            ],
+            self.summary(c[1]),
+        )
+        self.assertEqual(
+            [
+                ('A', 0, f'vault/kit-sr{c[2]}/info', None),
+                ('R', 3, f'vault/box-sr{c[2]}/info', f'vault/kit-sr{c[2]}/info'),
+            ],
+            self.summary(c[2]),
+        )
+        self.assertEqual(
+            [
+                ('A', 0, f'vault/kit-sr{c[2]}/battery-sr{c[4]}', None),
+                ('D', 3, None, f'vault/kit-sr{c[2]}/battery-sr{c[4]}'),
+            ],
+            self.summary(c[4]),
+        )
+        self.assertEqual([], self.index.events(code(99)))
+
+    def test_persistent(self):
+        self.index.update()
+        index = history.HistoryIndex(self.repo)
+        self.assertEqual(0, index.update())
+        self.assertEqual(2, len(index.events(self.codes[5])))
+
+    def test_incremental(self):
+        self.index.update()
+        self.write(f'shelf/battery-sr{code(6)}', part_yaml(code(6)))
+        self.commit()
+
+        index = history.HistoryIndex(self.repo)
+        self.assertEqual(1, index.update())
+        self.assertEqual([('A', 4, f'shelf/battery-sr{code(6)}', None)], [
+            (event.status, self.commits.index(event.commit), event.path, event.old_path)
+            for event in index.events(code(6))
+        ])
+        self.assertEqual(2, len(index.events(self.codes[5])))
+
+    def test_rewritten_history(self):
+        self.index.update()
+        self.git('reset', '--quiet', '--hard', self.commits[1])
+        self.write(f'shelf/battery-sr{code(6)}', part_yaml(code(6)))
+        self.commit()
+
+        self.assertEqual(3, self.index.update())
+        self.assertEqual(
+            [('A', 0, f'vault/motor-board-sr{self.codes[1]}', None)],
+            self.summary(self.codes[1]),
+        )
+        self.assertEqual(1, len(self.index.events(code(6))))
+
+    def test_pruned_history(self):
+        self.index.update()
+        self.git('commit', '--quiet', '--amend', '--message', 'Amended')
+        self.git('reflog', 'expire', '--expire=now', '--all')
+        self.git('gc', '--quiet', '--prune=now')
+        self.commits[-1] = self.git('rev-parse', 'HEAD').strip()
+
+        index = history.HistoryIndex(self.repo)
+        self.assertEqual(4, index.update())
+        self.assertEqual(
+            ('D', 3),
+            (
+                index.events(self.codes[4])[-1].status,
+                self.commits.index(index.events(self.codes[4])[-1].commit),
+            ),
+        )
+
+    def test_merge(self):
+        self.git('checkout', '--quiet', '-b', 'side', self.commits[1])
+        self.write(f'shelf/battery-sr{code(6)}', part_yaml(code(6)))
+        self.commit()
+        self.git('checkout', '--quiet', '-')
+        self.git(
+            'merge', '--quiet', '--no-edit', '--no-ff', 'side',
+        )
+        self.commits.append(self.git('rev-parse', 'HEAD').strip())
+
+        self.index.update()
+        self.assertEqual(
+            [('A', 4, f'shelf/battery-sr{code(6)}', None)],
+            self.summary(code(6)),
+        )
+        self.assertEqual(2, len(self.index.events(self.codes[1])))
+
+    def test_get_history(self):
+        self.index.update()
+        for asset_code in self.codes.values():
+            self.assertEqual(
+                self.index.events(asset_code),
+                list(history.get_history(self.repo, asset_code)),
+            )
+
+    def test_get_histories(self):
+        self.index.update()
+        codes = sorted(self.codes.values())
+        events = list(history.get_histories(self.repo, codes))
+        for asset_code in codes:
+            self.assertEqual(
+                self.index.events(asset_code),
+                [event for c, event in events if c == asset_code],
+            )
+        positions = [self.commits.index(event.commit) for _, event in events]
+        self.assertEqual(sorted(positions), positions)
+
+    def test_get_history_merge(self):
+        self.git('checkout', '--quiet', '-b', 'side', self.commits[1])
+        self.write(
+            f'shelf/battery-sr{self.codes[5]}',
+            part_yaml(self.codes[5], condition='unknown'),
+        )
+        self.commit()
+        self.git('checkout', '--quiet', '-')
+        self.git('merge', '--quiet', '--no-edit', '--no-ff', 'side')
+        self.commits.append(self.git('rev-parse', 'HEAD').strip())
+
+        self.index.update()
+        events = list(history.get_history(self.repo, self.codes[5]))
+        self.assertEqual(self.index.events(self.codes[5]), events)
+        self.assertEqual(['A', 'M', 'M'], [event.status for event in events])
+
+    def test_get_history_renamed(self):
+        # Only git's similarity detection can tell where this went
+        c = self.codes
+        self.git('mv', f'shelf/battery-sr{c[5]}', 'vault/spare-battery')
+        self.commit()
+        self.write('vault/spare-battery', part_yaml(c[5], condition='working'))
+        self.commit()
+
+        self.assertEqual(
+            [
+                ('A', 0, f'shelf/battery-sr{c[5]}', None),
+                ('M', 1, f'shelf/battery-sr{c[5]}', f'shelf/battery-sr{c[5]}'),
+                ('R', 4, 'vault/spare-battery', f'shelf/battery-sr{c[5]}'),
+                ('M', 5, 'vault/spare-battery', 'vault/spare-battery'),
+            ],
+            [
+                (e.status, self.commits.index(e.commit), e.path, e.old_path)
+                for e in history.get_history(self.repo, c[5])
+            ],
+        )
+
+    def test_get_history_replaced(self):
+        # The new asset's file is much like the old one's, but it isn't a move
+        c = self.codes
+        self.git('rm', '--quiet', f'shelf/battery-sr{c[5]}')
+        self.write(
+            f'shelf/battery-sr{code(6)}',
+            part_yaml(code(6), condition='unknown'),
+        )
+        self.commit()
+
+        self.index.update()
+        for asset_code in (c[5], code(6)):
+            events = list(history.get_history(self.repo, asset_code))
+            self.assertEqual(self.index.events(asset_code), events)
+        self.assertEqual('D', self.index.events(c[5])[-1].status)
+
+    def test_command(self):
+        cwd = os.getcwd()
+        os.chdir(self.root)
+        self.addCleanup(os.chdir, cwd)
+
+        with contextlib.redirect_stdout(io.StringIO()) as buffer:
+            sr.tools.cli.main([
+                'sr', 'inv-history', '-o', 'description', f'sr{self.codes[1]}',
+            ])
+        self.assertEqual(
+            [
+                f"'vault/motor-board-sr{self.codes[1]}' created.",
+                "Moved from 'vault' into 'shelf'.",
+            ],
+            buffer.getvalue().splitlines(),
+        )
+
+        with contextlib.redirect_stdout(io.StringIO()) as buffer:
+            sr.tools.cli.main([
+                'sr', 'inv-history', '--no-index', '-o', 'commits',
+                f'sr{self.codes[1]}',
+            ])
+        self.assertEqual(
+            [self.commits[0], self.commits[2]],
+            buffer.getvalue().splitlines(),
+        )
+
+    def test_command_query(self):
+        cwd = os.getcwd()
+        os.chdir(self.root)
+        self.addCleanup(os.chdir, cwd)
+
+        c = self.codes
+        with contextlib.redirect_stdout(io.StringIO()) as buffer:
+            sr.tools.cli.main([
+                'sr', 'inv-history', '--no-index', '-o', 'json',
+                '-q', 'type:battery', f'sr{c[1]}',
+            ])
+        events = [json.loads(line) for line in buffer.getvalue().splitlines()]
+        self.assertEqual(
+            [(c[1], 'A'), (c[5], 'A'), (c[5], 'M'), (c[1], 'R')],
+            [(event['code'], event['status']) for event in events],
+        )
+        self.assertEqual(self.commits[2], events[-1]['commit'])
@@ -0,0 +1,595 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+from sr.tools.inventory import inventory
+
+from .utils import code, group_yaml, InventoryTestCase, part_yaml
+
+
+class TestInventoryLoad(InventoryTestCase):
+    def test_parts(self):
+        inv = inventory.Inventory(self.root)
+        self.assertEqual(set(self.codes.values()), set(inv.root.parts.keys()))
+
+    def test_types(self):
+        inv = inventory.Inventory(self.root)
+        self.assertEqual(
+            {self.codes[4], self.codes[5]},
+            {part.code for part in inv.root.types['battery']},
+        )
+
+    def test_group(self):
+        inv = inventory.Inventory(self.root)
+        group = inv.root.parts[self.codes[2]]
+        self.assertIsInstance(group, inventory.ItemGroup)
+        self.assertEqual(['motor-board', 'battery'], group.elements)
+        self.assertEqual({self.codes[3], self.codes[4]}, set(group.parts.keys()))
+
+    def test_compact(self):
+        inv = inventory.Inventory(self.root)
+        for node in [inv.root] + list(inv.root.walk()):
+            self.assertFalse(hasattr(node, '__dict__'))
+
+        first, second = inv.root.types['battery']
+        self.assertIs(first.name, second.name)
+        motor_board = inv.root.parts[self.codes[1]]
+        for other in (inv.root.parts[self.codes[3]], inv.root.parts[self.codes[4]]):
+            key, other_key = next(iter(motor_board.info)), next(iter(other.info))
+            self.assertEqual(key, other_key)
+            self.assertIs(key, other_key)
+        self.assertIs(
+            motor_board.condition,
+            inv.root.parts[self.codes[3]].condition,
+        )
+
+    def test_users(self):
+        inv = inventory.Inventory(self.root)
+        self.assertEqual(
+            {('Test User', 'test@example.com'): 5},
+            inv.users,
+        )
+
+
+class TestLazyInventory(InventoryTestCase):
+    def test_nothing_loaded(self):
+        inv = inventory.Inventory(self.root, lazy=True)
+
+        self.assertEqual(set(self.codes.values()), set(inv.root.parts.keys()))
+        for part in inv.root.parts.values():
+            self.assertIsNone(part._info)
+        self.assertIsNone(inv.cache._loaded_entries)
+
+    def test_loaded_on_access(self):
+        inv = inventory.Inventory(self.root, lazy=True)
+        part = inv.root.parts[self.codes[4]]
+
+        self.assertEqual('broken', part.condition)
+        self.assertEqual(10, part.value)
+        self.assertIsNone(inv.root.parts[self.codes[5]]._info)
+
+        group = inv.root.parts[self.codes[2]]
+        self.assertEqual(['motor-board', 'battery'], group.elements)
+
+    def test_saved_at_exit(self):
+        with mock.patch.object(inventory.atexit, 'register') as register:
+            inv = inventory.Inventory(self.root, lazy=True)
+            self.assertEqual('broken', inv.root.parts[self.codes[4]].condition)
+        register.assert_called_once_with(inventory._save_at_exit, inv.cache)
+
+        inventory._save_at_exit(inv.cache)
+        cache = inventory.YAMLCache(self.root)
+        self.assertEqual(
+            [f'vault/kit-sr{self.codes[2]}/battery-sr{self.codes[4]}'],
+            list(cache._entries),
+        )
+
+    def test_invalid_file_only_fails_on_access(self):
+        self.write(
+            f'shelf/battery-sr{self.codes[5]}',
+            "assetcode: '{}'\ncondition: broken\n".format(self.codes[5]),
+        )
+
+        with self.assertRaises(ValueError):
+            inventory.Inventory(self.root).root
+
+        inv = inventory.Inventory(self.root, lazy=True)
+        part = inv.root.parts[self.codes[5]]
+        with self.assertRaises(ValueError):
+            part.validate()
+
+    def test_code_mismatch(self):
+        self.write(f'shelf/battery-sr{self.codes[5]}', part_yaml(self.codes[1]))
+        self.write(
+            f'vault/kit-sr{self.codes[2]}/info',
+            group_yaml(self.codes[1], ['motor-board', 'battery']),
+        )
+
+        inv = inventory.Inventory(self.root, lazy=True)
+        for asset_code in (self.codes[5], self.codes[2]):
+            with self.assertRaises(inventory.InvalidFileError):
+                inv.root.parts[asset_code].validate()
+
+
+class TestTreeIndex(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.inv = inventory.Inventory(self.root)
+        self.trees = [self.inv.root] + [
+            node for node in self.inv.root.walk() if hasattr(node, 'children')
+        ] + [self.inv.root.children['vault'], self.inv.root.children['shelf']]
+
+    def test_parts_match_walk(self):
+        for tree in self.trees:
+            with self.subTest(tree=tree.path):
+                expected = {part.code: part for part in tree.walk()}
+                self.assertEqual(expected, dict(tree.parts))
+                self.assertEqual(list(tree.walk()), tree.parts.values())
+                self.assertEqual(len(expected), len(tree.parts))
+
+    def test_types_match_walk(self):
+        for tree in self.trees:
+            expected = {}
+            for part in tree.walk():
+                expected.setdefault(part.name, []).append(part)
+            with self.subTest(tree=tree.path):
+                self.assertEqual(expected, dict(tree.types))
+                self.assertNotIn('nonexistent', tree.types)
+
+    def test_subtree(self):
+        kit = self.inv.root.parts[self.codes[2]]
+        self.assertEqual({self.codes[3], self.codes[4]}, set(kit.parts))
+        self.assertNotIn(self.codes[1], kit.parts)
+        with self.assertRaises(KeyError):
+            kit.types['kit']
+
+    def test_built_once(self):
+        with mock.patch.object(
+            inventory,
+            '_TreeIndex',
+            side_effect=inventory._TreeIndex,
+        ) as tree_index:
+            for tree in self.trees:
+                tree.parts.values()
+                tree.types.get('battery')
+        self.assertEqual(1, tree_index.call_count)
+
+    def test_duplicate_codes(self):
+        self.write(f'shelf/motor-board-sr{self.codes[1]}', part_yaml(self.codes[1]))
+        inv = inventory.Inventory(self.root, lazy=True)
+        expected = {part.code: part for part in inv.root.walk()}
+        self.assertEqual(expected, dict(inv.root.parts))
+        self.assertEqual(len(expected), len(inv.root.parts.values()))
+
+
+class TestEffectiveCondition(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        # A crate holding the kit, and a charger which is missing
+        crate = f'vault/crate-sr{code(6)}'
+        self.write(f'{crate}/info', group_yaml(code(6), ['kit', 'charger']))
+        os.rename(
+            self.path(f'vault/kit-sr{self.codes[2]}'),
+            self.path(f'{crate}/kit-sr{self.codes[2]}'),
+        )
+        self.inv = inventory.Inventory(self.root, lazy=True)
+        self.crate = self.inv.root.parts[code(6)]
+        self.kit = self.inv.root.parts[self.codes[2]]
+        self.battery = self.inv.root.parts[self.codes[4]]
+
+    def test_item(self):
+        self.assertEqual('broken', self.battery.effective_condition)
+
+    def test_broken_element(self):
+        self.assertEqual('broken', self.kit.effective_condition)
+
+    def test_missing_element(self):
+        self.battery.info['condition'] = 'working'
+        self.assertEqual('working', self.kit.effective_condition)
+        self.assertEqual('broken', self.crate.effective_condition)
+
+    def test_mixed(self):
+        self.battery.info['condition'] = 'unknown'
+        self.assertEqual('unknown', self.kit.effective_condition)
+
+    def test_no_elements(self):
+        self.write(
+            f'vault/box-sr{code(7)}/info',
+            f"assetcode: '{code(7)}'\ndescription: A box.\nelements:\n",
+        )
+        inv = inventory.Inventory(self.root, lazy=True)
+        self.assertEqual('working', inv.root.parts[code(7)].effective_condition)
+
+    def test_cached(self):
+        self.assertEqual('broken', self.crate.effective_condition)
+        with mock.patch.object(
+            inventory.ItemGroup,
+            '_compute_condition',
+            side_effect=AssertionError,
+        ):
+            self.assertEqual('broken', self.crate.effective_condition)
+            self.assertEqual('broken', self.kit.effective_condition)
+
+    def test_invalidate(self):
+        self.assertEqual('broken', self.kit.effective_condition)
+        self.battery.info['condition'] = 'working'
+        self.assertEqual('broken', self.kit.effective_condition)
+
+        self.kit.invalidate_condition()
+        self.assertEqual('working', self.kit.effective_condition)
+        self.assertIsNone(self.crate._effective_condition)
+
+
+class TestRefresh(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.inv = inventory.Inventory(self.root)
+        self.inv.root
+
+    def assertMatchesFreshLoad(self):
+        fresh = inventory.Inventory(self.root)
+
+        def summary(tree):
+            trees = [tree] + [n for n in tree.walk() if hasattr(n, 'children')]
+            trees += [
+                n
+                for t in trees
+                for n in t.children.values()
+                if hasattr(n, 'children') and not hasattr(n, 'code')
+            ]
+            return {
+                os.path.relpath(t.path, self.root): (
+                    {code: part.path for code, part in t.parts.items()},
+                    {
+                        name: sorted(part.path for part in parts)
+                        for name, parts in t.types.items()
+                    },
+                    {key: child.path for key, child in t.children.items()},
+                )
+                for t in trees
+            }
+
+        self.assertEqual(summary(fresh.root), summary(self.inv.root))
+
+    def test_new_item(self):
+        path = self.write(
+            f'vault/kit-sr{self.codes[2]}/battery-sr{code(6)}',
+            part_yaml(code(6)),
+        )
+        self.inv.refresh([path])
+        self.assertMatchesFreshLoad()
+        self.assertEqual('working', self.inv.root.parts[code(6)].condition)
+
+    def test_removed_item(self):
+        path = self.path(f'shelf/battery-sr{self.codes[5]}')
+        os.remove(path)
+        self.inv.refresh([path])
+        self.assertMatchesFreshLoad()
+
+    def test_moved_group(self):
+        old = self.path(f'vault/kit-sr{self.codes[2]}')
+        new = self.path(f'shelf/kit-sr{self.codes[2]}')
+        os.rename(old, new)
+        self.inv.refresh([old, new])
+        self.assertMatchesFreshLoad()
+        self.assertEqual(
+            [self.codes[2]],
+            [x.code for x in self.inv.query('assy:true and path:shelf')],
+        )
+
+    def test_new_directory(self):
+        path = self.write(f'store/box/battery-sr{code(6)}', part_yaml(code(6)))
+        self.inv.refresh([path])
+        self.assertMatchesFreshLoad()
+
+    def test_modified_item(self):
+        kit = self.inv.root.parts[self.codes[2]]
+        self.assertEqual(
+            [self.codes[4]],
+            [x.code for x in self.inv.query('cond:broken and assy:false')],
+        )
+        self.assertEqual('broken', kit.effective_condition)
+
+        path = self.write(
+            f'vault/kit-sr{self.codes[2]}/battery-sr{self.codes[4]}',
+            part_yaml(self.codes[4]),
+        )
+        self.inv.refresh([path])
+        self.assertIs(kit, self.inv.root.parts[self.codes[2]])
+        self.assertEqual('working', kit.effective_condition)
+        self.assertEqual([], self.inv.query('cond:broken'))
+
+    def test_modified_group(self):
+        kit = self.inv.root.parts[self.codes[2]]
+        path = self.write(
+            f'vault/kit-sr{self.codes[2]}/info',
+            group_yaml(self.codes[2], ['motor-board']),
+        )
+        self.inv.refresh([path])
+        self.assertEqual(['motor-board'], kit.elements)
+        self.assertEqual('working', kit.effective_condition)
+
+    def test_only_reads_changes(self):
+        path = self.write(f'shelf/battery-sr{code(6)}', part_yaml(code(6)))
+        with mock.patch.object(
+            inventory.ItemTree,
+            'refresh_children',
+            autospec=True,
+            side_effect=inventory.ItemTree.refresh_children,
+        ) as refresh_children:
+            self.inv.refresh([path])
+        self.assertEqual(
+            [self.path('shelf')],
+            [call[0][0].path for call in refresh_children.call_args_list],
+        )
+
+    def test_git_index(self):
+        self.git_commit_all()
+        self.inv = inventory.Inventory(self.root, git_index=True)
+        self.inv.root
+        path = self.write(f'shelf/battery-sr{code(6)}', part_yaml(code(6)))
+        self.inv.refresh([path])
+        self.assertIn(code(6), self.inv.root.parts)
+
+    def test_from_git_diff(self):
+        self.git_commit_all()
+        old = self.git('rev-parse', 'HEAD').strip()
+        os.rename(
+            self.path(f'vault/motor-board-sr{self.codes[1]}'),
+            self.path(f'shelf/motor-board-sr{self.codes[1]}'),
+        )
+        self.write(f'shelf/battery-sr{code(6)}', part_yaml(code(6)))
+        self.git_commit_all()
+
+        self.inv.refresh_from_git_diff(old, 'HEAD')
+        self.assertMatchesFreshLoad()
+
+
+class TestLocate(InventoryTestCase):
+    def test_item(self):
+        inv = inventory.Inventory(self.root)
+        location = inv.locate(f'sr{self.codes[4].lower()}')
+
+        c = self.codes
+        self.assertEqual(c[4], location.code)
+        self.assertEqual('battery', location.name)
+        self.assertEqual(self.path(f'vault/kit-sr{c[2]}/battery-sr{c[4]}'), location.path)
+        self.assertEqual(location.path, location.info_path)
+        self.assertEqual(self.path(f'vault/kit-sr{c[2]}'), location.parent_path)
+        self.assertEqual(c[2], location.parent_code)
+        self.assertFalse(location.is_group)
+
+    def test_group(self):
+        inv = inventory.Inventory(self.root)
+        location = inv.locate(self.codes[2])
+
+        self.assertTrue(location.is_group)
+        self.assertEqual(self.path('vault'), location.parent_path)
+        self.assertIsNone(location.parent_code)
+        self.assertEqual(
+            self.path(f'vault/kit-sr{self.codes[2]}/info'),
+            location.info_path,
+        )
+
+    def test_matches_tree(self):
+        inv = inventory.Inventory(self.root)
+        for asset_code, part in inv.root.parts.items():
+            location = inv.locate(asset_code)
+            self.assertEqual(part.path, location.path)
+            self.assertEqual(part.parent.path, location.parent_path)
+            self.assertEqual(getattr(part.parent, 'code', None), location.parent_code)
+
+    def test_does_not_build_tree(self):
+        inv = inventory.Inventory(self.root)
+        inv.locate(self.codes[1])
+        self.assertIsNone(inv._root)
+
+    def test_unknown(self):
+        inv = inventory.Inventory(self.root)
+        with self.assertRaises(KeyError):
+            inv.locate(inventory.assetcode.num_to_code(5, 100))
+
+    def test_uses_stored_index(self):
+        self.git_commit_all()
+        inventory.Inventory(self.root).locate(self.codes[1])
+
+        index = inventory.Inventory(self.root).code_index
+        with mock.patch.object(index, 'rebuild') as rebuild:
+            index.locate(self.codes[1])
+        rebuild.assert_not_called()
+
+    def test_stale_index(self):
+        self.git_commit_all()
+        inventory.Inventory(self.root).locate(self.codes[1])
+
+        c = self.codes
+        os.rename(
+            self.path(f'shelf/battery-sr{c[5]}'),
+            self.path(f'vault/battery-sr{c[5]}'),
+        )
+        new_code = inventory.assetcode.num_to_code(5, 6)
+        self.write(f'shelf/webcam-sr{new_code}', part_yaml(new_code))
+
+        inv = inventory.Inventory(self.root)
+        self.assertEqual(self.path(f'vault/battery-sr{c[5]}'), inv.locate(c[5]).path)
+        self.assertEqual(self.path('shelf'), inv.locate(new_code).parent_path)
+
+    def test_long_lived_index(self):
+        inv = inventory.Inventory(self.root)
+        new_code = inventory.assetcode.num_to_code(5, 6)
+        with mock.patch.object(inventory, 'CODE_INDEX_REBUILD_INTERVAL', 60):
+            with self.assertRaises(KeyError):
+                inv.locate(new_code)
+
+            # Lookups which miss soon after a rebuild don't rebuild it again
+            self.write(f'shelf/webcam-sr{new_code}', part_yaml(new_code))
+            with self.assertRaises(KeyError):
+                inv.locate(new_code)
+
+        with mock.patch.object(inventory, 'CODE_INDEX_REBUILD_INTERVAL', 0):
+            self.assertEqual(self.path('shelf'), inv.locate(new_code).parent_path)
+
+    def test_long_lived_index_commit(self):
+        self.git_commit_all()
+        inv = inventory.Inventory(self.root)
+        inv.code_index.rebuild()
+
+        new_code = inventory.assetcode.num_to_code(5, 6)
+        self.write(f'shelf/webcam-sr{new_code}', part_yaml(new_code))
+        self.git_commit_all()
+        self.assertEqual(self.path('shelf'), inv.locate(new_code).parent_path)
+
+
+class TestYAMLCache(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache_path = os.path.join(self.cache_dir, 'test.tree')
+        self.asset_path = self.path(f'shelf/battery-sr{self.codes[5]}')
+
+    def test_round_trip(self):
+        cache = inventory.YAMLCache(self.root, self.cache_path)
+        info = cache.load(self.asset_path)
+        cache.save()
+
+        self.assertEqual('unknown', info['condition'])
+        self.assertTrue(os.path.exists(self.cache_path))
+
+        cache = inventory.YAMLCache(self.root, self.cache_path)
+        self.assertEqual(info, cache.load(self.asset_path))
+        self.assertFalse(cache._dirty)
+
+    def test_modified_file_is_reloaded(self):
+        cache = inventory.YAMLCache(self.root, self.cache_path)
+        cache.load(self.asset_path)
+        cache.save()
+
+        self.write(
+            f'shelf/battery-sr{self.codes[5]}',
+            'assetcode: {}\ncondition: broken\n'.format(self.codes[5]),
+        )
+
+        cache = inventory.YAMLCache(self.root, self.cache_path)
+        self.assertEqual('broken', cache.load(self.asset_path)['condition'])
+
+    def test_corrupt_cache_is_ignored(self):
+        with open(self.cache_path, 'wb') as file:
+            file.write(b'not a pickle')
+
+        cache = inventory.YAMLCache(self.root, self.cache_path)
+        self.assertEqual('unknown', cache.load(self.asset_path)['condition'])
+
+    def test_prune(self):
+        cache = inventory.YAMLCache(self.root, self.cache_path)
+        cache.load(self.asset_path)
+        cache.save()
+
+        cache = inventory.YAMLCache(self.root, self.cache_path)
+        cache.save(prune=True)
+
+        cache = inventory.YAMLCache(self.root, self.cache_path)
+        self.assertEqual({}, cache._entries)
+
+    def test_single_cache_file_per_inventory(self):
+        inventory.Inventory(self.root).root
+        self.assertEqual(
+            1,
+            len([x for x in os.listdir(self.cache_dir) if x.endswith('.tree')]),
+        )
+
+
+class TestGitIndexCache(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.git_commit_all()
+
+    def codes_by_condition(self, inv):
+        return {code: part.info.get('condition') for code, part in inv.root.parts.items()}
+
+    def test_same_as_scanning(self):
+        self.assertEqual(
+            self.codes_by_condition(inventory.Inventory(self.root)),
+            self.codes_by_condition(inventory.Inventory(self.root, git_index=True)),
+        )
+
+    def test_unchanged_checkout_is_cached(self):
+        inventory.Inventory(self.root, git_index=True)
+        inv = inventory.Inventory(self.root, git_index=True)
+        self.assertFalse(inv.cache._dirty)
+
+    def test_modified_and_untracked_files(self):
+        c = self.codes
+        self.write(
+            f'shelf/battery-sr{c[5]}',
+            'assetcode: {}\nlabelled: true\ndescription: x\nvalue: 1\n'
+            'condition: working\n'.format(c[5]),
+        )
+        new_code = inventory.assetcode.num_to_code(5, 6)
+        self.write(f'shelf/webcam-sr{new_code}', part_yaml(new_code))
+
+        inv = inventory.Inventory(self.root, git_index=True)
+        self.assertEqual('working', inv.root.parts[c[5]].condition)
+        self.assertIn(new_code, inv.root.parts)
+
+    def test_deleted_files(self):
+        os.remove(self.path(f'shelf/battery-sr{self.codes[5]}'))
+        inv = inventory.Inventory(self.root, git_index=True)
+        self.assertNotIn(self.codes[5], inv.root.parts)
+
+    def test_symlinked_root(self):
+        link = os.path.join(self.tmpdir, 'link')
+        os.symlink(self.root, link)
+        expected = inventory._read_git_index(self.root)
+        self.assertIn(f'shelf/battery-sr{self.codes[5]}', expected)
+        self.assertEqual(expected, inventory._read_git_index(link))
+
+    def test_subprocess_fallback(self):
+        os.remove(self.path(f'shelf/battery-sr{self.codes[5]}'))
+        self.write('shelf/untracked', 'x')
+        self.write('vault/notes', 'x')
+        self.git('add', 'vault/notes')
+        self.write('vault/notes', 'y')
+
+        expected = inventory._read_git_index(self.root)
+        with mock.patch.dict(sys.modules, {'pygit2': None}):
+            self.assertEqual(expected, inventory._read_git_index(self.root))
+
+        self.assertIsNone(expected['shelf/untracked'])
+        self.assertIsNone(expected['vault/notes'])
+        self.assertNotIn(f'shelf/battery-sr{self.codes[5]}', expected)
+
+
+class TestParallelParsing(InventoryTestCase):
+    def test_same_as_serial(self):
+        inv = inventory.Inventory(self.root, lazy=True)
+        paths = [part.info_path for part in inv.root.parts.values()]
+
+        with mock.patch.object(inventory, 'PARALLEL_PARSE_THRESHOLD', 0):
+            self.assertEqual(
+                inventory.parse_yaml_files(paths, workers=1),
+                inventory.parse_yaml_files(paths, workers=2),
+            )
+
+    def test_cold_load(self):
+        with mock.patch.object(inventory, 'PARALLEL_PARSE_THRESHOLD', 0):
+            inv = inventory.Inventory(self.root, workers=2)
+            self.assertEqual('broken', inv.root.parts[self.codes[4]].condition)
+        self.assertIsNotNone(inv.root.parts[self.codes[5]]._info)
+
+    def test_worker_count(self):
+        self.assertEqual(3, inventory.get_worker_count(3))
+        self.assertEqual(1, inventory.get_worker_count(0))
+
+        with mock.patch.dict(os.environ, {'SR_INVENTORY_WORKERS': '0'}):
+            self.assertEqual(1, inventory.get_worker_count())
+
+        with mock.patch.dict(os.environ, {'SR_INVENTORY_WORKERS': '4'}):
+            self.assertEqual(4, inventory.get_worker_count())
+
+        with mock.patch.dict(os.environ, {'SR_INVENTORY_WORKERS': 'lots'}), \
+                mock.patch.object(os, 'cpu_count', return_value=2):
+            self.assertEqual(2, inventory.get_worker_count())
+
+
+if __name__ == '__main__':
+    unittest.main()
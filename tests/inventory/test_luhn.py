@@ -23,3 +23,19 @@ class TestCalculatingCheckDigit(unittest.TestCase):
     def test_normal(self):
         for code, result in [('7894', '9')]:
             self.assertEqual(luhn.calc_check_digit(code), result)
+
+
+class TestValidatingMany(unittest.TestCase):
+    def test_normal(self):
+        self.assertEqual(
+            luhn.is_valid_many(['7894', '78949', '', '7a94']),
+            [False, True, True, False],
+        )
+
+    def test_alphabet(self):
+        alphabet = '0123456789abcdef'
+        numbers = ['1234', '12349', 'ffff', 'abcde']
+        self.assertEqual(
+            luhn.is_valid_many(numbers, alphabet),
+            [luhn.is_valid(number, alphabet) for number in numbers],
+        )
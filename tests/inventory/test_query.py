@@ -0,0 +1,179 @@
+import unittest
+from unittest import mock
+
+from sr.tools.inventory import (
+    inventory,
+    query_ast,
+    query_parser,
+    query_planner,
+)
+from sr.tools.inventory.query_table import QueryTable
+
+from .utils import code, InventoryTestCase
+
+QUERIES = [
+    'cond:working',
+    'cond:broken',
+    'not cond:working or type:motor-*',
+    'type:battery and !cond:broken',
+    'type in {battery, kit}',
+    'labelled:true',
+    'assy:true',
+    'path:vault',
+    'path:shelf/*',
+    'serial:ABC123',
+    'development:unset',
+    'development:false',
+    'parent of type:battery',
+    'children of assy:true',
+    'siblings of serial:ABC123',
+    'descendants of path:vault and cond:broken',
+    'parent of parent of type:motor-board',
+]
+
+
+class TestBitsetEngine(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.inv = inventory.Inventory(self.root)
+        self.nodes = list(self.inv.root.parts.values())
+
+    def test_matches_list_engine(self):
+        for query in QUERIES:
+            tree = query_parser.search_tree(query)
+            with self.subTest(query=query):
+                expected = tree.match(self.nodes)
+                actual = self.inv.query(query)
+                self.assertEqual(len(set(map(id, actual))), len(actual))
+                self.assertEqual(set(map(id, expected)), set(map(id, actual)))
+
+    def test_case_sensitive(self):
+        # Both engines match names and paths case sensitively, even where the
+        # platform's paths aren't
+        with mock.patch('os.path.normcase', str.lower):
+            for query in ('type:BATTERY', 'path:VAULT/*'):
+                tree = query_parser.search_tree(query)
+                with self.subTest(query=query):
+                    self.assertEqual([], tree.match(self.nodes))
+                    self.assertEqual([], self.inv.query(query))
+
+    def test_code(self):
+        self.assertEqual(
+            [self.codes[3]],
+            [x.code for x in self.inv.query(f'code:sr{self.codes[3]}')],
+        )
+
+    def test_results_in_table_order(self):
+        results = self.inv.query('cond:working or cond:broken')
+        order = [self.nodes.index(x) for x in results]
+        self.assertEqual(sorted(order), order)
+
+
+class TestPlanner(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.inv = inventory.Inventory(self.root)
+        self.table = self.inv.query_table
+
+    def plan(self, query):
+        return query_planner.plan(query_parser.search_tree(query), self.table)
+
+    def test_matches_unplanned(self):
+        for query in QUERIES:
+            tree = query_parser.search_tree(query)
+            planned = query_planner.plan(tree, self.table)
+            with self.subTest(query=query):
+                self.assertEqual(
+                    tree.match_bits(self.table),
+                    planned.match_bits(self.table),
+                )
+
+    def test_and_most_selective_first(self):
+        tree = self.plan(f'cond:working and not labelled:false and code:{self.codes[1]}')
+        self.assertIsInstance(tree.left.left, query_ast.Code)
+
+    def test_or_least_selective_first(self):
+        tree = self.plan(f'code:{self.codes[1]} or cond:working')
+        self.assertIsInstance(tree.left, query_ast.Condition)
+
+    def test_short_circuit(self):
+        results = self.inv.query(f'serial:ABC123 and code:{code(99)}')
+        self.assertEqual([], results)
+        self.assertNotIn('serial', self.table._columns)
+
+    def test_explain(self):
+        text = self.inv.explain(f'cond:working and code:{self.codes[1]}')
+        lines = text.splitlines()
+        self.assertEqual(f"Plan over {self.table.size} nodes:", lines[0])
+        self.assertEqual(
+            f"(AND (Code ['{self.codes[1]}']) (Condition ['working']))",
+            lines[1],
+        )
+        self.assertTrue(lines[2].startswith("AND"))
+        self.assertTrue(lines[3].strip().endswith("~1"))
+
+
+class TestQueryTable(unittest.TestCase):
+    def setUp(self):
+        self.nodes = [object() for _ in range(70)]
+        self.table = QueryTable(self.nodes)
+
+    def test_round_trip(self):
+        nodes = self.nodes[3:68:7]
+        bits = self.table.bits_from_nodes(nodes)
+        self.assertEqual(len(nodes), self.table.count(bits))
+        self.assertEqual(nodes, self.table.nodes_from_bits(bits))
+
+    def test_where(self):
+        bits = self.table.where(list(range(70)), lambda x: x % 2 == 0)
+        self.assertEqual(self.nodes[::2], self.table.nodes_from_bits(bits))
+
+    def test_nodes_outside_universe(self):
+        other = object()
+        bits = self.table.bits_from_nodes([other, self.nodes[0]])
+        self.assertEqual(
+            self.nodes[0:1],
+            self.table.nodes_from_bits(bits & self.table.universe),
+        )
+        self.assertEqual([self.nodes[0], other], self.table.nodes_from_bits(bits))
+
+    def test_bits_from_positions(self):
+        for positions in ([], [5], list(range(0, 70, 3))):
+            bits = self.table.bits_from_positions(positions)
+            self.assertEqual(positions, list(self.table.positions(bits)))
+
+    def test_lookup(self):
+        names = ['kit', 'motor-board', 'motor-rail', 'battery', None] * 14
+        table = QueryTable(range(70))
+        bits = table.lookup('name', names.__getitem__, ['kit', 'other'])
+        self.assertEqual(list(range(0, 70, 5)), table.nodes_from_bits(bits))
+        self.assertEqual(0, table.lookup('name', names.__getitem__, []))
+
+    def test_lookup_patterns(self):
+        names = ['kit', 'motor-board', 'motor-rail', 'battery', None] * 14
+        table = QueryTable(range(70))
+        for patterns, expected in (
+            (['motor-*'], [1, 2]),
+            (['*-rail', 'kit'], [0, 2]),
+            (['m?tor-b*'], [1]),
+            (['motor'], []),
+            (['*'], [0, 1, 2, 3]),
+        ):
+            bits = table.lookup_patterns('name', names.__getitem__, patterns)
+            with self.subTest(patterns=patterns):
+                self.assertEqual(
+                    [x for x in range(70) if x % 5 in expected],
+                    table.nodes_from_bits(bits),
+                )
+
+    def test_lookup_within_sparse(self):
+        names = ['kit', 'battery'] * 35
+        table = QueryTable(range(70))
+        bits = table.lookup('name', names.__getitem__, ['kit'], within=0b111)
+        self.assertEqual([0, 2], table.nodes_from_bits(bits))
+        # Too few candidates to be worth indexing
+        self.assertNotIn('name', table._indexes)
+
+    def test_empty(self):
+        self.assertEqual([], self.table.nodes_from_bits(0))
+        self.assertEqual(0, QueryTable([]).where([], bool))
@@ -0,0 +1,244 @@
+import contextlib
+import io
+import json
+import os
+from unittest import mock
+
+import sr.tools.cli
+from sr.tools.inventory import inventory, validation
+
+from .utils import (
+    code,
+    group_yaml,
+    InventoryTestCase,
+    PART_TEMPLATE,
+    part_yaml,
+)
+
+
+class TestValidation(InventoryTestCase):
+    def validate(self, **kwargs):
+        return list(validation.validate(self.root, **kwargs))
+
+    def test_walk(self):
+        nodes = {node.relpath: node for node in validation.walk(self.root)}
+        c = self.codes
+        self.assertEqual(
+            {
+                'vault',
+                f'vault/motor-board-sr{c[1]}',
+                f'vault/kit-sr{c[2]}',
+                f'vault/kit-sr{c[2]}/motor-board-sr{c[3]}',
+                f'vault/kit-sr{c[2]}/battery-sr{c[4]}',
+                'shelf',
+                f'shelf/battery-sr{c[5]}',
+            },
+            set(nodes),
+        )
+        group = nodes[f'vault/kit-sr{c[2]}']
+        self.assertEqual(('group', 'kit', c[2]), (group.kind, group.name, group.code))
+        self.assertEqual('directory', nodes['vault'].kind)
+
+    def test_valid(self):
+        self.assertEqual([], self.validate())
+
+    def test_invalid_code(self):
+        self.write('shelf/battery-sr2017', part_yaml('2017'))
+        self.assertEqual(
+            [('asset-codes', 'shelf/battery-sr2017', "Invalid asset code: 2017")],
+            self.validate(),
+        )
+
+    def test_duplicate_codes(self):
+        self.write(f'vault/battery-sr{self.codes[5]}', part_yaml(self.codes[5]))
+        problems = self.validate()
+        self.assertEqual(1, len(problems))
+        self.assertEqual('duplicate-codes', problems[0].check)
+        self.assertIn(f'shelf/battery-sr{self.codes[5]}', problems[0].message)
+
+    def test_file_names(self):
+        self.write('shelf/battery', part_yaml(code(6)))
+        self.write(f'vault/kit-sr{self.codes[2]}/README.md', "Hello\n")
+        self.write('shelf/README.md', "Hello\n")
+        problems = self.validate()
+        self.assertEqual(
+            {'shelf/battery', f'vault/kit-sr{self.codes[2]}/README.md'},
+            {problem.path for problem in problems},
+        )
+        self.assertEqual({'file-names'}, {problem.check for problem in problems})
+
+    def test_asset_files(self):
+        c = self.codes
+        self.write(f'shelf/battery-sr{c[5]}', f"assetcode: '{c[5]}'\n")
+        os.remove(self.path(f'vault/kit-sr{c[2]}/info'))
+        problems = self.validate()
+        self.assertEqual(
+            [f'shelf/battery-sr{c[5]}', f'vault/kit-sr{c[2]}'],
+            [problem.path for problem in problems],
+        )
+        self.assertIn("missing 'labelled'", problems[0].message)
+
+    def test_code_mismatch(self):
+        c = self.codes
+        self.write(f'shelf/battery-sr{c[5]}', part_yaml(c[1]))
+        self.write(
+            f'vault/kit-sr{c[2]}/info',
+            group_yaml(c[3], ['motor-board', 'battery']),
+        )
+        problems = self.validate()
+        self.assertEqual(
+            [
+                ('asset-files', f'shelf/battery-sr{c[5]}'),
+                ('asset-files', f'vault/kit-sr{c[2]}'),
+            ],
+            [(problem.check, problem.path) for problem in problems],
+        )
+        self.assertIn("does not match", problems[0].message)
+
+    def test_schema(self):
+        c = self.codes
+        self.write(
+            f'shelf/battery-sr{c[5]}',
+            f"assetcode: '{c[5]}'\n"
+            "labelled: yes please\n"
+            "description: A thing.\n"
+            "value: true\n"
+            "condition: unknown\n",
+        )
+        self.write('.meta/parts/battery', PART_TEMPLATE + "colour: red\n")
+        self.assertEqual(
+            [
+                "'labelled' should be a boolean, not str",
+                "'value' should be a number, not bool",
+                "is missing the 'colour' property",
+            ],
+            sorted(
+                problem.message
+                for problem in self.validate()
+                if problem.path == f'shelf/battery-sr{c[5]}'
+            ),
+        )
+
+    def test_schema_default_template(self):
+        self.write('.meta/parts/default', PART_TEMPLATE + "notes: \n")
+        problems = self.validate()
+        self.assertEqual(
+            [
+                f'vault/kit-sr{self.codes[2]}/motor-board-sr{self.codes[3]}',
+                f'vault/motor-board-sr{self.codes[1]}',
+            ],
+            [problem.path for problem in problems],
+        )
+        self.assertEqual({'schema'}, {problem.check for problem in problems})
+
+    def test_schema_cache(self):
+        path = self.path('.meta/parts/battery')
+        schema = validation.get_schema(path)
+        self.assertIs(schema, validation.get_schema(path))
+        self.assertEqual(
+            {'labelled', 'description', 'value', 'condition'},
+            set(schema.types),
+        )
+
+        self.write('.meta/parts/battery', PART_TEMPLATE + "colour: red\n")
+        self.assertIn('colour', validation.get_schema(path).types)
+        self.assertIsNone(validation.get_schema(self.path('.meta/parts/nothing')))
+
+    def test_group_elements(self):
+        c = self.codes
+        os.remove(self.path(f'vault/kit-sr{c[2]}/battery-sr{c[4]}'))
+        self.write(f'vault/kit-sr{c[2]}/motor-board-sr{code(6)}', part_yaml(code(6)))
+        self.assertEqual(
+            ["has 0 battery, but its elements list 1"],
+            [problem.message for problem in self.validate()],
+        )
+
+    def test_group_elements_counted(self):
+        c = self.codes
+        self.write(
+            f'vault/kit-sr{c[2]}/info',
+            group_yaml(c[2], ['motor-board', {'battery': 2}]),
+        )
+        self.assertEqual(
+            ["has 1 battery, but its elements list 2"],
+            [problem.message for problem in self.validate()],
+        )
+
+        self.write(f'vault/kit-sr{c[2]}/battery-sr{code(6)}', part_yaml(code(6)))
+        self.assertEqual([], self.validate())
+
+    def test_group_elements_invalid(self):
+        c = self.codes
+        self.write(
+            f'vault/kit-sr{c[2]}/info',
+            group_yaml(c[2], ['motor-board', 'battery', {'battery': 'two'}, {}]),
+        )
+        self.assertEqual(
+            [
+                "has an invalid element: {'battery': 'two'}",
+                "has an invalid element: {}",
+            ],
+            [problem.message for problem in self.validate()],
+        )
+
+    def test_changed_since(self):
+        self.git_commit_all()
+        c = self.codes
+        self.write(f'vault/kit-sr{c[2]}/battery-sr{c[4]}', f"assetcode: '{c[4]}'\n")
+        self.write(f'shelf/battery-sr{code(6)}', part_yaml(code(6)))
+        changed = validation.changed_since(self.root, 'HEAD')
+        self.assertEqual(
+            {
+                'vault',
+                f'vault/kit-sr{c[2]}',
+                f'vault/kit-sr{c[2]}/battery-sr{c[4]}',
+                'shelf',
+                f'shelf/battery-sr{code(6)}',
+            },
+            changed,
+        )
+
+        self.write('.meta/parts/battery', PART_TEMPLATE)
+        self.git_commit_all()
+        self.write('.meta/parts/battery', PART_TEMPLATE + "colour: red\n")
+        self.assertIsNone(validation.changed_since(self.root, 'HEAD'))
+
+    def test_validate_changed(self):
+        c = self.codes
+        self.write(f'shelf/battery-sr{c[5]}', f"assetcode: '{c[5]}'\n")
+        self.write(f'vault/battery-sr{c[1]}', part_yaml(c[1]))
+        problems = self.validate(changed={'vault', f'vault/kit-sr{c[2]}'})
+        # The changed group is loaded, but not the unchanged broken asset,
+        # while duplicate codes are found anywhere.
+        self.assertEqual(['duplicate-codes'], [problem.check for problem in problems])
+
+    def test_parallel(self):
+        for n in range(6, 20):
+            self.write(f'shelf/battery-sr{code(n)}', f"assetcode: '{code(n)}'\n")
+        with mock.patch.object(inventory, 'PARALLEL_PARSE_THRESHOLD', 1):
+            problems = self.validate(workers=2)
+        self.assertEqual(
+            {f'shelf/battery-sr{code(n)}' for n in range(6, 20)},
+            {problem.path for problem in problems},
+        )
+        self.assertEqual(14, len(problems))
+
+    def test_json_output(self):
+        self.git('init', '--quiet')
+        self.write('shelf/battery-sr2017', part_yaml('2017'))
+        cwd = os.getcwd()
+        os.chdir(self.root)
+        self.addCleanup(os.chdir, cwd)
+
+        with contextlib.redirect_stdout(io.StringIO()) as buffer:
+            with self.assertRaises(SystemExit):
+                sr.tools.cli.main(['sr', 'inv-validate', '--format', 'json'])
+
+        self.assertEqual(
+            [{
+                'check': 'asset-codes',
+                'path': 'shelf/battery-sr2017',
+                'message': "Invalid asset code: 2017",
+            }],
+            [json.loads(line) for line in buffer.getvalue().splitlines()],
+        )
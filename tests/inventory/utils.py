@@ -0,0 +1,140 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import textwrap
+import unittest
+from unittest import mock
+
+from sr.tools.inventory import assetcode, inventory
+
+USER_NUMBER = 5
+
+USERS = """\
+Test User <test@example.com>: 5
+"""
+
+PART_TEMPLATE = """\
+assetcode: [ASSET_CODE]
+labelled: false
+description: A thing.
+value: 1
+condition: unknown
+"""
+
+ASSEMBLY_TEMPLATE = """\
+assetcode: [ASSET_CODE]
+description: A collection of things.
+elements:
+  - motor-board
+  - battery
+"""
+
+
+def code(part_number, user_number=USER_NUMBER):
+    return assetcode.num_to_code(user_number, part_number)
+
+
+def part_yaml(asset_code, condition='working', **extra):
+    lines = [
+        f"assetcode: '{asset_code}'",
+        "labelled: true",
+        "description: A thing.",
+        "value: 10",
+        f"condition: {condition}",
+    ]
+    lines += [f"{key}: {value}" for key, value in extra.items()]
+    return "\n".join(lines) + "\n"
+
+
+def group_yaml(asset_code, elements):
+    lines = [
+        f"assetcode: '{asset_code}'",
+        "description: A collection of things.",
+        "elements:",
+    ]
+    lines += [f"  - {element}" for element in elements]
+    return "\n".join(lines) + "\n"
+
+
+class InventoryTestCase(unittest.TestCase):
+    """
+    Test case which provides a small inventory on disk, along with an empty
+    cache directory.
+
+    The inventory looks like::
+
+        vault/
+            motor-board-sr<1>        (working, serial ABC123)
+            kit-sr<2>/
+                info                 (elements: motor-board, battery)
+                motor-board-sr<3>    (working)
+                battery-sr<4>        (broken)
+        shelf/
+            battery-sr<5>            (unknown)
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+        self.cache_dir = os.path.join(self.tmpdir, 'cache')
+        os.mkdir(self.cache_dir)
+        patcher = mock.patch.object(inventory, 'CACHE_DIR', self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.root = os.path.join(self.tmpdir, 'inventory')
+        self.write('.meta/users', USERS)
+        self.write('.meta/parts/default', PART_TEMPLATE)
+        self.write('.meta/parts/battery', PART_TEMPLATE)
+        self.write('.meta/assemblies/default', ASSEMBLY_TEMPLATE)
+
+        self.codes = {n: code(n) for n in range(1, 6)}
+        c = self.codes
+        self.write(
+            f'vault/motor-board-sr{c[1]}',
+            part_yaml(c[1], serial='ABC123'),
+        )
+        self.write(
+            f'vault/kit-sr{c[2]}/info',
+            group_yaml(c[2], ['motor-board', 'battery']),
+        )
+        self.write(f'vault/kit-sr{c[2]}/motor-board-sr{c[3]}', part_yaml(c[3]))
+        self.write(
+            f'vault/kit-sr{c[2]}/battery-sr{c[4]}',
+            part_yaml(c[4], condition='broken'),
+        )
+        self.write(
+            f'shelf/battery-sr{c[5]}',
+            part_yaml(c[5], condition='unknown'),
+        )
+
+    def path(self, relpath):
+        return os.path.join(self.root, *relpath.split('/'))
+
+    def write(self, relpath, content):
+        path = self.path(relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            file.write(textwrap.dedent(content))
+        return path
+
+    def git(self, *args):
+        return subprocess.check_output(
+            [
+                'git',
+                '-c', 'user.name=Test User',
+                '-c', 'user.email=test@example.com',
+                *args,
+            ],
+            cwd=self.root,
+            universal_newlines=True,
+        )
+
+    def git_commit_all(self):
+        if not os.path.isdir(self.path('.git')):
+            self.git('init', '--quiet')
+        self.git('add', '--all')
+        self.git('commit', '--quiet', '--message', 'Update')
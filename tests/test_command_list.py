@@ -1,5 +1,9 @@
+import argparse
 import contextlib
+import importlib
 import io
+import subprocess
+import sys
 import unittest
 
 import sr.tools.cli
@@ -14,3 +18,43 @@ class TestListCommands(unittest.TestCase):
             'list-commands',
             buffer.getvalue().splitlines(),
         )
+
+    def test_registry_matches_modules(self):
+        registered = {}
+        for module in sr.tools.cli.__all__:
+            subparsers = argparse.ArgumentParser().add_subparsers()
+            name = f'sr.tools.cli.{module}'
+            importlib.import_module(name).add_subparser(subparsers)
+            for action in subparsers._choices_actions:
+                registered[action.dest] = (module, action.help)
+
+        self.assertEqual(registered, sr.tools.cli.COMMANDS)
+
+    def test_import_budget(self):
+        # Listing the commands, which bash completion does on every tab press,
+        # shouldn't import any of the other commands or their dependencies.
+        script = (
+            'import sys\n'
+            'import sr.tools.cli\n'
+            'sr.tools.cli.main(["sr", "list-commands"])\n'
+            'print("\\n".join(sys.modules), file=sys.stderr)\n'
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', script],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            check=True,
+        )
+        self.assertIn('inv-validate', result.stdout.splitlines())
+
+        imported = set(result.stderr.splitlines())
+        for module in (
+            'yaml',
+            'pyparsing',
+            'pickle',
+            'sr.tools.inventory.inventory',
+            'sr.tools.cli.inv_validate',
+        ):
+            self.assertNotIn(module, imported)
+        self.assertIn('sr.tools.cli.list_commands', imported)
@@ -0,0 +1,119 @@
+import os
+import unittest
+from unittest import mock
+
+from sr.tools import git
+
+from .inventory.utils import code, InventoryTestCase, part_yaml
+
+try:
+    import pygit2
+except ImportError:
+    pygit2 = None
+
+
+class GitTests:
+    backend = None
+
+    def setUp(self):
+        super().setUp()
+        self.git_commit_all()
+        self.git('config', 'user.name', 'Test User')
+
+        patcher = mock.patch.object(git, '_pygit2', return_value=self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.dict(git._repositories, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_top_level(self):
+        self.assertEqual(self.root, git.top_level(self.root))
+        self.assertEqual(self.root, git.top_level(self.path('vault')))
+        self.assertIsNone(git.top_level(self.tmpdir))
+
+    def test_config(self):
+        self.assertEqual('Test User', git.config('user.name', self.root))
+        with self.assertRaises(KeyError):
+            git.config('sr.no-such-option', self.root)
+
+    def test_move(self):
+        c = self.codes
+        git.move(
+            [self.path(f'vault/motor-board-sr{c[1]}'), self.path(f'vault/kit-sr{c[2]}')],
+            self.path('shelf'),
+        )
+        self.assertEqual(
+            [
+                f'R  vault/kit-sr{c[2]}/battery-sr{c[4]} -> '
+                f'shelf/kit-sr{c[2]}/battery-sr{c[4]}',
+                f'R  vault/kit-sr{c[2]}/info -> shelf/kit-sr{c[2]}/info',
+                f'R  vault/kit-sr{c[2]}/motor-board-sr{c[3]} -> '
+                f'shelf/kit-sr{c[2]}/motor-board-sr{c[3]}',
+                f'R  vault/motor-board-sr{c[1]} -> shelf/motor-board-sr{c[1]}',
+            ],
+            sorted(self.git('status', '--porcelain').splitlines()),
+        )
+        self.assertTrue(os.path.isfile(self.path(f'shelf/kit-sr{c[2]}/info')))
+
+    def test_move_untracked(self):
+        self.write(f'vault/battery-sr{code(6)}', part_yaml(code(6)))
+        with self.assertRaises(git.GitError):
+            git.move([self.path(f'vault/battery-sr{code(6)}')], self.path('shelf'))
+
+    def test_log(self):
+        c = self.codes
+        self.git('mv', f'shelf/battery-sr{c[5]}', 'vault/')
+        self.git('commit', '--quiet', '--message', 'Move\n\nTo the vault.')
+        self.write(f'vault/battery-sr{c[5]}', part_yaml(c[5], condition='broken'))
+        self.git_commit_all()
+
+        path = self.path(f'vault/battery-sr{c[5]}')
+        for color in (False, True):
+            args = ['--no-pager', 'log', '--follow', '-C', '-M', '--', path]
+            if color:
+                args.insert(2, '--color')
+            expected = self.git(*args)
+            self.assertEqual(expected, git.log(path, color=color))
+            self.assertEqual(3, expected.count('commit '))
+
+
+class TestSubprocess(GitTests, InventoryTestCase):
+    backend = None
+
+
+@unittest.skipIf(pygit2 is None, "pygit2 is not installed")
+class TestPygit2(GitTests, InventoryTestCase):
+    backend = pygit2
+
+    def test_move_failure(self):
+        c = self.codes
+        rename = os.rename
+
+        def fail_second(source, target):
+            if rename_mock.call_count == 2:
+                raise PermissionError(13, "Permission denied")
+            rename(source, target)
+
+        with mock.patch('os.rename', side_effect=fail_second) as rename_mock:
+            with self.assertRaises(git.GitError):
+                git.move(
+                    [
+                        self.path(f'vault/motor-board-sr{c[1]}'),
+                        self.path(f'vault/kit-sr{c[2]}'),
+                    ],
+                    self.path('shelf'),
+                )
+        self.assertEqual('', self.git('status', '--porcelain'))
+        self.assertTrue(os.path.isfile(self.path(f'vault/motor-board-sr{c[1]}')))
+
+    def test_repository_shared(self):
+        repo = git.repository(self.root)
+        self.assertIs(repo, git.repository(self.path('vault')))
+
+
+class TestBackend(unittest.TestCase):
+    def test_subprocess_first(self):
+        with mock.patch.object(git, '_operations', 0), \
+                mock.patch.dict('sys.modules', {'pygit2': None}):
+            self.assertIsNone(git._pygit2())
@@ -0,0 +1,146 @@
+import contextlib
+import io
+import os
+from unittest import mock
+
+import sr.tools.cli
+from sr.tools.cli import inv_import
+from sr.tools.inventory import inventory
+
+from .inventory.utils import code, InventoryTestCase
+
+
+class TestInvImport(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.git_commit_all()
+
+        cwd = os.getcwd()
+        os.chdir(self.root)
+        self.addCleanup(os.chdir, cwd)
+
+        patcher = mock.patch.object(
+            inventory.Inventory,
+            'get_current_git_user',
+            return_value=('Test User', 'test@example.com'),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_import(self, *args):
+        with contextlib.redirect_stdout(io.StringIO()) as buffer:
+            sr.tools.cli.main(['sr', 'inv-import', *args])
+        return buffer.getvalue()
+
+    def test_load_yaml(self):
+        path = self.write('manifest.yaml', """\
+            - template: battery
+              count: 3
+            - template: kit
+              assembly: true
+              directory: vault
+        """)
+        self.assertEqual(
+            [
+                {'template': 'battery', 'count': 3, 'directory': '.', 'assembly': False},
+                {'template': 'kit', 'count': 1, 'directory': 'vault', 'assembly': True},
+            ],
+            inv_import.load_manifest(path),
+        )
+
+    def test_load_csv(self):
+        path = self.write('manifest.csv', """\
+            template,count,directory,assembly
+            battery,3,,
+            kit,,vault,yes
+        """)
+        self.assertEqual(
+            [
+                {'template': 'battery', 'count': 3, 'directory': '.', 'assembly': False},
+                {'template': 'kit', 'count': 1, 'directory': 'vault', 'assembly': True},
+            ],
+            inv_import.load_manifest(path),
+        )
+
+    def test_load_invalid(self):
+        path = self.write('manifest.yaml', "- template: battery\n  count: -1\n")
+        with self.assertRaises(ValueError):
+            inv_import.load_manifest(path)
+
+        path = self.write('manifest.yaml', "- count: 2\n")
+        with self.assertRaises(ValueError):
+            inv_import.load_manifest(path)
+
+    def test_import(self):
+        manifest = os.path.join(self.tmpdir, 'manifest.yaml')
+        with open(manifest, 'w') as file:
+            file.write(
+                "- template: battery\n"
+                "  count: 2\n"
+                "  directory: shelf\n"
+                "- template: kit\n"
+                "  assembly: true\n",
+            )
+        output = self.run_import('--git-add', manifest)
+        self.assertIn("Created 5 assets", output)
+
+        for path in [
+            f'shelf/battery-sr{code(6)}',
+            f'shelf/battery-sr{code(7)}',
+            f'kit-sr{code(8)}/info',
+            f'kit-sr{code(8)}/motor-board-sr{code(9)}',
+            f'kit-sr{code(8)}/battery-sr{code(10)}',
+        ]:
+            self.assertTrue(os.path.isfile(self.path(path)), path)
+
+        with open(self.path(f'kit-sr{code(8)}/battery-sr{code(10)}')) as file:
+            self.assertIn(f"assetcode: {code(10)}", file.read())
+
+        staged = self.git('diff', '--cached', '--name-only').split()
+        self.assertIn(f'shelf/battery-sr{code(6)}', staged)
+        self.assertIn(f'kit-sr{code(8)}/info', staged)
+
+        entries = inventory.CodeIndex(self.root).rebuild()
+        self.assertEqual({code(n) for n in range(1, 11)}, set(entries))
+
+    def test_import_counted_elements(self):
+        self.write('.meta/assemblies/pair', """\
+            assetcode: [ASSET_CODE]
+            description: Two batteries.
+            elements:
+              - motor-board
+              - battery: 2
+        """)
+        paths, codes = inv_import.create_assets(
+            self.root,
+            [{'template': 'pair', 'count': 1, 'directory': '.', 'assembly': True}],
+            lambda count: [code(n) for n in range(6, 6 + count)],
+        )
+        self.assertEqual([code(n) for n in range(6, 10)], codes)
+        self.assertEqual(
+            [
+                f'battery-sr{code(8)}',
+                f'battery-sr{code(9)}',
+                'info',
+                f'motor-board-sr{code(7)}',
+            ],
+            sorted(os.listdir(self.path(f'pair-sr{code(6)}'))),
+        )
+
+    def test_import_invalid_element(self):
+        self.write('.meta/assemblies/odd', """\
+            assetcode: [ASSET_CODE]
+            description: Something odd.
+            elements:
+              - motor-board
+              - [battery]
+        """)
+        allocate = mock.Mock()
+        with self.assertRaises(ValueError):
+            inv_import.create_assets(
+                self.root,
+                [{'template': 'odd', 'count': 1, 'directory': '.', 'assembly': True}],
+                allocate,
+            )
+        allocate.assert_not_called()
+        self.assertFalse(any(name.startswith('odd-') for name in os.listdir(self.root)))
@@ -0,0 +1,46 @@
+import contextlib
+import io
+import os
+from unittest import mock
+
+import sr.tools.cli
+
+from .inventory.utils import InventoryTestCase
+
+
+class TestInvQuery(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.git_commit_all()
+
+        cwd = os.getcwd()
+        os.chdir(self.root)
+        self.addCleanup(os.chdir, cwd)
+
+        patcher = mock.patch.dict(os.environ, {'SR_INVENTORY_DAEMON': '0'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_query(self, *args):
+        with contextlib.redirect_stdout(io.StringIO()) as buffer:
+            sr.tools.cli.main(['sr', 'inv-query', *args])
+        return buffer.getvalue().splitlines()
+
+    def test_codes(self):
+        self.assertEqual(
+            sorted([self.codes[4], self.codes[5]]),
+            sorted(self.run_query('--codes', 'type:battery')),
+        )
+
+    def test_codes_skip_directories(self):
+        # The battery on the shelf is in a plain directory, which has no code
+        self.assertEqual(
+            [self.codes[2]],
+            self.run_query('--codes', 'parent of type:battery'),
+        )
+
+    def test_paths_include_directories(self):
+        self.assertEqual(
+            sorted([self.path('shelf'), self.path(f'vault/kit-sr{self.codes[2]}')]),
+            sorted(self.run_query('--paths', 'parent of type:battery')),
+        )
@@ -0,0 +1,24 @@
+import types
+import unittest
+
+from sr.tools.cli import mcv4b_part_code
+
+
+def device(**attributes):
+    return types.SimpleNamespace(attributes=attributes)
+
+
+class TestPartcodeMatch(unittest.TestCase):
+    def test_valid(self):
+        self.assertTrue(mcv4b_part_code.partcode_match(device(serial='srP1U28')))
+        self.assertTrue(mcv4b_part_code.partcode_match(device(serial='srp1u28')))
+
+    def test_invalid(self):
+        for serial in ['P1U28', 'srP1U29', 'srP1I28', 'A700ABCD']:
+            self.assertFalse(
+                mcv4b_part_code.partcode_match(device(serial=serial)),
+                serial,
+            )
+
+    def test_no_serial(self):
+        self.assertFalse(mcv4b_part_code.partcode_match(device()))
@@ -0,0 +1,68 @@
+import io
+import unittest
+
+import yaml
+
+from sr.tools import yamlio
+
+from .inventory.utils import (
+    ASSEMBLY_TEMPLATE,
+    group_yaml,
+    PART_TEMPLATE,
+    part_yaml,
+)
+
+DOCUMENTS = [
+    part_yaml('51R'),
+    part_yaml('52P', condition='broken', serial='D851F850', development='false'),
+    group_yaml('53M', ['motor-board', {'battery': 2}]),
+    PART_TEMPLATE,
+    ASSEMBLY_TEMPLATE,
+    """\
+assetcode: 000
+labelled: yes
+description: "Un ruban tiss\\u00e9 — with unicode"
+value: 12.50
+condition: working
+purchased: 2014-03-02
+notes: |
+  Multiple lines
+  of notes.
+tags: [a, b, ~]
+""",
+]
+
+
+class TestLoad(unittest.TestCase):
+    def test_string(self):
+        self.assertEqual({'a': [1, 2]}, yamlio.load('a: [1, 2]'))
+
+    def test_stream(self):
+        self.assertEqual({'a': 'b'}, yamlio.load(io.BytesIO(b'a: b')))
+
+    def test_safe(self):
+        with self.assertRaises(yaml.YAMLError):
+            yamlio.load('!!python/object/apply:os.system ["true"]')
+
+
+@unittest.skipUnless(yaml.__with_libyaml__, "PyYAML was built without libyaml")
+class TestBackendsAgree(unittest.TestCase):
+    def test_load(self):
+        for document in DOCUMENTS:
+            with self.subTest(document=document):
+                self.assertEqual(
+                    yaml.load(document, Loader=yaml.SafeLoader),
+                    yaml.load(document, Loader=yaml.CSafeLoader),
+                )
+
+    def test_dump(self):
+        for document in DOCUMENTS:
+            data = yaml.load(document, Loader=yaml.SafeLoader)
+            with self.subTest(document=document):
+                self.assertEqual(
+                    yaml.dump(data, Dumper=yaml.SafeDumper),
+                    yaml.dump(data, Dumper=yaml.CSafeDumper),
+                )
+
+    def test_in_use(self):
+        self.assertTrue(yamlio.LIBYAML)